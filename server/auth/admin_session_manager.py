@@ -13,7 +13,8 @@ from datetime import datetime, timedelta
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from common.database import db_manager
+from common.database import db_manager  # noqa: E402
+from auth.session_cache import admin_session_cache  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +110,11 @@ class AdminSessionManager:
         Returns:
             dict: User data if valid, None otherwise
         """
+        # Dashboard polls and REST calls repeat the same token - skip the database for a few seconds
+        cached = admin_session_cache.get(token)
+        if cached is not None:
+            return cached
+
         try:
             query = """
                 SELECT s.*, u.username, u.full_name, u.email, u.role
@@ -128,13 +134,15 @@ class AdminSessionManager:
                 self._invalidate_session(token)
                 return None
 
-            return {
+            result = {
                 "user_id": session["user_id"],
                 "username": session["username"],
                 "full_name": session["full_name"],
                 "email": session["email"],
                 "role": session["role"]
             }
+            admin_session_cache.put(token, result, session.get("expires_at"))
+            return result
 
         except Exception as e:
             logger.error(f"Admin session validation error: {e}")
@@ -188,6 +196,7 @@ class AdminSessionManager:
                 WHERE token = %s AND is_active = true
             """
             self.db.execute_query(query, (new_expires_at, token))
+            admin_session_cache.invalidate(token)
 
             return {
                 "success": True,
@@ -202,11 +211,13 @@ class AdminSessionManager:
         """Invalidate a specific session"""
         query = "UPDATE admin_sessions SET is_active = false WHERE token = %s"
         self.db.execute_query(query, (token,))
+        admin_session_cache.invalidate(token)
 
     def _invalidate_user_admin_sessions(self, user_id: int):
         """Invalidate all admin sessions for a user"""
         query = "UPDATE admin_sessions SET is_active = false WHERE user_id = %s AND is_active = true"
         self.db.execute_query(query, (user_id,))
+        admin_session_cache.invalidate_user(user_id=user_id)
 
     def _log_login_attempt(self, user_id: int, ip_address: str, user_agent: str,
                            success: bool, login_type: str = "admin"):
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Session Activity Tracker - Write-behind last_activity for sessions
+Every authenticated WebSocket message (and keepalive pong) marks its session
+active. Doing that with an UPDATE per message put a database round trip on
+the IOLoop for each keystroke-driven autosave; instead touch() only records
+the time in memory and a background thread writes every session touched
+since the last flush in one batched UPDATE. The idle-session job flushes
+first, so the sessions table is current whenever it is read for idleness.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Sessions expire after 24 hours - activity older than that is not worth remembering
+FORGET_AFTER_SECONDS = 24 * 3600
+
+# One row per dirty session: token, last activity (naive local time, like datetime.now() before)
+ROW_TEMPLATE = "(%s, %s::timestamp)"
+
+UPDATE_SQL = """
+    UPDATE sessions AS s SET last_activity = v.last_activity
+    FROM (VALUES %s) AS v(token, last_activity)
+    WHERE s.token = v.token AND s.is_active = true
+"""
+
+
+class SessionActivityTracker(threading.Thread):
+    """In-memory last-activity per session token, flushed in batches"""
+
+    # Started lazily from whichever thread first reports activity
+    inherit_executor_context = False
+
+    def __init__(self, write_batch=None, flush_interval=None):
+        super().__init__(daemon=True, name="SessionActivity")
+        self.write_batch = write_batch or self._update_rows
+        self.flush_interval = flush_interval if flush_interval is not None else Config.SESSION_ACTIVITY_FLUSH_INTERVAL
+
+        self._last_seen = {}  # token -> time.time() of the latest activity
+        self._dirty = {}  # token -> time.time(), not yet written
+        self._cond = threading.Condition()
+        self._writing = 0  # Sessions taken by the writer but not yet committed
+        self._flushing = 0  # flush() callers waiting - the writer skips its interval for them
+        self._running = False
+
+        # Counters for /health
+        self.touches = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    def touch(self, token, now=None):
+        """Record activity for a session - O(1), never touches the database"""
+        if not token:
+            return
+        now = now if now is not None else time.time()
+        with self._cond:
+            if not self._running:
+                self._running = True
+                self.start()
+                atexit.register(self.flush, 2.0)
+            self._last_seen[token] = now
+            self._dirty[token] = now
+            self.touches += 1
+
+    def last_activity(self, token):
+        """Latest activity seen by this process (time.time()), or None"""
+        with self._cond:
+            return self._last_seen.get(token)
+
+    def forget(self, token):
+        """The session ended (logout, invalidation) - stop tracking and never write it again"""
+        with self._cond:
+            self._last_seen.pop(token, None)
+            self._dirty.pop(token, None)
+
+    def flush(self, timeout=5.0):
+        """Wait until all activity recorded so far is written (or timeout). Returns True when written."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if not self._running:
+                return not self._dirty
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._dirty or self._writing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def run(self):
+        while True:
+            with self._cond:
+                if not (self._flushing and self._dirty):
+                    self._cond.wait(self.flush_interval)
+                self._prune_locked()
+                if not self._dirty:
+                    continue
+                batch, self._dirty = self._dirty, {}
+                self._writing = len(batch)
+
+            try:
+                self.write_batch([(token, datetime.fromtimestamp(seen)) for token, seen in batch.items()])
+                self.written += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to write activity for {len(batch)} sessions: {e}")
+                with self._cond:
+                    # Retry next interval, unless a newer touch (or a logout) superseded the entry
+                    for token, seen in batch.items():
+                        if token in self._last_seen and token not in self._dirty:
+                            self._dirty[token] = seen
+                    if self._flushing:
+                        # Do not spin on a database that is down while flush() waits
+                        self._cond.wait(self.flush_interval)
+            finally:
+                with self._cond:
+                    self._writing = 0
+                    self._cond.notify_all()
+
+    def _prune_locked(self):
+        cutoff = time.time() - FORGET_AFTER_SECONDS
+        for token in [token for token, seen in self._last_seen.items() if seen < cutoff]:
+            del self._last_seen[token]
+
+    @staticmethod
+    def _update_rows(rows):
+        # Imported here: the database module connects on import
+        from psycopg2.extras import execute_values
+        from common.database import db_manager
+
+        with db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            execute_values(cursor, UPDATE_SQL, rows, template=ROW_TEMPLATE, page_size=len(rows))
+
+    def stats(self):
+        with self._cond:
+            tracked, dirty = len(self._last_seen), len(self._dirty)
+        return {
+            "tracked": tracked,
+            "dirty": dirty,
+            "touches": self.touches,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+
+# Global instance
+session_activity = SessionActivityTracker()
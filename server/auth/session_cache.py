@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Session Cache - Short-lived in-process cache of validated session tokens
+validate_session and validate_admin_session each run a sessions JOIN users
+query, and they are called on every upload, every admin dashboard poll and
+every admin REST request. A valid session is remembered for a few seconds
+(never past its expires_at), so bursts of requests with the same token hit
+the database once. Everything that ends a session or changes what it
+grants - logout, single-session enforcement, password changes, admin edits
+and deletes of an account, idle cleanup - invalidates the cached entry
+explicitly, so the TTL only bounds staleness for changes made outside this
+process.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+
+# Tokens remembered at once; the oldest are dropped beyond this
+MAX_ENTRIES = 10000
+
+
+class SessionCache:
+    """Token -> validated session dict, with TTL, explicit invalidation and hit-rate counters"""
+
+    def __init__(self, ttl=None, max_entries=MAX_ENTRIES):
+        self.ttl = ttl if ttl is not None else Config.SESSION_CACHE_TTL
+        self.max_entries = max_entries
+        self._entries = {}  # token -> (expires_monotonic, session dict)
+        self._lock = threading.Lock()
+
+        # Counters for /health
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token):
+        """The cached session for token, or None (a miss - validate against the database)"""
+        if self.ttl <= 0 or not token:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                # A copy - callers add fields to the session dicts they get back
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def put(self, token, session, expires_at=None):
+        """Remember a session the database just validated (never beyond its expires_at)"""
+        if self.ttl <= 0 or not token or not session:
+            return
+        lifetime = self.ttl
+        if isinstance(expires_at, datetime):
+            lifetime = min(lifetime, (expires_at - datetime.now()).total_seconds())
+        if lifetime <= 0:
+            return
+        with self._lock:
+            if token not in self._entries and len(self._entries) >= self.max_entries:
+                self._evict_locked()
+            self._entries[token] = (time.monotonic() + lifetime, dict(session))
+
+    def _evict_locked(self):
+        now = time.monotonic()
+        for token in [token for token, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[token]
+        while len(self._entries) >= self.max_entries:
+            # Dicts keep insertion order - the first key is the oldest entry
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, token):
+        with self._lock:
+            if self._entries.pop(token, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id=None, username=None):
+        """Drop every cached session of a user (by id, username or both)"""
+        with self._lock:
+            tokens = [token for token, (_, session) in self._entries.items()
+                      if (user_id is not None and session.get("user_id") == user_id)
+                      or (username is not None and session.get("username") == username)]
+            for token in tokens:
+                del self._entries[token]
+            self.invalidations += len(tokens)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global instances - IDE sessions and admin panel sessions live in separate tables
+session_cache = SessionCache()
+admin_session_cache = SessionCache()
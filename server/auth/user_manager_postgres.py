@@ -11,8 +11,10 @@ logger = logging.getLogger(__name__)
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from common.database import db_manager
-from common.file_storage import file_storage
+from common.database import db_manager  # noqa: E402
+from common.file_storage import file_storage  # noqa: E402
+from auth.session_activity import session_activity  # noqa: E402
+from auth.session_cache import session_cache, admin_session_cache  # noqa: E402
 
 
 class UserManager:
@@ -99,6 +101,7 @@ class UserManager:
             """
             )
             self.db.execute_query(invalidate_query, (user_id,))
+            session_cache.invalidate_user(user_id=user_id)
             logger.info(f"Invalidated existing sessions for user {username} (user_id: {user_id})")
 
             # Create session token
@@ -150,6 +153,11 @@ class UserManager:
 
     def validate_session(self, token):
         """Validate session token and check for inactivity timeout (1 hour)"""
+        # Recently validated tokens skip the database (see SessionCache)
+        cached = session_cache.get(token)
+        if cached is not None:
+            return cached
+
         try:
             query = (
                 """
@@ -195,12 +203,14 @@ class UserManager:
             # Original code preserved in git history and feat/user-session branch
 
             # With RealDictCursor, this will always be a dict
-            return {
+            result = {
                 "user_id": session["user_id"],
                 "username": session["username"],
                 "role": session["role"],
                 "full_name": session.get("full_name", session["username"]),
             }
+            session_cache.put(token, result, session.get("expires_at"))
+            return result
 
         except Exception as e:
             print(f"Session validation error: {e}")
@@ -223,31 +233,9 @@ class UserManager:
             return []
 
     def update_session_activity(self, token):
-        """Update last_activity timestamp for a session"""
-        try:
-            current_time = datetime.now()
-
-            # DEBUG LOGGING - Remove after debugging
-            logger.info(f"[ACTIVITY-UPDATE] Updating session activity to: {current_time} (type: {type(current_time)}, tz: {current_time.tzinfo})")
-
-            query = (
-                """
-                UPDATE sessions SET last_activity = %s
-                WHERE token = %s AND is_active = true
-            """
-                if self.db.is_postgres
-                else """
-                UPDATE sessions SET last_activity = ?
-                WHERE token = ? AND is_active = 1
-            """
-            )
-
-            self.db.execute_query(query, (current_time, token))
-            logger.info(f"[ACTIVITY-UPDATE] Session activity updated successfully")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to update session activity: {e}")
-            return False
+        """Record activity for a session; last_activity is written in batches by session_activity"""
+        session_activity.touch(token)
+        return True
 
     def invalidate_other_sessions(self, user_id, current_token):
         """
@@ -287,6 +275,11 @@ class UserManager:
                 self.db.execute_query(invalidate_query, (user_id, current_token))
                 logger.info(f"Invalidated {len(other_tokens)} other sessions for user_id {user_id}")
 
+            for token in other_tokens:
+                session_activity.forget(token)
+                session_cache.invalidate(token)
+            # The user logged in again - their cached admin sessions are checked against the database again
+            admin_session_cache.invalidate_user(user_id=user_id)
             return other_tokens
         except Exception as e:
             logger.error(f"Failed to invalidate other sessions: {e}")
@@ -302,6 +295,8 @@ class UserManager:
             )
 
             self.db.execute_query(query, (token,))
+            session_activity.forget(token)
+            session_cache.invalidate(token)
             return True
         except Exception as e:
             print(f"Logout error: {e}")
@@ -325,6 +320,7 @@ class UserManager:
             )
 
             self.db.execute_query(query, (new_expires_at, token))
+            session_cache.invalidate(token)
 
             return {
                 "success": True,
@@ -369,6 +365,8 @@ class UserManager:
             )
 
             self.db.execute_query(update_query, (new_hash.decode(), username))
+            session_cache.invalidate_user(username=username)
+            admin_session_cache.invalidate_user(username=username)
 
             return {"success": True, "message": "Password changed successfully"}
 
@@ -472,6 +470,8 @@ class UserManager:
             )
 
             self.db.execute_query(update_query, (new_hash.decode(), user_id))
+            session_cache.invalidate_user(user_id=user_id)
+            admin_session_cache.invalidate_user(user_id=user_id)
 
             # Mark token as used
             mark_used_query = (
@@ -558,6 +558,8 @@ class UserManager:
             )
 
             self.db.execute_query(invalidate_sessions_query, (target_user_id,))
+            session_cache.invalidate_user(user_id=target_user_id)
+            admin_session_cache.invalidate_user(user_id=target_user_id)
 
             return {
                 "success": True,
@@ -682,9 +684,13 @@ class IdleSessionCleanupJob:
                 # Run cleanup every 5 minutes
                 time_module.sleep(300)
 
+                # Activity is written behind - bring sessions.last_activity up to date first
+                session_activity.flush()
                 idle_users = self.user_manager.cleanup_idle_sessions()
 
                 # Terminate WebSocket connections for idle users
+                for username in idle_users:
+                    session_cache.invalidate_user(username=username)
                 if idle_users:
                     # Import here to avoid circular dependency
                     from handlers.authenticated_ws_handler import ws_connection_registry
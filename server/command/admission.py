@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Admission Scheduler - Limits how many script runs execute at once
+Sits between run_python_program and executor start. A run starts right away
+while the global (MAX_CONCURRENT_EXECUTIONS) and per-user
+(MAX_PROCESSES_PER_USER) limits allow it; otherwise it waits in its user's
+queue and queued users are served round-robin, so one student with several
+files cannot starve the rest of the class. Queued clients get their position
+and an estimated wait on the repl_output channel.
+
+A run gives its slot back when the script ends; the REPL that follows (or an
+empty REPL) holds one of the cheaper REPL slots (MAX_OPEN_REPLS, and
+MAX_PROCESSES_PER_USER per user) until its executor exits.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import Config
+from command.deadline_timer import get_deadline_timer
+from command.exec_protocol import MessageType
+
+# Starting guess for how long a run holds its slot, before any run has finished
+DEFAULT_RUN_SECONDS = 5.0
+# Weight of the latest run in the moving average of slot hold times
+RUN_TIME_SMOOTHING = 0.2
+# How often queued clients get a fresh position (only sent when it changed)
+UPDATE_INTERVAL = 2.0
+
+
+class _Ticket:
+    """A run waiting for, or holding, an execution slot"""
+
+    __slots__ = ("executor", "username", "queued_at", "started_at", "last_position")
+
+    def __init__(self, executor, username):
+        self.executor = executor
+        self.username = username
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.last_position = None
+
+
+class AdmissionScheduler:
+    """Global and per-user run limits with a fair-share queue"""
+
+    def __init__(self, max_running=None, max_per_user=None, max_queued=None, max_repls=None,
+                 update_interval=UPDATE_INTERVAL, default_run_seconds=DEFAULT_RUN_SECONDS):
+        self.max_running = max_running or Config.MAX_CONCURRENT_EXECUTIONS
+        self.max_per_user = max_per_user or Config.MAX_PROCESSES_PER_USER
+        self.max_queued = max_queued if max_queued is not None else Config.MAX_QUEUED_EXECUTIONS
+        self.max_repls = max_repls or Config.MAX_OPEN_REPLS
+        self.update_interval = update_interval
+        self.avg_run_seconds = default_run_seconds
+
+        self._lock = threading.Lock()
+        self._running = {}  # executor -> _Ticket
+        self._user_running = {}  # username -> running count
+        # username -> deque of waiting tickets; key order is the round-robin order
+        self._queues = OrderedDict()
+        self._queued = {}  # executor -> _Ticket
+        self._update_entry = None  # DeadlineTimer entry while anything is queued
+        self._repls = {}  # executor -> username, for executors sitting in a REPL
+        self._user_repls = {}  # username -> that user's REPL executors, oldest first
+
+        # Counters for /health
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.max_wait_seconds = 0.0
+        self.repls_refused = 0
+        self.repls_evicted = 0
+
+    def submit(self, executor, username):
+        """
+        Start the executor now if a slot is free, otherwise queue it.
+        Returns False when the queue is full and the run was not accepted.
+        """
+        with self._lock:
+            # A free slot while others wait means every waiting user is at their own limit
+            if self._has_slot(username):
+                ticket = _Ticket(executor, username)
+                self._admit_locked(ticket)
+            elif len(self._queued) >= self.max_queued:
+                self.rejected += 1
+                print(f"[ADMISSION] Queue full ({len(self._queued)}), rejecting run {executor.cmd_id} for {username}")
+                return False
+            else:
+                ticket = _Ticket(executor, username)
+                self._queues.setdefault(username, deque()).append(ticket)
+                self._queued[executor] = ticket
+                executor.queued = True
+                self.queued_total += 1
+                position = self._position_locked(ticket)
+                ticket.last_position = position
+                wait = self._estimate_wait(position)
+                if self._update_entry is None:
+                    self._update_entry = get_deadline_timer().schedule(self.update_interval, self._send_updates)
+                ticket = None
+
+        if ticket is None:
+            print(f"[ADMISSION] Queued run {executor.cmd_id} for {username} at position {position}")
+            self._notify(executor, f"⏳ Server is busy - your program is queued "
+                                   f"(position {position}, estimated wait {wait}s)\n")
+            return True
+        self._start(ticket)
+        return True
+
+    def release(self, executor):
+        """The run finished or was stopped: free its slot (or drop it from the queue) and admit the next"""
+        with self._lock:
+            if self._drop_repl_locked(executor):
+                return
+            ticket = self._running.pop(executor, None)
+            if ticket is not None:
+                count = self._user_running[ticket.username] - 1
+                if count:
+                    self._user_running[ticket.username] = count
+                else:
+                    del self._user_running[ticket.username]
+                held = time.monotonic() - ticket.started_at
+                self.avg_run_seconds += RUN_TIME_SMOOTHING * (held - self.avg_run_seconds)
+            else:
+                ticket = self._queued.pop(executor, None)
+                if ticket is None:
+                    return
+                executor.queued = False
+                queue = self._queues[ticket.username]
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.username]
+                print(f"[ADMISSION] Dropped queued run {executor.cmd_id} for {ticket.username}")
+                return
+            to_start = self._dispatch_locked()
+
+        for ticket in to_start:
+            waited = ticket.started_at - ticket.queued_at
+            self._notify(ticket.executor, f"▶️ Starting your program (waited {waited:.0f}s)\n")
+            self._start(ticket)
+
+    def open_repl(self, executor, username):
+        """
+        Hold a REPL slot for an executor whose run slot is free (script done, or an
+        empty REPL) until release(). A user at their own limit loses their oldest
+        REPL; returns False when every REPL slot is taken.
+        """
+        with self._lock:
+            if executor in self._repls:
+                return True
+            user_repls = self._user_repls.get(username, ())
+            evicted = None
+            if len(user_repls) >= self.max_per_user:
+                evicted = user_repls[0]
+                self._drop_repl_locked(evicted)
+                self.repls_evicted += 1
+            elif len(self._repls) >= self.max_repls:
+                self.repls_refused += 1
+                print(f"[ADMISSION] REPL limit reached ({len(self._repls)}), refusing REPL {executor.cmd_id} "
+                      f"for {username}")
+                return False
+            self._repls[executor] = username
+            self._user_repls.setdefault(username, []).append(executor)
+
+        if evicted is not None:
+            print(f"[ADMISSION] Closing REPL {evicted.cmd_id} of {username} for REPL {executor.cmd_id}")
+            self._notify(evicted, f"\n⚠️ Console closed - you can have {self.max_per_user} open at a time\n")
+            try:
+                evicted.stop()
+            except Exception as e:
+                print(f"[ADMISSION] ERROR closing REPL {evicted.cmd_id}: {e}")
+        return True
+
+    def _drop_repl_locked(self, executor):
+        username = self._repls.pop(executor, None)
+        if username is None:
+            return False
+        user_repls = self._user_repls[username]
+        user_repls.remove(executor)
+        if not user_repls:
+            del self._user_repls[username]
+        return True
+
+    def _has_slot(self, username):
+        return (len(self._running) < self.max_running
+                and self._user_running.get(username, 0) < self.max_per_user)
+
+    def _admit_locked(self, ticket):
+        ticket.started_at = time.monotonic()
+        ticket.executor.queued = False
+        self._running[ticket.executor] = ticket
+        self._user_running[ticket.username] = self._user_running.get(ticket.username, 0) + 1
+        self.admitted += 1
+        self.max_wait_seconds = max(self.max_wait_seconds, ticket.started_at - ticket.queued_at)
+
+    def _dispatch_locked(self):
+        """Admit queued runs round-robin across users while slots are free"""
+        started = []
+        while self._queues and len(self._running) < self.max_running:
+            for username in self._queues:
+                if self._user_running.get(username, 0) < self.max_per_user:
+                    break
+            else:
+                # Every queued user is at their own limit
+                break
+            queue = self._queues[username]
+            ticket = queue.popleft()
+            if queue:
+                # Served this round - go to the back of the line
+                self._queues.move_to_end(username)
+            else:
+                del self._queues[username]
+            del self._queued[ticket.executor]
+            self._admit_locked(ticket)
+            started.append(ticket)
+        return started
+
+    def _position_locked(self, ticket):
+        """1-based place in round-robin order: every user ahead gets one turn per round"""
+        index = self._queues[ticket.username].index(ticket)
+        position = 1
+        ahead = True
+        for username, queue in self._queues.items():
+            if username == ticket.username:
+                ahead = False
+                position += index
+            else:
+                position += min(len(queue), index + 1 if ahead else index)
+        return position
+
+    def _estimate_wait(self, position):
+        """Seconds until a run at this position starts, from the average slot hold time"""
+        return math.ceil(position / self.max_running * self.avg_run_seconds)
+
+    def _send_updates(self):
+        """Timer callback: tell queued clients whose position changed where they stand"""
+        updates = []
+        with self._lock:
+            for queue in self._queues.values():
+                for ticket in queue:
+                    position = self._position_locked(ticket)
+                    if position != ticket.last_position:
+                        ticket.last_position = position
+                        updates.append((ticket.executor, position, self._estimate_wait(position)))
+            if self._queued:
+                self._update_entry = get_deadline_timer().schedule(self.update_interval, self._send_updates)
+            else:
+                self._update_entry = None
+
+        for executor, position, wait in updates:
+            self._notify(executor, f"⏳ Still queued (position {position}, estimated wait {wait}s)\n")
+
+    def _start(self, ticket):
+        try:
+            ticket.executor.start()
+        except Exception as e:
+            print(f"[ADMISSION] ERROR starting run {ticket.executor.cmd_id}: {e}")
+            self.release(ticket.executor)
+
+    @staticmethod
+    def _notify(executor, text):
+        # Straight onto the outbound queue: a queued run has not started, and these
+        # lines are not script output (they must not count towards loop detection)
+        try:
+            executor.outbound.put(MessageType.STDOUT, text)
+        except Exception as e:
+            print(f"[ADMISSION] Could not notify run {executor.cmd_id}: {e}")
+
+    def is_queued(self, executor):
+        with self._lock:
+            return executor in self._queued
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "queued": len(self._queued),
+                "queued_users": len(self._queues),
+                "max_running": self.max_running,
+                "max_per_user": self.max_per_user,
+                "avg_run_seconds": round(self.avg_run_seconds, 2),
+                "admitted": self.admitted,
+                "queued_total": self.queued_total,
+                "rejected": self.rejected,
+                "max_wait_seconds": round(self.max_wait_seconds, 2),
+                "repls": len(self._repls),
+                "max_repls": self.max_repls,
+                "repls_refused": self.repls_refused,
+                "repls_evicted": self.repls_evicted,
+            }
+
+
+# Global instance
+admission_scheduler = AdmissionScheduler()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Client Outbox - Bounded outbound buffer per WebSocket connection
+write_message() hands a frame to Tornado and returns at once; when the browser
+reads slowly (a background tab, a poor connection) Tornado keeps every frame
+in server memory while a flooding script keeps printing. Frames for a
+connection now go through its outbox: one write at a time, the next frame
+only after the previous write's future resolves, and at most a fixed number
+of bytes buffered. When the buffer overflows, the oldest pending program
+output is dropped and replaced by one "output truncated" notice. Control
+frames (responses, input requests, errors, completion) are never dropped.
+"""
+
+import asyncio
+import threading
+import weakref
+from collections import deque
+
+from config import Config
+
+
+class _Frame:
+    __slots__ = ("data", "size", "stream", "notice")
+
+    def __init__(self, data, stream, notice):
+        self.data = data
+        self.size = len(data)
+        self.stream = stream  # Output frames name the stream they belong to; None = control frame
+        self.notice = notice
+
+
+class _Truncated:
+    """Placeholder for output frames dropped from one stream"""
+
+    __slots__ = ("stream", "notice", "dropped")
+    size = 0
+
+    def __init__(self, stream, notice):
+        self.stream = stream
+        self.notice = notice
+        self.dropped = 0
+
+    @property
+    def data(self):
+        return self.notice(self.dropped)
+
+
+class ClientOutbox:
+    """Writes a connection's frames one at a time, dropping old output beyond max_bytes"""
+
+    def __init__(self, client, max_bytes=None):
+        self._client = weakref.ref(client)  # Weak - the registry entry must not keep the connection alive
+        self.max_bytes = max_bytes or Config.OUTBOUND_BUFFER_KB * 1024
+        self._frames = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writing = False  # A thread is writing frames, or a write future is pending
+
+        # Counters for /health
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_dropped = 0
+        self.truncations = 0
+
+    def put(self, data, stream=None, notice=None):
+        """
+        Queue a serialized frame. Program output passes the stream it belongs to and
+        notice(dropped_bytes), which builds the frame sent in place of dropped output.
+        """
+        with self._lock:
+            self._frames.append(_Frame(data, stream, notice if stream is not None else None))
+            self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._shed_locked()
+            if self._writing:
+                return
+            self._writing = True
+        self._flush()
+
+    def buffered_bytes(self):
+        with self._lock:
+            return self._bytes
+
+    def _shed_locked(self):
+        # Drop down to half the cap so a fast producer does not hit the cap on every frame
+        target = self.max_bytes // 2
+        kept = deque()
+        dropped_any = False
+        for frame in self._frames:
+            if isinstance(frame, _Truncated):
+                # An earlier overflow's notice - keep it so later drops add to its count
+                kept.append(frame)
+                continue
+            if frame.notice is not None and self._bytes > target:
+                self._bytes -= frame.size
+                self.frames_dropped += 1
+                self.bytes_dropped += frame.size
+                last = kept[-1] if kept else None
+                if not (isinstance(last, _Truncated) and last.stream == frame.stream):
+                    last = _Truncated(frame.stream, frame.notice)
+                    kept.append(last)
+                    dropped_any = True
+                last.dropped += frame.size
+                continue
+            kept.append(frame)
+        self._frames = kept
+        if dropped_any:
+            self.truncations += 1
+
+    def _flush(self):
+        """Write queued frames until the socket pushes back or the queue is empty"""
+        while True:
+            with self._lock:
+                if not self._frames:
+                    self._writing = False
+                    return
+                frame = self._frames.popleft()
+                self._bytes -= frame.size
+            client = self._client()
+            if client is None:
+                self._discard()
+                return
+            try:
+                result = client.write_message(frame.data)
+            except Exception as e:
+                print(f"[CLIENT-OUTBOX] ERROR writing frame: {e}")
+                self._discard()
+                return
+            self.frames_sent += 1
+            if isinstance(result, asyncio.Future) and not result.done():
+                # Tornado has not handed the frame to the socket yet - continue when it has
+                result.add_done_callback(self._write_done)
+                return
+
+    def _write_done(self, future):
+        if future.cancelled() or future.exception() is not None:
+            # The connection closed - nobody is left to read the rest
+            self._discard()
+            return
+        self._flush()
+
+    def _discard(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+            self._writing = False
+
+
+class ClientOutboxes:
+    """One ClientOutbox per connection, dropped with the connection"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self._outboxes = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, client):
+        with self._lock:
+            outbox = self._outboxes.get(client)
+            if outbox is None:
+                outbox = self._outboxes[client] = ClientOutbox(client, self.max_bytes)
+            return outbox
+
+    def stats(self):
+        with self._lock:
+            outboxes = list(self._outboxes.values())
+        return {
+            "connections": len(outboxes),
+            "buffered_bytes": sum(outbox.buffered_bytes() for outbox in outboxes),
+            "max_bytes": self.max_bytes or Config.OUTBOUND_BUFFER_KB * 1024,
+            "frames_sent": sum(outbox.frames_sent for outbox in outboxes),
+            "frames_dropped": sum(outbox.frames_dropped for outbox in outboxes),
+            "bytes_dropped": sum(outbox.bytes_dropped for outbox in outboxes),
+            "truncations": sum(outbox.truncations for outbox in outboxes),
+        }
+
+
+def truncated_text(dropped_bytes):
+    """What the student sees in place of output the browser could not keep up with"""
+    return f"\n[output truncated: {max(1, dropped_bytes // 1024)} KB not shown - the browser fell behind]\n"
+
+
+# Global instance
+client_outboxes = ClientOutboxes()
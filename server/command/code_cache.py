@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Code Cache - Compiled code objects for student scripts, keyed by content hash
+A whole section running the same Lecture Notes example compiles it once:
+an in-process LRU holds recent code objects, and an optional marshal cache on
+disk (under the storage root) is shared by worker processes and survives
+restarts. Keys include the filename because it is baked into tracebacks.
+Disk writes happen on a background thread, and the directory is pruned to
+the newest CODE_CACHE_DISK_MAX_FILES entries - every edit of a script makes
+a new entry, so it would otherwise grow without bound.
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from config import Config
+
+# Outcomes of a lookup, also reported back by pool workers
+RESULT_MEMORY = "memory"
+RESULT_DISK = "disk"
+RESULT_MISS = "miss"
+
+
+# Prune the disk cache after this many writes (listing it is an NFS round trip on EFS)
+PRUNE_EVERY_WRITES = 50
+
+
+def _default_disk_dir():
+    from common.config import Config as StorageConfig
+
+    return os.path.join(StorageConfig.PROJECTS, ".bytecode_cache")
+
+
+class _DiskWriter(threading.Thread):
+    """Writes queued cache entries to disk, off the run path"""
+
+    # Started from a script's thread on its first compile - it serves the cache, not that run
+    inherit_executor_context = False
+
+    def __init__(self, cache):
+        super().__init__(daemon=True, name="CodeCacheWriter")
+        self.cache = cache
+
+    def run(self):
+        self.cache._write_loop()
+
+
+class CodeCache:
+    """Bounded LRU of code objects with an optional, size-bounded marshal cache on disk"""
+
+    def __init__(self, max_entries=None, disk_dir=None, use_disk=None, max_disk_files=None):
+        self.max_entries = max_entries if max_entries is not None else Config.CODE_CACHE_SIZE
+        self.use_disk = Config.CODE_CACHE_DISK if use_disk is None else use_disk
+        self.max_disk_files = max_disk_files if max_disk_files is not None else Config.CODE_CACHE_DISK_MAX_FILES
+        self._disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Pending disk writes, served by _DiskWriter
+        self._write_cond = threading.Condition()
+        self._pending_writes = []
+        self._writing = False
+        self._writer_pid = None  # Pool workers are forked - the writer thread does not survive a fork
+        self._writes_since_prune = PRUNE_EVERY_WRITES  # Prune on the first write
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+        self.disk_pruned = 0
+
+    @property
+    def disk_dir(self):
+        if self._disk_dir is None:
+            self._disk_dir = _default_disk_dir()
+        return self._disk_dir
+
+    @staticmethod
+    def make_key(source, filename):
+        digest = hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+        return digest, filename
+
+    def _disk_path(self, key):
+        # marshal output is only valid for the interpreter version that wrote it
+        name = hashlib.sha256(f"{key[0]}\0{key[1]}".encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.{sys.implementation.cache_tag}.bin")
+
+    def compile(self, source, filename):
+        """Return (code object, RESULT_*) for source, compiling only on a miss"""
+        key = self.make_key(source, filename)
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return code, RESULT_MEMORY
+
+        result = RESULT_DISK
+        code = self._load_from_disk(key) if self.use_disk else None
+        if code is None:
+            # SyntaxError propagates to the caller exactly as from compile()
+            code = compile(source, filename, "exec")
+            result = RESULT_MISS
+            if self.use_disk:
+                self._queue_disk_write(key, code)
+
+        self._remember(key, code)
+        self.record(result)
+        return code, result
+
+    def _remember(self, key, code):
+        with self._lock:
+            self._entries[key] = code
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, result):
+        """Count a lookup outcome (also used for outcomes reported by pool workers)"""
+        with self._lock:
+            if result == RESULT_MEMORY:
+                self.hits += 1
+            elif result == RESULT_DISK:
+                self.disk_hits += 1
+            elif result == RESULT_MISS:
+                self.misses += 1
+
+    def _load_from_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                return marshal.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            print(f"[CODE-CACHE] Ignoring unreadable cache file {path}: {e}")
+            self.disk_errors += 1
+            return None
+
+    def _queue_disk_write(self, key, code):
+        with self._write_cond:
+            self._pending_writes.append((key, code))
+            if self._writer_pid != os.getpid():
+                self._writer_pid = os.getpid()
+                self._writing = False
+                _DiskWriter(self).start()
+            self._write_cond.notify()
+
+    def flush(self, timeout=5.0):
+        """Wait until queued disk writes are done (or timeout). Returns True when they are."""
+        with self._write_cond:
+            return self._write_cond.wait_for(lambda: not self._pending_writes and not self._writing, timeout)
+
+    def _write_loop(self):
+        while True:
+            with self._write_cond:
+                self._write_cond.wait_for(lambda: self._pending_writes)
+                batch, self._pending_writes = self._pending_writes, []
+                self._writing = True
+            try:
+                for key, code in batch:
+                    self._save_to_disk(key, code)
+                self._writes_since_prune += len(batch)
+                if self._writes_since_prune >= PRUNE_EVERY_WRITES:
+                    self._writes_since_prune = 0
+                    self._prune_disk()
+            finally:
+                with self._write_cond:
+                    self._writing = False
+                    self._write_cond.notify_all()
+
+    def _prune_disk(self):
+        """Keep the newest max_disk_files entries (by mtime); older ones are removed"""
+        try:
+            entries = []
+            with os.scandir(self.disk_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".bin"):
+                        try:
+                            entries.append((entry.stat().st_mtime, entry.path))
+                        except OSError:
+                            pass  # Removed by another process meanwhile
+        except OSError as e:
+            print(f"[CODE-CACHE] Could not list {self.disk_dir}: {e}")
+            return
+        if len(entries) <= self.max_disk_files:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_disk_files]:
+            try:
+                os.remove(path)
+                self.disk_pruned += 1
+            except OSError:
+                pass
+
+    def _save_to_disk(self, key, code):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                marshal.dump(code, f)
+            # Atomic on POSIX - concurrent writers of the same entry never expose a partial file
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[CODE-CACHE] Could not write cache file {path}: {e}")
+            self.disk_errors += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_errors": self.disk_errors,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "disk_enabled": self.use_disk,
+                "disk_pruned": self.disk_pruned,
+            }
+
+
+# Global instance
+code_cache = CodeCache()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Deadline Timer - One shared thread that fires callbacks at their deadlines
+Replaces per-executor polling loops and one-off timer threads: entries sit in
+a heap and the thread sleeps until the earliest one is due, so a thousand
+idle sessions cost one sleeping thread and no CPU.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class TimerEntry:
+    """Handle returned by DeadlineTimer.schedule(); pass it to cancel()"""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class DeadlineTimer(threading.Thread):
+    """Heap of deadlines served by a single daemon thread"""
+
+    # Started from inside runs too - it serves every executor, not the one that started it
+    inherit_executor_context = False
+
+    def __init__(self, name="DeadlineTimer"):
+        super().__init__(daemon=True, name=name)
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self.fired = 0
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) on the timer thread after delay seconds"""
+        entry = TimerEntry(time.monotonic() + delay, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (entry.deadline, next(self._counter), entry))
+            # Only wake the thread if this is now the earliest deadline
+            if self._heap[0][2] is entry:
+                self._cond.notify()
+        return entry
+
+    def cancel(self, entry):
+        """Cancel a scheduled callback (lazy - the heap slot is skipped when due)"""
+        if entry is not None:
+            entry.cancelled = True
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for _, _, entry in self._heap if not entry.cancelled)
+
+    def run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                _, _, entry = heapq.heappop(self._heap)
+
+            if entry.cancelled:
+                continue
+            self.fired += 1
+            try:
+                entry.callback(*entry.args)
+            except Exception as e:
+                name = getattr(entry.callback, '__name__', entry.callback)
+                print(f"[DEADLINE-TIMER] Error in timer callback {name}: {e}")
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def get_deadline_timer():
+    """The process-wide timer, started on first use"""
+    global _timer
+    with _timer_lock:
+        if _timer is None:
+            _timer = DeadlineTimer()
+            _timer.start()
+        return _timer
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Execution Worker - Runs one SimpleExecutorV3 session in an isolated process
+Started ahead of time by the WorkerPool and driven over a socket channel.
+
+In template mode the process imports the scientific stack once and then forks
+a fresh worker per request, so student runs share those pages copy-on-write
+and never pay the import cost themselves.
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import signal
+import socket
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+
+# Workers are launched with "python -m command.exec_worker" from the server directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from command.simple_exec_v3 import SimpleExecutorV3, install_output_router, install_execution_sandbox  # noqa: E402
+from command.mpl_cache import mpl_cache  # noqa: E402
+from command.code_cache import code_cache  # noqa: E402
+
+# Descriptors the worker itself may still open on top of the student's quota
+_FD_HEADROOM = 16
+
+
+def _mapped_bytes():
+    """Address space this process already maps (the preloaded libraries, mostly)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _highest_fd():
+    try:
+        return max(int(fd) for fd in os.listdir("/proc/self/fd"))
+    except (OSError, ValueError):
+        return 2
+
+
+def _set_limit(kind, soft, applied, name, value):
+    """Lower a soft (and hard) limit, never raising it past the existing hard limit"""
+    try:
+        _, hard = resource.getrlimit(kind)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        new_hard = soft if kind != resource.RLIMIT_CPU else soft + 1
+        if hard != resource.RLIM_INFINITY:
+            new_hard = min(new_hard, hard)
+        resource.setrlimit(kind, (soft, new_hard))
+        applied[name] = value
+    except (ValueError, OSError) as e:
+        print(f"[EXEC-WORKER] Could not set {name} limit: {e}")
+
+
+def apply_resource_limits():
+    """Apply Config's per-run rlimits to this worker. Returns the limits that took effect.
+
+    Only ever called in a single-use worker: the limits cannot be raised again
+    and die with the process. Memory is headroom on top of what the worker
+    already maps, since the template's preloaded libraries are not the student's.
+    """
+    applied = {}
+    if Config.MEMORY_LIMIT_MB > 0:
+        _set_limit(resource.RLIMIT_AS, _mapped_bytes() + Config.MEMORY_LIMIT_MB * 2 ** 20,
+                   applied, "memory_mb", Config.MEMORY_LIMIT_MB)
+    if Config.CPU_TIME_LIMIT > 0:
+        # SIGXCPU at the soft limit, SIGKILL a second later if the script ignores it
+        _set_limit(resource.RLIMIT_CPU, int(time.process_time()) + Config.CPU_TIME_LIMIT,
+                   applied, "cpu_seconds", Config.CPU_TIME_LIMIT)
+    if Config.MAX_OPEN_FILES > 0:
+        _set_limit(resource.RLIMIT_NOFILE, max(Config.MAX_OPEN_FILES, _highest_fd() + 1 + _FD_HEADROOM),
+                   applied, "open_files", Config.MAX_OPEN_FILES)
+    if Config.MAX_FILE_SIZE_MB > 0:
+        # Writes past the limit fail with EFBIG instead of killing the worker
+        signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+        _set_limit(resource.RLIMIT_FSIZE, Config.MAX_FILE_SIZE_MB * 2 ** 20,
+                   applied, "file_size_mb", Config.MAX_FILE_SIZE_MB)
+    return applied
+
+
+def send_packet(conn, kind, payload=None, lock=None):
+    """Send a [kind, payload] packet as JSON (never pickle - the peer is untrusted)"""
+    data = json.dumps([kind, payload]).encode("utf-8")
+    if lock:
+        with lock:
+            conn.send_bytes(data)
+    else:
+        conn.send_bytes(data)
+
+
+def recv_packet(conn):
+    """Receive a [kind, payload] packet, returns (None, None) when the channel is closed"""
+    try:
+        kind, payload = json.loads(conn.recv_bytes().decode("utf-8"))
+        return kind, payload
+    except (EOFError, OSError, ValueError):
+        return None, None
+
+
+class _ChannelClient:
+    """Stands in for the WebSocket handler in the worker process"""
+
+    def __init__(self, conn, send_lock):
+        self.conn = conn
+        self.send_lock = send_lock
+        self.connected = True
+
+
+class _ChannelOutbound:
+    """
+    Replaces the executor's OutboundQueue: messages go to the server unserialized,
+    where the PooledExecutor's own queue coalesces them for the WebSocket
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def put(self, msg_type, data):
+        try:
+            send_packet(self.client.conn, "msg", [msg_type.value, data], self.client.send_lock)
+        except (OSError, ValueError):
+            # Server side went away - nothing left to deliver to
+            self.client.connected = False
+
+
+class _InlineLoop:
+    """Event loop stand-in: the channel is already thread-safe, so run callbacks inline"""
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+
+class WorkerExecutor(SimpleExecutorV3):
+    """SimpleExecutorV3 that reports lock and input state back to the server"""
+
+    def __init__(self, conn, send_lock, spec):
+        self._conn = conn
+        self._send_lock = send_lock
+        self._waiting_for_input = False
+        super().__init__(
+            spec["cmd_id"],
+            _ChannelClient(conn, send_lock),
+            _InlineLoop(),
+            script_path=spec.get("script_path"),
+            username=spec.get("username"),
+            role=spec.get("role"),
+        )
+
+    def _create_outbound(self):
+        return _ChannelOutbound(self.client)
+
+    @property
+    def waiting_for_input(self):
+        return self._waiting_for_input
+
+    @waiting_for_input.setter
+    def waiting_for_input(self, value):
+        if value != self._waiting_for_input:
+            self._waiting_for_input = value
+            self._notify("waiting", bool(value))
+
+    def _notify(self, kind, payload=None):
+        try:
+            send_packet(self._conn, kind, payload, self._send_lock)
+        except (OSError, ValueError):
+            pass
+
+    def _cpu_clock(self):
+        # The worker runs this one script, so every thread it starts counts
+        return time.process_time()
+
+    def _peak_rss_kb(self):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def set_resource_limits(self):
+        """Real rlimits - this process runs nothing but the one script"""
+        self.resource_limits = apply_resource_limits()
+        if "cpu_seconds" in self.resource_limits:
+            signal.signal(signal.SIGXCPU, self._on_cpu_limit)
+        print(f"[RESOURCE-LIMITS] Worker {os.getpid()} limits: {self.resource_limits}")
+
+    def _on_cpu_limit(self, signum, frame):
+        # Off the signal handler: reporting takes the send lock the interrupted code may hold
+        signal.signal(signal.SIGXCPU, signal.SIG_IGN)
+        message = f"CPU time limit exceeded ({self.resource_limits['cpu_seconds']}s of CPU per run)"
+        threading.Thread(target=self._kill_for_resource_limit, args=("cpu_limit", message),
+                         daemon=True, name="CpuLimit").start()
+
+    def _report_telemetry(self, record):
+        # Sent as soon as the script ends - the server writes it to execution_log
+        self._notify("telemetry", record)
+
+    def _report_result_cache(self, result):
+        # Sent right away - a session that ends in the REPL is usually killed, not exited
+        self._notify("result_cache", result)
+
+    def _hold_repl_slot(self):
+        # The server takes the REPL slot when it sees the REPL_HANDOFF lock release
+        return True
+
+    def _abandon_script(self):
+        """The script swallows every interrupt - end the whole worker, the server reports the exit"""
+        print(f"[EXEC-WORKER] Script {self.cmd_id} ignored interrupts, exiting worker")
+        self._flush_output()
+        self._release_execution_lock_once("abandoned script")
+        self._record_telemetry(1)
+        self._notify("exit", {
+            "timeout": bool(getattr(self, "timeout_occurred", False)),
+            "code_cache": self.code_cache_result,
+        })
+        os._exit(1)
+
+    def _release_execution_lock_once(self, context="unknown"):
+        """The execution lock lives in the server process - ask it to release"""
+        with self._lock_release_mutex:
+            if self._lock_released:
+                return False
+            self._lock_released = True
+        self._notify("release_lock", context)
+        return True
+
+
+def _pump_control(conn, executor):
+    """Deliver input and stop requests from the server to the executor"""
+    while True:
+        kind, payload = recv_packet(conn)
+        if kind is None or kind == "stop":
+            executor.stop()
+            return
+        if kind == "input":
+            executor.handle_input(payload)
+
+
+def serve(conn):
+    """Wait for one job, run it to completion, then exit (workers are single-use)"""
+    kind, spec = recv_packet(conn)
+    if kind != "run":
+        return 0
+
+    send_lock = threading.Lock()
+    executor = WorkerExecutor(conn, send_lock, spec)
+
+    control = threading.Thread(target=_pump_control, args=(conn, executor), daemon=True, name="WorkerControl")
+    control.start()
+
+    # Run in the main thread so SIGINT-based interrupts land in student code
+    executor.run()
+
+    send_packet(conn, "exit", {
+        "timeout": bool(getattr(executor, "timeout_occurred", False)),
+        "code_cache": executor.code_cache_result,
+    }, send_lock)
+    # The run is reported - finish a queued code cache write before the process exits
+    code_cache.flush(2.0)
+    return 0
+
+
+def preload(modules):
+    """Import the heavy modules student scripts use and warm their caches"""
+    mpl_cache.activate()
+    started = time.time()
+    loaded = []
+    for name in modules:
+        try:
+            __import__(name)
+            loaded.append(name)
+        except Exception as e:
+            print(f"[EXEC-TEMPLATE] Skipping preload of {name}: {e}")
+
+    if "matplotlib" in sys.modules:
+        try:
+            import matplotlib
+
+            matplotlib.use("Agg")
+            # Loads the shared font list the server built at startup
+            from matplotlib import font_manager
+
+            font_manager.fontManager.findfont("DejaVu Sans")
+        except Exception as e:
+            print(f"[EXEC-TEMPLATE] Could not warm matplotlib: {e}")
+
+    # Move everything loaded so far out of the collector's view so forked
+    # children do not dirty those pages when gc walks them
+    gc.collect()
+    gc.freeze()
+    print(f"[EXEC-TEMPLATE] Preloaded {', '.join(loaded) or 'nothing'} in {time.time() - started:.2f}s")
+
+
+def _reset_child_state():
+    """Undo template-only process state in a freshly forked worker"""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    # numpy does not reseed on fork - without this every student gets the same "random" numbers
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        try:
+            numpy.random.seed()
+        except Exception:
+            pass
+
+
+def serve_template(sock, modules):
+    """Preload, then fork one worker per request received on sock"""
+    preload(modules)
+    # Forked workers inherit the sandbox instead of building it on their first run
+    install_execution_sandbox()
+    # Workers are not our concern once forked - let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    while True:
+        try:
+            msg, fds, _flags, _addr = socket.recv_fds(sock, 64, 1)
+        except OSError:
+            return 0
+        if not msg or not fds:
+            # Server closed the control channel
+            return 0
+
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            _reset_child_state()
+            code = 1
+            try:
+                conn = Connection(fds[0])
+                try:
+                    code = serve(conn)
+                finally:
+                    conn.close()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code or 0)
+
+        os.close(fds[0])
+        # A pidfd lets the server signal exactly this worker - a bare PID may be reused once it is reaped
+        try:
+            pidfds = [os.pidfd_open(pid)]
+        except (AttributeError, OSError):
+            pidfds = []
+        try:
+            socket.send_fds(sock, [json.dumps({"pid": pid}).encode("utf-8") + b"\n"], pidfds)
+        except OSError:
+            return 0
+        finally:
+            for fd in pidfds:
+                os.close(fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Python IDE execution worker")
+    parser.add_argument("--fd", type=int, required=True, help="inherited channel file descriptor")
+    parser.add_argument("--template", action="store_true", help="preload modules and fork workers on request")
+    args = parser.parse_args(argv)
+    install_output_router()
+
+    if args.template:
+        sock = socket.socket(fileno=args.fd)
+        try:
+            modules = os.environ.get("WORKER_PRELOAD_MODULES", "")
+            return serve_template(sock, [m.strip() for m in modules.split(",") if m.strip()])
+        finally:
+            sock.close()
+
+    conn = Connection(args.fd)
+    try:
+        return serve(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.stdout.flush()
+    # Skip interpreter teardown - student code may have left non-daemon threads behind
+    code = main()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code or 0)
@@ -1,24 +1,58 @@
 #!/usr/bin/env python3
 """
 Execution Lock Manager - Prevents concurrent execution of the same file
-Uses file-based locks to ensure only one process runs per Python file at a time
+Only one run per user+file at a time. The lock table holds an entry only while
+a run holds the lock, and a single timer wheel (ticking on the shared
+DeadlineTimer) checks heartbeats and executor liveness for every entry, so
+threads and memory stay flat however many runs happen.
 """
 
 import threading
 import time
 import os
-from collections import defaultdict
+
+from command.deadline_timer import get_deadline_timer
+
+# Every held lock is checked once per revolution of the wheel
+CHECK_INTERVAL = 5.0
+WHEEL_SLOTS = 5
+# Consider an executor dead if no heartbeat for this long (unless it waits for input)
+MAX_STALE_TIME = 30.0
+
+
+class _LockEntry:
+    """A held execution lock"""
+
+    __slots__ = ("key", "username", "file_path", "cmd_id", "acquired_at", "heartbeat", "executor", "slot")
+
+    def __init__(self, key, username, file_path, cmd_id, executor, slot):
+        self.key = key
+        self.username = username
+        self.file_path = file_path
+        self.cmd_id = cmd_id
+        self.acquired_at = time.time()
+        self.heartbeat = self.acquired_at
+        self.executor = executor
+        self.slot = slot
 
 
 class ExecutionLockManager:
     """Manages execution locks to prevent race conditions in file execution"""
 
-    def __init__(self):
-        self._locks = defaultdict(threading.Lock)  # Per-(user+file) locks
-        self._active_executions = {}  # Track active executions: (user, file_path) -> (cmd_id, timestamp)
-        self._cleanup_lock = threading.Lock()  # For cleanup operations
-        self._heartbeats = {}  # Track heartbeats: (user, file_path) -> last_heartbeat_time
-        self._executors = {}  # Track executor references: (user, file_path) -> executor_ref
+    def __init__(self, check_interval=CHECK_INTERVAL, wheel_slots=WHEEL_SLOTS, max_stale_time=MAX_STALE_TIME):
+        self._entries = {}  # user_file_key -> _LockEntry, only while held
+        self._user_keys = {}  # username -> set of held user_file_keys
+        self._cond = threading.Condition()  # Guards the table; waiters for a busy key sleep on it
+
+        self.max_stale_time = max_stale_time
+        self._tick_interval = check_interval / wheel_slots
+        self._wheel = [set() for _ in range(wheel_slots)]
+        self._wheel_position = 0
+        self._tick_entry = None  # DeadlineTimer entry while any lock is held
+
+    @staticmethod
+    def _key(username, file_path):
+        return f"{username}:{os.path.normpath(file_path)}"
 
     def acquire_execution_lock(self, username, file_path, cmd_id, timeout=1.0, executor_ref=None):
         """
@@ -28,190 +62,140 @@ class ExecutionLockManager:
         """
         normalized_path = os.path.normpath(file_path)
         user_file_key = f"{username}:{normalized_path}"
-        file_lock = self._locks[user_file_key]
 
         print(f"[EXEC-LOCK] Attempting to acquire lock for user {username}, file {normalized_path}, cmd_id: {cmd_id}")
 
-        acquired = file_lock.acquire(timeout=timeout)
-        if acquired:
-            try:
-                with self._cleanup_lock:
-                    # Check if there's already an active execution for this user+file
-                    if user_file_key in self._active_executions:
-                        old_cmd_id, old_timestamp = self._active_executions[user_file_key]
-                        print(
-                            f"[EXEC-LOCK] Found existing execution for {user_file_key}: cmd_id={old_cmd_id}, replacing with {cmd_id}"
-                        )
-
-                    # Register this execution
-                    self._active_executions[user_file_key] = (cmd_id, time.time())
-                    self._heartbeats[user_file_key] = time.time()
-                    if executor_ref:
-                        self._executors[user_file_key] = executor_ref
-                    print(f"[EXEC-LOCK] ✅ Lock acquired for {user_file_key}, cmd_id: {cmd_id}")
-
-                    # Set up health check timer instead of auto-release
-                    def health_check_timer():
-                        """Check if executor is still alive every 5 seconds"""
-                        check_interval = 5.0  # Check every 5 seconds
-                        max_stale_time = 30.0  # Consider dead if no heartbeat for 30 seconds
-
-                        while True:
-                            time.sleep(check_interval)
-                            with self._cleanup_lock:
-                                if user_file_key not in self._active_executions:
-                                    # Lock already released, stop checking
-                                    break
-
-                            current_cmd_id, _ = self._active_executions.get(user_file_key, (None, None))
-                            if current_cmd_id != cmd_id:
-                                # Different execution now, stop checking
-                                break
-
-                            # Check if executor is still alive
-                            executor = self._executors.get(user_file_key)
-                            if executor:
-                                # Check if executor thread is alive and not terminated
-                                if hasattr(executor, 'alive') and not executor.alive:
-                                    print(f"[EXEC-LOCK] 💀 Executor dead for {user_file_key}, releasing lock")
-                                    self.release_execution_lock(username, normalized_path, cmd_id)
-                                    break
-                                elif hasattr(executor, 'is_alive') and not executor.is_alive():
-                                    print(f"[EXEC-LOCK] 💀 Executor thread dead for {user_file_key}, releasing lock")
-                                    self.release_execution_lock(username, normalized_path, cmd_id)
-                                    break
-                                # If waiting for input, don't check heartbeat timeout
-                                elif hasattr(executor, 'waiting_for_input') and executor.waiting_for_input:
-                                    # Update heartbeat when waiting for input (legitimate wait)
-                                    self._heartbeats[user_file_key] = time.time()
-                                    continue
-
-                            # Check heartbeat staleness (only if not waiting for input)
-                            last_heartbeat = self._heartbeats.get(user_file_key, 0)
-                            if time.time() - last_heartbeat > max_stale_time:
-                                print(f"[EXEC-LOCK] ⏰ No heartbeat for {max_stale_time}s, releasing lock for {user_file_key}")
-                                self.release_execution_lock(username, normalized_path, cmd_id)
-                                break
-
-                # Start health check timer in background
-                timer_thread = threading.Thread(target=health_check_timer, daemon=True, name=f"HealthCheck-{cmd_id}")
-                timer_thread.start()
-
-                return True
-            except Exception as e:
-                # If registration fails, release the lock immediately
-                print(f"[EXEC-LOCK] ❌ Error during lock registration for {user_file_key}: {e}")
-                try:
-                    file_lock.release()
-                except (RuntimeError, ValueError):
-                    pass  # Lock might not be held
-                # Clean up any partial registration
-                if user_file_key in self._active_executions:
-                    del self._active_executions[user_file_key]
-                if user_file_key in self._heartbeats:
-                    del self._heartbeats[user_file_key]
-                if user_file_key in self._executors:
-                    del self._executors[user_file_key]
-                raise  # Re-raise the exception
-        else:
-            print(f"[EXEC-LOCK] ❌ Failed to acquire lock for {user_file_key}, cmd_id: {cmd_id} (timeout)")
-            return False
+        with self._cond:
+            if not self._cond.wait_for(lambda: user_file_key not in self._entries, timeout):
+                print(f"[EXEC-LOCK] ❌ Failed to acquire lock for {user_file_key}, cmd_id: {cmd_id} (timeout)")
+                return False
+
+            # Newest entries go in the slot checked last, one full interval from now
+            slot = (self._wheel_position - 1) % len(self._wheel)
+            entry = _LockEntry(user_file_key, username, normalized_path, cmd_id, executor_ref, slot)
+            self._entries[user_file_key] = entry
+            self._user_keys.setdefault(username, set()).add(user_file_key)
+            self._wheel[slot].add(user_file_key)
+            if self._tick_entry is None:
+                self._tick_entry = get_deadline_timer().schedule(self._tick_interval, self._tick)
+
+        print(f"[EXEC-LOCK] ✅ Lock acquired for {user_file_key}, cmd_id: {cmd_id}")
+        return True
+
+    def _remove_locked(self, entry):
+        """Drop a held entry (caller holds self._cond)"""
+        del self._entries[entry.key]
+        self._wheel[entry.slot].discard(entry.key)
+        user_keys = self._user_keys.get(entry.username)
+        if user_keys is not None:
+            user_keys.discard(entry.key)
+            if not user_keys:
+                del self._user_keys[entry.username]
+        self._cond.notify_all()
 
     def release_execution_lock(self, username, file_path, cmd_id):
         """Release execution lock for a specific user+file combination"""
-        normalized_path = os.path.normpath(file_path)
-        user_file_key = f"{username}:{normalized_path}"
-
-        with self._cleanup_lock:
-            if user_file_key in self._active_executions:
-                active_cmd_id, _ = self._active_executions[user_file_key]
-                if active_cmd_id == cmd_id:
-                    del self._active_executions[user_file_key]
-                    # Clean up tracking data
-                    if user_file_key in self._heartbeats:
-                        del self._heartbeats[user_file_key]
-                    if user_file_key in self._executors:
-                        del self._executors[user_file_key]
-                    print(f"[EXEC-LOCK] Released execution record for {user_file_key}, cmd_id: {cmd_id}")
-                else:
-                    print(
-                        f"[EXEC-LOCK] WARNING: cmd_id mismatch for {user_file_key}: active={active_cmd_id}, releasing={cmd_id}"
-                    )
-
-        if user_file_key in self._locks:
-            try:
-                self._locks[user_file_key].release()
-                print(f"[EXEC-LOCK] Lock released for {user_file_key}, cmd_id: {cmd_id}")
-            except Exception as e:
-                print(f"[EXEC-LOCK] Error releasing lock for {user_file_key}: {e}")
+        user_file_key = self._key(username, file_path)
+
+        with self._cond:
+            entry = self._entries.get(user_file_key)
+            if entry is None:
+                return
+            if entry.cmd_id != cmd_id:
+                print(
+                    f"[EXEC-LOCK] WARNING: cmd_id mismatch for {user_file_key}: "
+                    f"active={entry.cmd_id}, releasing={cmd_id}"
+                )
+                return
+            self._remove_locked(entry)
+        print(f"[EXEC-LOCK] Lock released for {user_file_key}, cmd_id: {cmd_id}")
+
+    def _tick(self):
+        """Timer callback: check the entries in the current wheel slot"""
+        now = time.time()
+        to_release = []
+        with self._cond:
+            slot = self._wheel_position
+            self._wheel_position = (slot + 1) % len(self._wheel)
+            for key in self._wheel[slot]:
+                entry = self._entries[key]
+                reason = self._check_entry(entry, now)
+                if reason:
+                    to_release.append((entry, reason))
+
+            if self._entries:
+                self._tick_entry = get_deadline_timer().schedule(self._tick_interval, self._tick)
+            else:
+                # Nothing held - stop ticking until the next acquire
+                self._tick_entry = None
+
+        for entry, reason in to_release:
+            print(f"[EXEC-LOCK] {reason}, releasing lock for {entry.key}")
+            self.release_execution_lock(entry.username, entry.file_path, entry.cmd_id)
+
+    def _check_entry(self, entry, now):
+        """Returns why a held lock should be released, or None while its run looks healthy"""
+        executor = entry.executor
+        if executor is not None:
+            # Waiting for an execution slot - not started yet, but not dead either
+            if getattr(executor, 'queued', False):
+                entry.heartbeat = now
+                return None
+            if hasattr(executor, 'alive') and not executor.alive:
+                return "💀 Executor dead"
+            if hasattr(executor, 'is_alive') and not executor.is_alive():
+                return "💀 Executor thread dead"
+            # Waiting for input is a legitimate pause - count it as a heartbeat
+            if getattr(executor, 'waiting_for_input', False):
+                entry.heartbeat = now
+                return None
+        if now - entry.heartbeat > self.max_stale_time:
+            return f"⏰ No heartbeat for {self.max_stale_time:.0f}s"
+        return None
 
     def is_execution_active(self, username, file_path):
         """Check if there's an active execution for this user+file"""
-        normalized_path = os.path.normpath(file_path)
-        user_file_key = f"{username}:{normalized_path}"
-        with self._cleanup_lock:
-            return user_file_key in self._active_executions
+        with self._cond:
+            return self._key(username, file_path) in self._entries
 
     def get_active_execution(self, username, file_path):
         """Get active execution info for a user+file"""
-        normalized_path = os.path.normpath(file_path)
-        user_file_key = f"{username}:{normalized_path}"
-        with self._cleanup_lock:
-            return self._active_executions.get(user_file_key)
+        with self._cond:
+            entry = self._entries.get(self._key(username, file_path))
+            return (entry.cmd_id, entry.acquired_at) if entry else None
 
     def update_heartbeat(self, username, file_path):
         """Update heartbeat for an active execution"""
-        normalized_path = os.path.normpath(file_path)
-        user_file_key = f"{username}:{normalized_path}"
-        with self._cleanup_lock:
-            if user_file_key in self._heartbeats:
-                self._heartbeats[user_file_key] = time.time()
+        # Called for every output message - a plain attribute store, no lock needed
+        entry = self._entries.get(self._key(username, file_path))
+        if entry is not None:
+            entry.heartbeat = time.time()
 
     def release_all_user_locks(self, username):
         """Release all locks held by a specific user (useful for WebSocket disconnect)"""
-        with self._cleanup_lock:
-            keys_to_remove = []
-            for user_file_key in list(self._active_executions.keys()):
-                if user_file_key.startswith(f"{username}:"):
-                    keys_to_remove.append(user_file_key)
-
-            for key in keys_to_remove:
-                cmd_id, _ = self._active_executions.get(key, (None, None))
-                if key in self._locks:
-                    try:
-                        self._locks[key].release()
-                    except (RuntimeError, ValueError) as e:
-                        # Lock might not be held or already released
-                        print(f"[ExecutionLockManager] Could not release lock for {key}: {e}")
-                        pass
-                del self._active_executions[key]
-                # Clean up tracking data
-                if key in self._heartbeats:
-                    del self._heartbeats[key]
-                if key in self._executors:
-                    del self._executors[key]
-                print(f"[EXEC-LOCK] 🔓 Released lock for disconnected user: {key}, cmd_id: {cmd_id}")
+        with self._cond:
+            for key in list(self._user_keys.get(username, ())):
+                entry = self._entries[key]
+                self._remove_locked(entry)
+                print(f"[EXEC-LOCK] 🔓 Released lock for disconnected user: {key}, cmd_id: {entry.cmd_id}")
 
     def cleanup_old_executions(self, max_age_seconds=60):
         """Clean up old execution records (safety mechanism)"""
         current_time = time.time()
-        with self._cleanup_lock:
-            to_remove = []
-            for user_file_key, (cmd_id, timestamp) in self._active_executions.items():
-                if current_time - timestamp > max_age_seconds:
-                    print(f"[EXEC-LOCK] Cleaning up old execution: {user_file_key}, cmd_id: {cmd_id}")
-                    to_remove.append(user_file_key)
-
-            for user_file_key in to_remove:
-                del self._active_executions[user_file_key]
-                # Try to release the lock if it's stuck
-                try:
-                    if user_file_key in self._locks:
-                        self._locks[user_file_key].release()
-                except (RuntimeError, ValueError) as e:
-                    # Lock might not be held or already released
-                    print(f"[ExecutionLockManager] Could not release lock in cleanup: {e}")
-                    pass
+        with self._cond:
+            for entry in [e for e in self._entries.values() if current_time - e.acquired_at > max_age_seconds]:
+                print(f"[EXEC-LOCK] Cleaning up old execution: {entry.key}, cmd_id: {entry.cmd_id}")
+                self._remove_locked(entry)
+
+    def stats(self):
+        """Lock table size (bounded by active runs) and wheel occupancy"""
+        with self._cond:
+            return {
+                "active": len(self._entries),
+                "users": len(self._user_keys),
+                "wheel": [len(slot) for slot in self._wheel],
+                "ticking": self._tick_entry is not None,
+            }
 
 
 # Global instance
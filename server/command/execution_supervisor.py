@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Execution Supervisor - One owner for every run's deadlines and kill decisions
+Script time limits, interrupt retries for scripts that swallow ScriptTimeout
+and REPL idle expiry are all entries on the shared DeadlineTimer heap, so a
+run costs its executor thread and nothing else - no timeout thread sleeping
+next to every script. Live executions are registered here, which gives
+monitoring a single snapshot of what is running and what happens next.
+Execution lock heartbeats already tick on the same timer (see
+ExecutionLockManager).
+"""
+
+import threading
+import time
+
+from command.deadline_timer import get_deadline_timer
+from command.exec_protocol import ExecutionState
+
+# Wall-clock limit for the script part of a run (the REPL has its own idle limit)
+SCRIPT_TIME_LIMIT = 3.0
+# A script that catches ScriptTimeout is interrupted again this often...
+RETRY_INTERVAL = 0.1
+# ...and given up on (_abandon_script) after this many retries
+RETRY_ATTEMPTS = 10
+
+
+class _Supervised:
+    """Supervisor bookkeeping for one live execution"""
+
+    __slots__ = ("executor", "registered_at", "script_started", "script_deadline", "script_entry", "script_done",
+                 "attempts", "repl_deadline", "repl_entry")
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.registered_at = time.time()
+        self.script_started = None
+        self.script_deadline = None  # monotonic
+        self.script_entry = None
+        self.script_done = False
+        self.attempts = 0
+        self.repl_deadline = None  # monotonic
+        self.repl_entry = None
+
+
+class ExecutionSupervisor:
+    """Registry of live executions whose deadlines all live on the shared timer"""
+
+    def __init__(self, timer=None, script_time_limit=SCRIPT_TIME_LIMIT):
+        self._timer = timer
+        self.script_time_limit = script_time_limit
+        self._lock = threading.Lock()
+        self._live = {}  # id(executor) -> _Supervised
+
+        # Counters for /health
+        self.registered = 0
+        self.timeouts = 0
+        self.abandoned = 0
+        self.repl_expired = 0
+
+    @property
+    def timer(self):
+        if self._timer is None:
+            self._timer = get_deadline_timer()
+        return self._timer
+
+    def _record(self, executor):
+        with self._lock:
+            record = self._live.get(id(executor))
+            if record is None:
+                record = self._live[id(executor)] = _Supervised(executor)
+                self.registered += 1
+            return record
+
+    def register(self, executor):
+        """Track a starting execution (idempotent)"""
+        self._record(executor)
+
+    def unregister(self, executor):
+        """Forget a finished execution and cancel anything still scheduled for it"""
+        with self._lock:
+            record = self._live.pop(id(executor), None)
+        if record is not None:
+            record.script_done = True
+            self.timer.cancel(record.script_entry)
+            self.timer.cancel(record.repl_entry)
+
+    # ===== Script time limit =====
+
+    def watch_script(self, executor, limit=None):
+        """The script starts now: kill it if it is still running after limit seconds"""
+        record = self._record(executor)
+        limit = self.script_time_limit if limit is None else limit
+        record.script_done = False
+        record.attempts = 0
+        record.script_started = time.time()
+        record.script_deadline = time.monotonic() + limit
+        record.script_entry = self.timer.schedule(limit, self._script_deadline, record, limit)
+
+    def script_finished(self, executor):
+        """The script ended (normally or not) - stop timing and retrying it"""
+        with self._lock:
+            record = self._live.get(id(executor))
+        if record is not None:
+            record.script_done = True
+            record.script_deadline = None
+            self.timer.cancel(record.script_entry)
+
+    def _script_deadline(self, record, limit):
+        if record.script_done:
+            return
+        executor = record.executor
+        record.script_deadline = None
+        # A script blocked in input() is waiting for the student, not burning time
+        if executor.state == ExecutionState.SCRIPT_RUNNING and not executor.waiting_for_input:
+            elapsed = time.time() - record.script_started
+            print(f"[SCRIPT-TIMEOUT] Script exceeded {limit:g}-second limit (elapsed: {elapsed:.2f}s)")
+            self.timeouts += 1
+            executor._kill_for_timeout(f"Script execution time limit exceeded ({limit:g} seconds)")
+        self._schedule_retry(record)
+
+    def _schedule_retry(self, record):
+        # Student code can swallow one interrupt with a bare except - keep raising until it ends
+        if record.script_done or record.executor.alive:
+            return
+        record.script_entry = self.timer.schedule(RETRY_INTERVAL, self._retry_interrupt, record)
+
+    def _retry_interrupt(self, record):
+        if record.script_done:
+            return
+        executor = record.executor
+        executor._interrupt_script()
+        record.attempts += 1
+        if record.attempts == RETRY_ATTEMPTS:
+            self.abandoned += 1
+            executor._abandon_script()
+        self._schedule_retry(record)
+
+    # ===== REPL idle timeout =====
+
+    def watch_repl(self, executor):
+        """The REPL is active: expire its input channel after repl_timeout seconds without input"""
+        record = self._record(executor)
+        self._schedule_repl(record, executor.repl_timeout)
+
+    def repl_finished(self, executor):
+        with self._lock:
+            record = self._live.get(id(executor))
+        if record is not None:
+            record.repl_deadline = None
+            self.timer.cancel(record.repl_entry)
+
+    def _schedule_repl(self, record, delay):
+        record.repl_deadline = time.monotonic() + delay
+        record.repl_entry = self.timer.schedule(delay, self._repl_deadline, record)
+
+    def _repl_deadline(self, record):
+        """Expire the REPL, or re-arm for the remaining idle time"""
+        executor = record.executor
+        remaining = executor.last_activity + executor.repl_timeout - time.time()
+        if remaining > 0 and executor.alive:
+            self._schedule_repl(record, remaining)
+        else:
+            record.repl_deadline = None
+            self.repl_expired += 1
+            executor.input_queue.expire()
+
+    # ===== Monitoring =====
+
+    def snapshot(self):
+        """One dict per live execution: who, what, which state, and the next deadline"""
+        now = time.monotonic()
+        with self._lock:
+            records = list(self._live.values())
+        rows = []
+        for record in records:
+            executor = record.executor
+            state = getattr(executor, "state", None)
+            rows.append({
+                "cmd_id": executor.cmd_id,
+                "username": executor.username,
+                "script_path": executor.script_path,
+                "backend": type(executor).__name__,
+                "state": state.value if state is not None else None,
+                "alive": executor.alive,
+                "waiting_for_input": bool(executor.waiting_for_input),
+                "age_seconds": round(time.time() - record.registered_at, 1),
+                "script_deadline_in": (round(record.script_deadline - now, 2)
+                                       if record.script_deadline is not None else None),
+                # The timer entry may be older than the last input - report the real expiry
+                "repl_idle_in": (round(executor.last_activity + executor.repl_timeout - time.time(), 1)
+                                 if record.repl_deadline is not None else None),
+                "interrupt_retries": record.attempts,
+                "termination_reason": getattr(executor, "termination_reason", None),
+            })
+        return rows
+
+    def stats(self):
+        with self._lock:
+            live = len(self._live)
+        return {
+            "live": live,
+            "registered": self.registered,
+            "timeouts": self.timeouts,
+            "abandoned": self.abandoned,
+            "repl_expired": self.repl_expired,
+        }
+
+
+# Global instance
+execution_supervisor = ExecutionSupervisor()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Execution Telemetry - Per-run resource usage written to execution_log
+Executors fill a RunStats while the script runs and hand the finished record
+to the TelemetryWriter, which only appends it to an in-memory queue. A single
+background thread turns the queue into multi-row INSERTs, so a run never
+waits on the database and a slow or unavailable database only costs rows,
+never latency.
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+
+from config import Config
+from command.exec_protocol import MessageType
+
+# Characters of stdout/stderr kept with each row
+PREVIEW_CHARS = 500
+# Rows per INSERT; the writer also flushes whatever is queued every flush interval
+BATCH_SIZE = 200
+# Rows held while the database is unreachable - the oldest are dropped beyond this
+MAX_PENDING = 10000
+
+# Row layout shared by the record dicts and the INSERT below
+COLUMNS = (
+    "username", "file_path", "started_at", "duration_ms", "cpu_time_ms", "peak_rss_kb",
+    "output_bytes", "output_lines", "exit_code", "termination_reason", "stdout_preview", "stderr_preview",
+)
+
+# Casts keep all-NULL columns in a batch from being typed as text
+ROW_TEMPLATE = "(%s, %s, %s::float8, %s::int, %s::int, %s::bigint, %s::bigint, %s::int, %s::int, %s, %s, %s)"
+
+INSERT_SQL = """
+    INSERT INTO execution_log (
+        user_id, file_path, execution_time, duration_ms, cpu_time_ms, peak_rss_kb,
+        output_bytes, output_lines, exit_code, termination_reason, stdout_preview, stderr_preview
+    )
+    SELECT u.id, v.file_path, to_timestamp(v.started_at)::timestamp, v.duration_ms, v.cpu_time_ms,
+           v.peak_rss_kb, v.output_bytes, v.output_lines, v.exit_code, v.termination_reason,
+           v.stdout_preview, v.stderr_preview
+    FROM (VALUES %s) AS v(username, file_path, started_at, duration_ms, cpu_time_ms, peak_rss_kb,
+                          output_bytes, output_lines, exit_code, termination_reason,
+                          stdout_preview, stderr_preview)
+    LEFT JOIN users u ON u.username = v.username
+"""
+
+
+def _utf8_length(text):
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+
+class RunStats:
+    """Resource and output counters for one script run"""
+
+    def __init__(self, cpu_clock=time.thread_time):
+        self.cpu_clock = cpu_clock  # None when the caller fills in cpu_time_ms itself
+        self.active = False
+        self.started_at = None
+        self._wall_start = None
+        self._cpu_start = None
+        self.output_bytes = 0
+        self.output_lines = 0
+        self._mid_line = False
+        self.stdout_preview = ""
+        self.stderr_preview = ""
+
+    def start(self):
+        """Call on the thread that runs the script (CPU time is that thread's by default)"""
+        self.started_at = time.time()
+        self._wall_start = time.monotonic()
+        self._cpu_start = self.cpu_clock() if self.cpu_clock else None
+        self.active = True
+
+    def add_message(self, msg_type, data):
+        """Account for a message sent to the client while the script runs"""
+        if not self.active or not data:
+            return
+        if msg_type in (MessageType.STDOUT, MessageType.STDERR):
+            text = str(data)
+            self.output_bytes += _utf8_length(text)
+            self.output_lines += text.count("\n")
+            self._mid_line = not text.endswith("\n")
+            if msg_type == MessageType.STDOUT:
+                if len(self.stdout_preview) < PREVIEW_CHARS:
+                    self.stdout_preview += text[:PREVIEW_CHARS - len(self.stdout_preview)]
+            elif len(self.stderr_preview) < PREVIEW_CHARS:
+                self.stderr_preview += text[:PREVIEW_CHARS - len(self.stderr_preview)]
+        elif msg_type == MessageType.ERROR and not self.stderr_preview:
+            if isinstance(data, dict):
+                data = data.get("traceback") or data.get("error") or ""
+            self.stderr_preview = str(data)[:PREVIEW_CHARS]
+
+    def finish(self, username, file_path, exit_code, reason, peak_rss_kb=None):
+        """Stop counting and return the execution_log record (None if start() was never called)"""
+        if not self.active:
+            return None
+        self.active = False
+        return {
+            "username": username,
+            "file_path": file_path,
+            "started_at": self.started_at,
+            "duration_ms": int((time.monotonic() - self._wall_start) * 1000),
+            "cpu_time_ms": int((self.cpu_clock() - self._cpu_start) * 1000) if self.cpu_clock else None,
+            "peak_rss_kb": peak_rss_kb,
+            "output_bytes": self.output_bytes,
+            "output_lines": self.output_lines + (1 if self._mid_line else 0),
+            "exit_code": exit_code,
+            "termination_reason": reason,
+            "stdout_preview": self.stdout_preview or None,
+            "stderr_preview": self.stderr_preview or None,
+        }
+
+
+class TelemetryWriter(threading.Thread):
+    """Background batch writer for execution_log rows"""
+
+    # Started lazily from inside a run - it serves every run, not the one that started it
+    inherit_executor_context = False
+
+    def __init__(self, write_batch=None, batch_size=BATCH_SIZE, flush_interval=None,
+                 max_pending=MAX_PENDING, enabled=None):
+        super().__init__(daemon=True, name="TelemetryWriter")
+        self.write_batch = write_batch or self._insert_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else Config.TELEMETRY_FLUSH_INTERVAL
+        self.max_pending = max_pending
+        self.enabled = enabled if enabled is not None else Config.EXECUTION_TELEMETRY
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._writing = 0  # Rows taken by the writer but not yet committed
+        self._flushing = 0  # flush() callers waiting - the writer skips its interval for them
+        self._running = False
+
+        # Counters for /health
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def submit(self, record):
+        """Queue one record - O(1), never touches the database"""
+        if not self.enabled or record is None:
+            return
+        with self._cond:
+            if not self._running:
+                self._running = True
+                self.start()
+                atexit.register(self.flush, 2.0)
+            self._pending.append(record)
+            self.submitted += 1
+            if len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is written (or timeout). Returns True when drained."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._writing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def run(self):
+        while True:
+            with self._cond:
+                if len(self._pending) < self.batch_size and not (self._flushing and self._pending):
+                    self._cond.wait(self.flush_interval)
+                if not self._pending:
+                    continue
+                count = min(len(self._pending), self.batch_size)
+                batch = [self._pending.popleft() for _ in range(count)]
+                self._writing = count
+
+            try:
+                self.write_batch([tuple(record.get(column) for column in COLUMNS) for record in batch])
+                self.written += count
+                self.batches += 1
+            except Exception as e:
+                # Telemetry is best effort - losing a batch must not back the queue up
+                self.failed += count
+                print(f"[TELEMETRY] Failed to write {count} execution_log rows: {e}")
+            finally:
+                with self._cond:
+                    self._writing = 0
+                    self._cond.notify_all()
+
+    @staticmethod
+    def _insert_rows(rows):
+        # Imported here: the database module connects on import, which must not happen on a run path
+        from psycopg2.extras import execute_values
+        from common.database import db_manager
+
+        with db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            execute_values(cursor, INSERT_SQL, rows, template=ROW_TEMPLATE, page_size=len(rows))
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "enabled": self.enabled,
+            "pending": pending,
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# Global instance
+telemetry_writer = TelemetryWriter()
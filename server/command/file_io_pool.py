@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+File I/O Pool - Blocking file and database work for WebSocket commands, off the IOLoop
+Opening a file, saving it (with its fsync) or walking a project tree is an
+NFS round trip on EFS, and each save also queries the database. Run on the
+IOLoop, one slow round trip held up every student's output frames. Handlers
+now hand that work to a bounded thread pool and await it.
+
+Work is queued per user: a user has at most one task in flight and the rest
+wait in order, so saves (and a read or run right after a save) never reorder.
+A user's next task goes to the back of the pool's queue, so a save storm from
+one user takes turns with everyone else instead of filling every thread.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from tornado import ioloop
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Queue waits remembered for the /health percentiles
+WAIT_SAMPLES = 1000
+
+
+class FileIOPool:
+    """Bounded thread pool with a FIFO queue per user"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or Config.FILE_IO_WORKERS
+        self._executor = None  # Created on first use
+        self._lock = threading.Lock()
+        self._queues = {}  # user -> deque of waiting tasks; present while the user has a task in flight
+        self._waits = deque(maxlen=WAIT_SAMPLES)  # Seconds from submit to start
+
+        # Counters for /health
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0  # Deepest per-user queue seen
+
+    def submit(self, user, fn, *args):
+        """Run fn(*args) on the pool after the user's earlier tasks. Returns a concurrent Future."""
+        future = Future()
+        task = (future, fn, args, time.monotonic())
+        with self._lock:
+            self.submitted += 1
+            queue = self._queues.get(user)
+            if queue is not None:
+                queue.append(task)
+                self.max_queued = max(self.max_queued, len(queue))
+                return future
+            self._queues[user] = deque()
+        self._dispatch(user, task)
+        return future
+
+    async def run(self, user, fn, *args):
+        """Await fn(*args) from a coroutine on the IOLoop"""
+        return await asyncio.wrap_future(self.submit(user, fn, *args))
+
+    def run_after(self, user, callback, *args):
+        """
+        Call callback(*args) on the IOLoop once the user's queued file work is done,
+        or right away if there is none. Used for commands that read what a queued
+        save writes (running the file), and for everything after them.
+        """
+        with self._lock:
+            queue = self._queues.get(user)
+            if queue is not None:
+                # Runs on the IOLoop - the user's queue only moves on after the callback
+                queue.append((None, callback, args, ioloop.IOLoop.current()))
+                return
+        callback(*args)
+
+    def _dispatch(self, user, task):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="FileIO")
+        self._executor.submit(self._run_task, user, task)
+
+    def _run_task(self, user, task):
+        future, fn, args, submitted_at = task
+        with self._lock:
+            self._waits.append(time.monotonic() - submitted_at)
+        if future.set_running_or_notify_cancel():
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                self.failed += 1
+                future.set_exception(e)
+            else:
+                self.completed += 1
+                future.set_result(result)
+        self._next(user)
+
+    def _run_callback(self, user, callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"File I/O callback failed for {user}: {e}")
+        self._next(user)
+
+    def _next(self, user):
+        with self._lock:
+            queue = self._queues[user]
+            if not queue:
+                del self._queues[user]
+                return
+            task = queue.popleft()
+        if task[0] is None:
+            _, callback, args, io_loop = task
+            io_loop.add_callback(self._run_callback, user, callback, args)
+        else:
+            self._dispatch(user, task)
+
+    def pending(self, user):
+        """Tasks of a user queued or in flight"""
+        with self._lock:
+            queue = self._queues.get(user)
+            return 0 if queue is None else len(queue) + 1
+
+    def stats(self):
+        with self._lock:
+            busy_users = len(self._queues)
+            queued = sum(len(queue) for queue in self._queues.values())
+            waits = sorted(self._waits)
+        return {
+            "workers": self.max_workers,
+            "busy_users": busy_users,
+            "queued": queued,
+            "max_queued": self.max_queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "wait_p99_ms": round(waits[int(len(waits) * 0.99)] * 1000, 1) if waits else None,
+        }
+
+
+# Global instance
+file_io_pool = FileIOPool()
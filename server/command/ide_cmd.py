@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 import os
 import json
+import codecs
 import jedi
 import time
 import asyncio
-import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.process import Subprocess
 from jedi import __version__ as jedi_version
 from packaging.version import Version
 from .utils import convert_path
@@ -14,7 +17,9 @@ from .resource import *
 from .response import response
 from .error_handler import EducationalErrorHandler
 from .working_simple_thread import WorkingSimpleThread
-from .simple_exec_v3 import SimpleExecutorV3  # V3 using Python's code module
+from .worker_pool import create_executor  # Picks pooled worker process or in-process V3
+from .admission import admission_scheduler  # Global/per-user run limits with a fair-share queue
+from .file_io_pool import file_io_pool  # Blocking file work off the IOLoop, in order per user
 from .bug_report_handler import handle_bug_report
 from common.config import Config
 from common.file_storage import file_storage
@@ -55,6 +60,33 @@ for folder_name in default_folders:
             json.dump(config_data, f, indent=4)
 
 
+# jedi is not thread-safe (shared parser and inference caches) - every call goes through this one thread
+_jedi_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jedi")
+
+
+def _complete_python(source, line, column):
+    script = jedi.api.Script(source=source, line=line, column=column)
+    completions = set()
+    for completion in script.completions():
+        completions.add(completion.name)
+    return list(completions)
+
+
+def _complete_file(file_data, file_path, line, column):
+    completions = set()
+    if jedi_is_gt_17:
+        script = jedi.api.Script(
+            code=file_data, path=file_path, project=jedi.api.Project(file_path, added_sys_path=[])
+        )
+        for completion in script.complete(line=line, column=column):
+            completions.add(completion.name)
+    else:
+        script = jedi.api.Script(source=file_data, line=line, column=column, path=file_path)
+        for completion in script.completions():
+            completions.add(completion.name)
+    return list(completions)
+
+
 class IdeCmd(object):
     def __init__(self):
         pass
@@ -235,19 +267,10 @@ print("="*50)
             line = data.get("line", None)
             column = data.get("column", None)
             line = line + 1 if line is not None else line
-            completions = set()
-            if jedi_is_gt_17:
-                script = jedi.api.Script(
-                    code=file_data, path=file_path, project=jedi.api.Project(file_path, added_sys_path=[])
-                )
-                for completion in script.complete(line=line, column=column):
-                    completions.add(completion.name)
-            else:
-                script = jedi.api.Script(source=file_data, line=line, column=column, path=file_path)
-                completions = set()
-                for completion in script.completions():
-                    completions.add(completion.name)
-            await response(client, cmd_id, 0, list(completions))
+            completions = await IOLoop.current().run_in_executor(
+                _jedi_executor, _complete_file, file_data, file_path, line, column
+            )
+            await response(client, cmd_id, 0, completions)
         else:
             await response(client, cmd_id, code, _)
 
@@ -452,7 +475,7 @@ print("="*50)
             # Perform the move operation
             import shutil
 
-            shutil.move(old_full_path, new_full_path)
+            await file_io_pool.run(username, shutil.move, old_full_path, new_full_path)
 
             # Update database records
             try:
@@ -578,7 +601,7 @@ print("="*50)
             # Perform the move operation
             import shutil
 
-            shutil.move(old_full_path, new_full_path)
+            await file_io_pool.run(username, shutil.move, old_full_path, new_full_path)
 
             # Update database records for all files in the moved folder
             try:
@@ -592,7 +615,7 @@ print("="*50)
 
                 if user_id:
                     # Re-sync the user's files to update all paths
-                    file_sync.sync_user_files(user_id, username)
+                    await file_io_pool.run(username, file_sync.sync_user_files, user_id, username)
                     print(f"[IDE_MOVE_FOLDER] Database re-synced for user_id: {user_id}")
 
             except Exception as db_error:
@@ -615,11 +638,9 @@ print("="*50)
         line = data.get("line", None)
         column = data.get("column", None)
         line = line + 1 if line is not None else line
-        script = jedi.api.Script(source=source, line=line, column=column)
-        completions = set()
-        for completion in script.completions():
-            completions.add(completion.name)
-        await response(client, cmd_id, 0, list(completions))
+        # jedi parses on its own thread, one request at a time - the dispatcher caps how many queue for it
+        completions = await IOLoop.current().run_in_executor(_jedi_executor, _complete_python, source, line, column)
+        await response(client, cmd_id, 0, completions)
 
     async def run_pip_command(self, client, cmd_id, data):
         command = data.get("command")
@@ -653,7 +674,7 @@ print("="*50)
                     # cmd = [Config.PYTHON, '-u', '-m', List[0], List[1], '{} {}'.format(' '.join(List[2:]), ' '.join(options))]
                 else:
                     return await response(client, cmd_id, 1111, "cmd error")
-            client.handler_info.set_subprogram(cmd_id, SubProgramThread(cmd, cmd_id, client, asyncio.get_event_loop()))
+            client.handler_info.set_subprogram(cmd_id, SubProgram(cmd, cmd_id, client))
             await response(client, cmd_id, 0, None)
             client.handler_info.start_subprogram(cmd_id)
 
@@ -689,7 +710,7 @@ print("="*50)
                 # Create executor first so we can pass reference to lock manager
                 thread = None
                 try:
-                    thread = SimpleExecutorV3(
+                    thread = create_executor(
                         cmd_id,
                         client,
                         asyncio.get_event_loop(),
@@ -735,12 +756,22 @@ print("="*50)
                 # Use the working implementation with byte-by-byte reading
                 cmd = [Config.PYTHON, "-u", file_path]
                 # print(f"[BACKEND-DEBUG] Using WorkingSimpleThread for Python execution")
-                thread = WorkingSimpleThread(cmd, cmd_id, client, asyncio.get_event_loop())
+                thread = WorkingSimpleThread(cmd, cmd_id, client, asyncio.get_event_loop(), username=username)
 
             # print(f"[BACKEND-DEBUG] Thread created for cmd_id: {cmd_id}")
             # Ensure clean state before setting new subprogram
             client.handler_info.set_subprogram(cmd_id, thread)
             await response(client, cmd_id, 0, None)
+            if use_hybrid:
+                # Starts now or waits its turn for an execution slot
+                if not admission_scheduler.submit(thread, username):
+                    client.handler_info.remove_subprogram(cmd_id)
+                    # The run never starts, so nothing else would free the file for the next attempt
+                    execution_lock_manager.release_execution_lock(username, file_path, cmd_id)
+                    await response(
+                        client, cmd_id, -1, "The server is at capacity right now. Please try running again shortly."
+                    )
+                return
             # print(f"[BACKEND-DEBUG] Starting new subprocess for cmd_id: {cmd_id}")
             client.handler_info.start_subprogram(cmd_id)
         else:
@@ -783,11 +814,20 @@ print("="*50)
         username = data.get("username", "unknown")
         # print(f"[BACKEND-DEBUG] Starting empty Python REPL for project: {prj_name}")
 
-        # Create SimpleExecutorV3 thread without script (empty REPL)
+        # Create executor without script (empty REPL)
         role = data.get("role", "student")  # Get user role
-        thread = SimpleExecutorV3(cmd_id, client, asyncio.get_event_loop(), script_path=None, username=username, role=role)
+        thread = create_executor(
+            cmd_id, client, asyncio.get_event_loop(), script_path=None, username=username, role=role
+        )
         # print(f"[BACKEND-DEBUG] Empty REPL thread created for cmd_id: {cmd_id}")
 
+        # No script to run, so no run slot - but the open REPL holds a REPL slot until it exits
+        if not admission_scheduler.open_repl(thread, username):
+            await response(
+                client, cmd_id, -1, "The server is at capacity right now. Please try opening the console again shortly."
+            )
+            return
+
         # Register the thread
         client.handler_info.set_subprogram(cmd_id, thread)
         await response(client, cmd_id, 0, "repl_started")
@@ -808,29 +848,47 @@ print("="*50)
             await response(client, cmd_id, 1, "REPL not found")
 
 
-class SubProgramThread(threading.Thread):
-    def __init__(self, cmd, cmd_id, client, event_loop):
-        super(SubProgramThread, self).__init__()
+class SubProgram(object):
+    """
+    A command-line program (pip) whose output is read on the IOLoop.
+    No thread per command: the pipe is registered with the IOLoop, so output is
+    handled as soon as it is readable and an idle command costs one descriptor.
+    """
+
+    # Bytes per read - whatever is available up to this is handled at once
+    READ_CHUNK = 64 * 1024
+
+    def __init__(self, cmd, cmd_id, client):
         self.cmd = cmd
         self.cmd_id = cmd_id
         self.client = client
         self.alive = True
-        self.daemon = True
-        self.event_loop = event_loop
+        self.running = False
         self.p = None
         self.error_handler = EducationalErrorHandler()
         self.error_buffer = []
 
+    def start(self):
+        """Called on the IOLoop, like Thread.start() for the other subprograms"""
+        self.running = True
+        IOLoop.current().spawn_callback(self.run)
+
+    def is_alive(self):
+        return self.running
+
+    def join(self, timeout=None):
+        # Nothing to wait for: stop() kills the process and the reader ends on the IOLoop
+        pass
+
     def stop(self):
         self.alive = False
         if self.p:
             try:
-                self.p.kill()
+                self.p.proc.kill()
             except (OSError, ProcessLookupError, AttributeError) as e:
                 # Process might have already terminated
                 print(f"[IDE-CMD] Could not kill process: {e}")
                 pass
-            self.p = None
 
     def response_to_client(self, code, stdout):
         if stdout:
@@ -849,75 +907,71 @@ class SubProgramThread(threading.Thread):
                 # Normal output
                 IOLoop.current().spawn_callback(response, self.client, self.cmd_id, code, {"stdout": stdout})
 
-    def run_python_program(self):
+    async def run_python_program(self):
         start_time = time.time()
-        p = None
-        asyncio.set_event_loop(self.event_loop)
         print("[{}-Program {} is start]".format(self.client.id, self.cmd_id))
         try:
-            p = subprocess.Popen(
-                self.cmd, shell=False, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-            )
+            p = Subprocess(self.cmd, stdout=Subprocess.STREAM, stderr=subprocess.STDOUT)
             self.p = p
-            while self.alive and p.poll() is None:
+            exit_future = p.wait_for_exit(raise_error=False)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            pending = ""
+            while True:
+                try:
+                    chunk = await p.stdout.read_bytes(self.READ_CHUNK, partial=True)
+                except StreamClosedError:
+                    break
                 if not self.client.connected:
                     self.alive = False
-                    p.kill()
+                    p.proc.kill()
                     self.client.handler_info.remove_subprogram(self.cmd_id)
                     print("[{}-Program {} is kill][client is disconnect]".format(self.client.id, self.cmd_id))
                     return
-                stdout = p.stdout.readline()
-                stdout = stdout.strip()
-                self.response_to_client(0, stdout)
-                time.sleep(0.002)
+                pending += decoder.decode(chunk)
+                lines = pending.split("\n")
+                pending = lines.pop()
+                for line in lines:
+                    self.response_to_client(0, line.strip())
             if not self.alive:
                 self.response_to_client(1111, "[program is terminate]")
-                p.kill()
                 self.client.handler_info.remove_subprogram(self.cmd_id)
                 print("[{}-Program {} is terminate]".format(self.client.id, self.cmd_id))
                 return
-            try:
-                stdout = p.stdout.read()
-                # Process any remaining error buffer
-                if self.error_buffer:
-                    full_error = (
-                        "\n".join(self.error_buffer) + "\n" + stdout if stdout else "\n".join(self.error_buffer)
-                    )
-                    enhanced_output = self.error_handler.process_error_output(full_error)
-                    self.response_to_client(0, enhanced_output)
-                    self.error_buffer = []
-                else:
-                    self.response_to_client(0, stdout)
-            except (IOError, OSError, AttributeError) as e:
-                # Error reading stdout or processing response
-                print(f"[IDE-CMD] Error processing output: {e}")
-                pass
+            returncode = await exit_future
+            stdout = (pending + decoder.decode(b"", final=True)).strip()
+            # Process any remaining error buffer
+            if self.error_buffer:
+                full_error = "\n".join(self.error_buffer) + "\n" + stdout if stdout else "\n".join(self.error_buffer)
+                enhanced_output = self.error_handler.process_error_output(full_error)
+                self.error_buffer = []
+                self.response_to_client(0, enhanced_output)
+            else:
+                self.response_to_client(0, stdout)
             if self.client.connected:
-                stdout = "[Program exit with code {code}]".format(code=p.returncode)
+                stdout = "[Program exit with code {code}]".format(code=returncode)
             else:
                 stdout = "[Finish in {second:.2f}s with exit code {code}]".format(
-                    second=time.time() - start_time, code=p.returncode
+                    second=time.time() - start_time, code=returncode
                 )
             self.response_to_client(1111, stdout)
             self.client.handler_info.remove_subprogram(self.cmd_id)
-            if p.returncode == 0:
+            if returncode == 0:
                 print("{}-Program {} success".format(self.client.id, self.cmd_id))
-                p.kill()
                 return "ok"
             else:
                 print("{}-Program {} failed".format(self.client.id, self.cmd_id))
-                p.kill()
                 return "failed"
         except Exception as e:
             print("[{}-Program {} is exception], {}".format(self.client.id, self.cmd_id, e))
             self.response_to_client(1111, "[Program is exception], {}".format(e))
         finally:
-            try:
-                p.kill()
-            except (OSError, ProcessLookupError, AttributeError) as e:
-                # Process might have already terminated
-                print(f"[IDE-CMD] Could not kill process in finally: {e}")
-                pass
+            if self.p and self.p.proc.returncode is None:
+                try:
+                    self.p.proc.kill()
+                except (OSError, ProcessLookupError) as e:
+                    # Process might have already terminated
+                    print(f"[IDE-CMD] Could not kill process in finally: {e}")
+                    pass
             try:
                 self.client.handler_info.remove_subprogram(self.cmd_id)
             except (AttributeError, KeyError, ValueError) as e:
@@ -925,11 +979,11 @@ class SubProgramThread(threading.Thread):
                 print(f"[IDE-CMD] Could not remove subprogram from handler: {e}")
                 pass
 
-    def run(self):
-        self.alive = True
+    async def run(self):
         try:
-            self.run_python_program()
+            await self.run_python_program()
         except Exception as e:
             print(e)
             pass
+        self.running = False
         self.alive = False
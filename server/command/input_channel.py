@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Input Channel - Lines typed by the student, delivered to input() and the REPL
+Waiters block on a single condition and wake only when a line arrives, the
+executor is stopped, or the REPL idle timer expires - no polling.
+"""
+
+import threading
+from collections import deque
+from queue import Empty
+
+
+class InputClosed(EOFError):
+    """The executor was stopped while waiting for input"""
+
+
+class InputIdleTimeout(Exception):
+    """The REPL saw no activity for its idle timeout"""
+
+
+class InputChannel:
+    """Per-executor input lines with blocking, wake-on-event reads"""
+
+    def __init__(self):
+        self._lines = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._expired = False
+        # input() calls currently waiting - the REPL loop leaves lines to them
+        self._input_waiters = 0
+
+    def put(self, text):
+        with self._cond:
+            if self._closed:
+                return
+            self._lines.append(text)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Next line for input(). Raises queue.Empty after timeout seconds and
+        InputClosed once the executor is stopped.
+        """
+        with self._cond:
+            self._input_waiters += 1
+            try:
+                if not self._cond.wait_for(lambda: self._lines or self._closed, timeout):
+                    raise Empty
+                if self._closed:
+                    raise InputClosed("Execution stopped")
+                return self._lines.popleft()
+            finally:
+                self._input_waiters -= 1
+                # A REPL waiter may have been holding back for us
+                self._cond.notify_all()
+
+    def get_command(self):
+        """
+        Next line for the REPL loop. Blocks with no timeout; raises InputIdleTimeout
+        after expire() and InputClosed after close().
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._closed or self._expired or (self._lines and not self._input_waiters)
+            )
+            if self._closed:
+                raise InputClosed("Execution stopped")
+            if self._expired:
+                raise InputIdleTimeout()
+            return self._lines.popleft()
+
+    def expire(self):
+        """Called by the idle timer: end the REPL's wait"""
+        with self._cond:
+            self._expired = True
+            self._cond.notify_all()
+
+    def close(self):
+        """Wake every waiter and drop pending lines. Returns how many were dropped."""
+        with self._cond:
+            self._closed = True
+            dropped = len(self._lines)
+            self._lines.clear()
+            self._cond.notify_all()
+            return dropped
+
+    def empty(self):
+        with self._cond:
+            return not self._lines
+
+    def qsize(self):
+        with self._cond:
+            return len(self._lines)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Loop Detector - Streaming infinite-loop detection over script output
+Enforces the four output layers (rate, total, identical lines, flood) at a
+small constant cost per chunk: newlines are counted with str.count, lines are
+compared by rolling CRC32 keys (so a line split across chunks still counts as
+one), runs of identical lines are measured with startswith/endswith instead of
+splitting, and rates come from sliding windows over fixed ring buffers.
+"""
+
+import re
+import time
+import zlib
+
+PREVIEW_CHARS = 100
+
+# Whitespace-only lines (the same lines str.strip() would empty)
+_BLANK_LINES = re.compile(r"^[^\S\n]*\n", re.MULTILINE)
+
+
+class SlidingCounter:
+    """Sum of amounts added in the last `window` seconds, kept in a ring of buckets"""
+
+    def __init__(self, window, buckets=10):
+        self.window = window
+        self.width = window / buckets
+        self._ring = [0] * buckets
+        self._bucket = None  # Absolute index of the newest bucket
+        self.total = 0
+
+    def _advance(self, now):
+        bucket = int(now / self.width)
+        if self._bucket is None:
+            self._bucket = bucket
+            return
+        gap = bucket - self._bucket
+        if gap <= 0:
+            return
+        size = len(self._ring)
+        if gap >= size:
+            self._ring = [0] * size
+            self.total = 0
+        else:
+            for step in range(1, gap + 1):
+                slot = (self._bucket + step) % size
+                self.total -= self._ring[slot]
+                self._ring[slot] = 0
+        self._bucket = bucket
+
+    def add(self, now, amount):
+        self._advance(now)
+        self._ring[self._bucket % len(self._ring)] += amount
+        self.total += amount
+        return self.total
+
+
+def _line_key(line):
+    return zlib.crc32(line.encode("utf-8", "surrogatepass")), len(line)
+
+
+def _repeat_count(text, unit, start=None, end=None):
+    """Largest k such that unit * k is a prefix of text[start:] (or suffix of text[:end])"""
+    if start is not None:
+        available = len(text) - start
+        matches = lambda k: text.startswith(unit * k, start)  # noqa: E731
+    else:
+        available = end
+
+        def matches(k):
+            # The run must start at a line boundary, not inside a longer line ending the same way
+            run_start = end - k * len(unit)
+            return text.endswith(unit * k, 0, end) and (run_start == 0 or text[run_start - 1] == "\n")
+    low, high = 1, available // len(unit)
+    # Common case for a runaway loop: the whole span is one repeated unit
+    if high > 1 and matches(high):
+        return high
+    high -= 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if matches(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class LoopDetector:
+    """
+    Incremental output checker. feed() returns a reason string when a limit is
+    exceeded, otherwise None. Blank lines never count towards identical runs.
+    """
+
+    def __init__(self, max_lines_per_second=100, max_total_lines=10000, max_identical_lines=500,
+                 flood_chars=4000, flood_lines=50, flood_window=0.5, rate_window=1.0,
+                 min_rate_span=0.5, clock=time.monotonic):
+        self.max_lines_per_second = max_lines_per_second
+        self.max_total_lines = max_total_lines
+        self.max_identical_lines = max_identical_lines
+        self.flood_chars = flood_chars
+        self.flood_lines = flood_lines
+        self.min_rate_span = min_rate_span
+        self.clock = clock
+
+        self.started = clock()
+        self.total_lines = 0
+        self.total_chars = 0
+        self._rate_lines = SlidingCounter(rate_window)
+        self._flood_lines = SlidingCounter(flood_window)
+        self._flood_chars = SlidingCounter(flood_window)
+
+        # Identical-line state: key (crc32, length) and preview of the last non-blank line
+        self.last_line_key = None
+        self.last_line_preview = None
+        self.identical_count = 0
+
+        # Line still being written (output ended without a newline)
+        self.mid_line = False
+        self._partial_crc = 0
+        self._partial_len = 0
+        self._partial_blank = True
+        self._partial_preview = ""
+
+    # ===== identical lines =====
+
+    def _observe(self, key, preview, count):
+        """Record `count` consecutive copies of a non-blank line; returns a reason at the limit"""
+        if key == self.last_line_key:
+            self.identical_count += count
+        else:
+            self.last_line_key = key
+            self.last_line_preview = preview
+            self.identical_count = count
+        if self.identical_count >= self.max_identical_lines:
+            return (f"Identical line repeated {self.identical_count} times: "
+                    f"'{self.last_line_preview[:PREVIEW_CHARS]}...'")
+        return None
+
+    def _finish_partial(self, head):
+        """Complete the line that started in an earlier chunk with head (text before the newline)"""
+        blank = self._partial_blank and not head.strip()
+        key = (zlib.crc32(head.encode("utf-8", "surrogatepass"), self._partial_crc), self._partial_len + len(head))
+        preview = (self._partial_preview + head[:PREVIEW_CHARS])[:PREVIEW_CHARS]
+        self._partial_crc, self._partial_len, self._partial_blank, self._partial_preview = 0, 0, True, ""
+        if blank:
+            return None
+        return self._observe(key, preview, 1)
+
+    def _extend_partial(self, fragment):
+        self._partial_crc = zlib.crc32(fragment.encode("utf-8", "surrogatepass"), self._partial_crc)
+        if self._partial_len < PREVIEW_CHARS:
+            self._partial_preview += fragment[:PREVIEW_CHARS - self._partial_len]
+        self._partial_len += len(fragment)
+        self._partial_blank = self._partial_blank and not fragment.strip()
+
+    def _observe_lines(self, body):
+        """body is one or more complete lines, each ending in a newline"""
+        # Blank lines neither count nor break a run - drop them in one C-level pass
+        body = _BLANK_LINES.sub("", body)
+        if not body:
+            return None
+
+        if body.count("\n") >= self.max_identical_lines:
+            # Only a chunk with that many lines can hold a whole run in its middle - check them all
+            for line in body.split("\n")[:-1]:
+                reason = self._observe(_line_key(line), line, 1)
+                if reason:
+                    return reason
+            return None
+
+        # Trailing run: the last line repeated up to the end of the chunk
+        tail_start = body.rfind("\n", 0, len(body) - 1) + 1
+        tail_line = body[tail_start:-1]
+        tail_count = _repeat_count(body, body[tail_start:], end=len(body))
+        run_start = len(body) - tail_count * (len(tail_line) + 1)
+
+        if run_start > 0:
+            # Other lines come first - the run at the start may continue the previous chunk's run
+            head_end = body.find("\n")
+            head_line = body[:head_end]
+            head_count = _repeat_count(body, body[:head_end + 1], start=0)
+            reason = self._observe(_line_key(head_line), head_line, head_count)
+            if reason:
+                return reason
+            # Runs between the two are shorter than the limit - they only break the run
+            self.last_line_key = None
+
+        return self._observe(_line_key(tail_line), tail_line, tail_count)
+
+    # ===== entry point =====
+
+    def feed(self, text, now=None):
+        """Account for one output chunk; returns a reason to terminate, or None"""
+        if not text:
+            return None
+        now = self.clock() if now is None else now
+
+        newlines = text.count("\n")
+        ends_mid_line = not text.endswith("\n")
+        # Lines started by this chunk: a line split across chunks counts once
+        line_count = newlines + (1 if ends_mid_line else 0) - (1 if self.mid_line else 0)
+        starts_mid_line = self.mid_line
+        self.mid_line = ends_mid_line
+
+        self.total_lines += line_count
+        self.total_chars += len(text)
+        window_lines = self._rate_lines.add(now, line_count)
+        flood_lines = self._flood_lines.add(now, line_count)
+        flood_chars = self._flood_chars.add(now, len(text))
+
+        # Layer 1: output rate over the sliding window
+        elapsed = now - self.started
+        if elapsed >= self.min_rate_span:
+            rate = window_lines / min(self._rate_lines.window, elapsed)
+            if rate > self.max_lines_per_second:
+                return f"Output rate limit exceeded: {rate:.1f} lines/sec (limit: {self.max_lines_per_second}/sec)"
+
+        # Layer 2: total output
+        if self.total_lines > self.max_total_lines:
+            return f"Total output limit exceeded: {self.total_lines} lines (limit: {self.max_total_lines})"
+
+        # Layer 3: identical lines
+        if newlines == 0:
+            self._extend_partial(text)
+        else:
+            first_newline = text.find("\n")
+            last_newline = text.rfind("\n") if newlines > 1 else first_newline
+            head = text[:first_newline]
+            if starts_mid_line:
+                reason = self._finish_partial(head)
+            elif head.strip():
+                reason = self._observe(_line_key(head), head, 1)
+            else:
+                reason = None
+            if reason:
+                return reason
+            if last_newline > first_newline:
+                reason = self._observe_lines(text[first_newline + 1:last_newline + 1])
+                if reason:
+                    return reason
+            if ends_mid_line:
+                self._extend_partial(text[last_newline + 1:])
+
+        # Layer 4: flood (lots of text and lines in a short burst)
+        if flood_chars >= self.flood_chars and flood_lines >= self.flood_lines:
+            span = min(self._flood_chars.window, elapsed)
+            return f"Flood detected: {flood_lines} lines in {span:.2f} seconds"
+
+        return None
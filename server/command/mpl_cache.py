@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Matplotlib Cache - One prebuilt config/font cache shared by every run
+Matplotlib keeps its font list in MPLCONFIGDIR and, the first time a process
+imports it with an empty directory, builds that list by scanning every
+installed font - seconds of work. The server builds the cache once at startup
+in a helper process and every run (thread backend and pool workers alike)
+points MPLCONFIGDIR at it, so a student's first plt.plot only loads a JSON
+file. When the shared directory is not writable by a process (read-only image,
+different user) that process gets a private overlay that links the prebuilt
+files, since matplotlib refuses a config directory it cannot write to.
+"""
+
+import atexit
+import glob
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+
+# Generous: a cold build scans every font on the system
+BUILD_TIMEOUT = 120
+
+# Run with MPLCONFIGDIR pointing at the shared directory; importing
+# font_manager loads the font list, or builds and saves it when missing/stale
+_BUILD_SCRIPT = """
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import font_manager
+font_manager.fontManager.findfont("DejaVu Sans")
+"""
+
+
+def _default_cache_dir():
+    # Not under the temp dir: health_monitor deletes temp files older than an hour
+    return Config.MPL_CACHE_DIR or os.path.join(os.path.expanduser("~"), ".cache", "pythonide", "matplotlib")
+
+
+class MplCache:
+    """The shared MPLCONFIGDIR and the per-process directory runs actually use"""
+
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir
+        self._config_dir = None  # Resolved once per process
+        self._lock = threading.Lock()
+
+        self.ready = False
+        self.build_seconds = None
+        self.overlay = False
+
+    @property
+    def cache_dir(self):
+        if self._cache_dir is None:
+            self._cache_dir = _default_cache_dir()
+        return self._cache_dir
+
+    def build(self, timeout=BUILD_TIMEOUT):
+        """Build (or validate) the shared font cache. Returns True when it is ready."""
+        if importlib.util.find_spec("matplotlib") is None:
+            print("[MPL-CACHE] matplotlib is not installed, no font cache to build")
+            return False
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"[MPL-CACHE] Cannot create {self.cache_dir}: {e}")
+            return False
+
+        started = time.time()
+        env = dict(os.environ, MPLCONFIGDIR=self.cache_dir, MPLBACKEND="Agg")
+        try:
+            # A separate process keeps matplotlib out of the server's own memory
+            result = subprocess.run([sys.executable, "-c", _BUILD_SCRIPT], env=env,
+                                    capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[MPL-CACHE] Font cache build failed: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"[MPL-CACHE] Font cache build failed: {result.stderr.strip()[-500:]}")
+            return False
+
+        self.build_seconds = time.time() - started
+        self.ready = bool(glob.glob(os.path.join(self.cache_dir, "fontlist-*.json")))
+        print(f"[MPL-CACHE] Font cache ready in {self.cache_dir} ({self.build_seconds:.2f}s)")
+        return self.ready
+
+    def config_dir(self):
+        """MPLCONFIGDIR for runs in this process: the shared directory, or an overlay of it"""
+        if self._config_dir is None:
+            with self._lock:
+                if self._config_dir is None:
+                    self._config_dir = self._resolve()
+        return self._config_dir
+
+    def _resolve(self):
+        shared = self.cache_dir
+        try:
+            os.makedirs(shared, exist_ok=True)
+        except OSError:
+            pass
+        if os.path.isdir(shared) and os.access(shared, os.W_OK):
+            return shared
+        return self._make_overlay(shared)
+
+    def _make_overlay(self, shared):
+        """Private writable directory whose files link to the prebuilt ones"""
+        overlay = tempfile.mkdtemp(prefix="mpl_overlay_")
+        try:
+            for name in os.listdir(shared):
+                source = os.path.join(shared, name)
+                if os.path.isfile(source):
+                    os.symlink(source, os.path.join(overlay, name))
+        except OSError as e:
+            # An empty overlay still works - matplotlib builds its font list there once
+            print(f"[MPL-CACHE] Could not link {shared} into overlay: {e}")
+        atexit.register(shutil.rmtree, overlay, True)
+        self.overlay = True
+        print(f"[MPL-CACHE] {shared} is not writable, using overlay {overlay}")
+        return overlay
+
+    def activate(self):
+        """Point this process (and every process it starts afterwards) at the cache"""
+        os.environ["MPLBACKEND"] = "Agg"
+        os.environ["MPLCONFIGDIR"] = self.config_dir()
+
+    def stats(self):
+        return {
+            "dir": self.config_dir() if self._config_dir else self.cache_dir,
+            "ready": self.ready,
+            "overlay": self.overlay,
+            "build_seconds": round(self.build_seconds, 2) if self.build_seconds is not None else None,
+        }
+
+
+# Global instance
+mpl_cache = MplCache()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Outbound Queue - Per-executor coalescing queue for repl_output messages
+Executor threads enqueue messages; the IOLoop drains them once per tick, merging
+consecutive STDOUT (or STDERR) text into a single frame. Control messages
+(INPUT_REQUEST, ERROR, COMPLETE, ...) are never merged and keep their order.
+"""
+
+import json
+import threading
+
+from command.client_outbox import client_outboxes, truncated_text
+from command.exec_protocol import MessageType, create_message
+
+# Largest amount of text merged into one stdout/stderr frame
+MAX_FRAME_CHARS = 64 * 1024
+
+_MERGEABLE = (MessageType.STDOUT, MessageType.STDERR)
+
+
+class OutboundQueue:
+    """Coalesces an executor's messages and sends them from the event loop"""
+
+    def __init__(self, client, event_loop, cmd_id, max_frame_chars=MAX_FRAME_CHARS):
+        self.client = client
+        self.event_loop = event_loop
+        self.cmd_id = cmd_id
+        self.max_frame_chars = max_frame_chars
+
+        # Pending items are [msg_type, data, size]; data is a list of text parts for stdout/stderr
+        self._pending = []
+        self._lock = threading.Lock()
+        self._drain_scheduled = False
+
+        # Counters for monitoring how much coalescing saves
+        self.messages_in = 0
+        self.frames_out = 0
+        self.wakeups = 0
+
+    def put(self, msg_type: MessageType, data):
+        """Queue a message (any thread). Wakes the event loop at most once per tick."""
+        with self._lock:
+            self.messages_in += 1
+            if msg_type in _MERGEABLE:
+                text = str(data)
+                last = self._pending[-1] if self._pending else None
+                if last is not None and last[0] == msg_type and last[2] + len(text) <= self.max_frame_chars:
+                    last[1].append(text)
+                    last[2] += len(text)
+                else:
+                    self._pending.append([msg_type, [text], len(text)])
+            else:
+                self._pending.append([msg_type, data, 0])
+
+            if self._drain_scheduled:
+                return
+            self._drain_scheduled = True
+
+        try:
+            self.event_loop.call_soon_threadsafe(self._drain)
+        except Exception as e:
+            print(f"[OUTBOUND-QUEUE] ERROR scheduling drain for {self.cmd_id}: {e}")
+            with self._lock:
+                self._drain_scheduled = False
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _drain(self):
+        """Runs on the event loop: send everything queued since the last tick"""
+        with self._lock:
+            items, self._pending = self._pending, []
+            self._drain_scheduled = False
+            self.wakeups += 1
+
+        for msg_type, data, _size in items:
+            if msg_type in _MERGEABLE:
+                data = "".join(data)
+            message = create_message(self.cmd_id, msg_type, data)
+            message["cmd"] = "repl_output"
+            try:
+                if self.client and hasattr(self.client, 'write_message'):
+                    outbox = client_outboxes.get(self.client)
+                    if msg_type in _MERGEABLE:
+                        # Output may be dropped if the browser falls behind; control messages never are
+                        outbox.put(json.dumps(message), self, self._truncation_notice)
+                    else:
+                        outbox.put(json.dumps(message))
+                    self.frames_out += 1
+                else:
+                    print("[OUTBOUND-QUEUE] ERROR: Client not available or invalid")
+            except Exception as e:
+                print(f"[OUTBOUND-QUEUE] ERROR sending message: {e}")
+                print(f"[OUTBOUND-QUEUE] cmd_id: {self.cmd_id}, msg_type: {msg_type}")
+
+    def _truncation_notice(self, dropped_bytes):
+        message = create_message(self.cmd_id, MessageType.STDOUT, truncated_text(dropped_bytes))
+        message["cmd"] = "repl_output"
+        return json.dumps(message)
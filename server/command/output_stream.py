@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Output Stream - Streaming stdout/stderr sink for script execution
+Replaces per-run StringIO capture: text is forwarded to the WebSocket in
+bounded chunks while the script is still running, so students see progress
+and the server never holds a whole run's output in memory.
+"""
+
+import io
+import sys
+import threading
+import time
+
+from command.exec_protocol import MessageType
+
+# Send as soon as this much text is pending
+MAX_CHUNK_CHARS = 4096
+# Pending text (complete or partial lines) never waits longer than this
+FLUSH_INTERVAL = 0.005
+
+
+class _StreamFlusher(threading.Thread):
+    """Single background thread that flushes streams with text left pending"""
+
+    # Often first started from inside a run - it serves every executor, not that one
+    inherit_executor_context = False
+
+    def __init__(self, interval=FLUSH_INTERVAL):
+        super().__init__(daemon=True, name="OutputStream-Flusher")
+        self.interval = interval
+        self._pending = set()
+        self._cond = threading.Condition()
+
+    def schedule(self, stream):
+        with self._cond:
+            if stream not in self._pending:
+                self._pending.add(stream)
+                self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let a few more writes pile up before sending
+            time.sleep(self.interval)
+            with self._cond:
+                due, self._pending = self._pending, set()
+            for stream in due:
+                try:
+                    stream.flush()
+                except Exception as e:
+                    print(f"[OUTPUT-STREAM] Error flushing pending output: {e}")
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _get_flusher():
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = _StreamFlusher()
+            _flusher.start()
+        return _flusher
+
+
+class OutputStream(io.TextIOBase):
+    """
+    File-like sink installed as sys.stdout/sys.stderr during execution.
+    Chunks go through executor.send_message, so the infinite loop
+    detectors see output as it is produced rather than after exec() returns.
+    """
+
+    def __init__(self, executor, msg_type=MessageType.STDOUT,
+                 max_chunk=MAX_CHUNK_CHARS, flush_interval=FLUSH_INTERVAL, lock=None):
+        super().__init__()
+        self.executor = executor
+        self.msg_type = msg_type
+        self.max_chunk = max_chunk
+        self.flush_interval = flush_interval
+        self._parts = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        # stdout and stderr of one run share a lock so flushing one from the other cannot deadlock
+        self._lock = lock or threading.RLock()
+        # The other stream of the same run - its pending text is sent first to keep interleaving intact
+        self.sibling = None
+        self._delivering = False
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if not text:
+            return 0
+        # Once the run is stopped nothing more is delivered - do not buffer it either
+        if not self.executor.alive:
+            return len(text)
+
+        with self._lock:
+            if self._delivering or (self.sibling is not None and self.sibling._delivering):
+                # Written by the server itself while a chunk is being sent (detector and
+                # send logging) - that belongs in the server log, not the student's console
+                sys.__stdout__.write(text)
+                return len(text)
+            if self.sibling is not None and self.sibling._parts:
+                self.sibling.flush()
+            self._parts.append(text)
+            self._size += len(text)
+            if self._size >= self.max_chunk:
+                self.flush()
+            elif "\n" in text and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            else:
+                _get_flusher().schedule(self)
+        return len(text)
+
+    def flush(self):
+        """Send everything pending, split into chunks of at most max_chunk characters"""
+        with self._lock:
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts = []
+            self._size = 0
+            self._last_flush = time.monotonic()
+
+            self._delivering = True
+            try:
+                for start in range(0, len(text), self.max_chunk):
+                    if not self.executor.alive:
+                        break
+                    self.executor.send_message(self.msg_type, text[start:start + self.max_chunk])
+            finally:
+                self._delivering = False
+
+    def pending(self):
+        return self._size
@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
+import json
+from functools import partial
+
 from common.msg import req_get, res_get, res_put, REQ_QUE, RES_QUE
+from .client_outbox import client_outboxes, truncated_text
 from .command import Command
+from .request_dispatcher import request_dispatcher
 from utils.log import logger
 
 
@@ -25,24 +30,39 @@ class RequestProcessor(object):
             }
             await res_put(item.client, msg)
 
+    async def _process_and_done(self, item):
+        try:
+            await self._process(item)
+        finally:
+            REQ_QUE.task_done()
+
     async def loop(self):
         print("request processor loop")
         while True:
             try:
                 item = await req_get()
-                await self._process(item)
-                REQ_QUE.task_done()
+                # Runs alongside other clients' commands, after this client's earlier ones
+                request_dispatcher.submit(item.client, item.data.get("cmd", None), self._process_and_done, item)
             except Exception as e:
                 print("request processor ex: {}".format(e))
 
 
+def _truncation_notice(cmd_id, dropped_bytes):
+    return json.dumps({"type": "response", "id": cmd_id, "code": 0, "data": {"stdout": truncated_text(dropped_bytes)}})
+
+
 class ResponseProcessor(object):
     def __init__(self) -> None:
         pass
 
     async def _process(self, item):
         if item.client and item.client.connected:
-            item.client.write_message(item.data)
+            # Bounded per connection - a slow browser cannot make the server buffer without limit
+            outbox = client_outboxes.get(item.client)
+            if item.output_of is not None:
+                outbox.put(item.data, ("response", item.output_of), partial(_truncation_notice, item.output_of))
+            else:
+                outbox.put(item.data)
 
     async def loop(self):
         print("response processor loop")
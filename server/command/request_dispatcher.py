@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Request Dispatcher - Runs queued IDE commands concurrently, in order per client
+RequestProcessor used to await each command before taking the next one off
+REQ_QUE, so one slow folder move or autocomplete held up every other user's
+commands. Each client connection now has its own FIFO: its commands still run
+one after another, in the order sent, while different clients' commands run
+side by side up to an overall limit. Commands that are expensive to run many
+at once (autocomplete, moves, pip) also have a cap of their own.
+"""
+
+from collections import defaultdict, deque
+from datetime import timedelta
+import time
+
+from tornado import ioloop, locks
+
+from config import Config
+
+
+def parse_command_limits(spec):
+    """'autocomplete_python:4,ide_move_folder:2' -> {'autocomplete_python': 4, 'ide_move_folder': 2}"""
+    limits = {}
+    for entry in (spec or "").split(","):
+        if ":" not in entry:
+            continue
+        cmd, limit = entry.split(":", 1)
+        try:
+            limits[cmd.strip()] = max(1, int(limit))
+        except ValueError:
+            print(f"[REQUEST-DISPATCHER] Ignoring bad command limit: {entry!r}")
+    return limits
+
+
+class CommandMetrics(object):
+    """Queue depth, wait time and service time of one command type"""
+
+    def __init__(self) -> None:
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+        self.max_service = 0.0
+
+    def stats(self):
+        started = self.completed + self.failed
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / started * 1000, 1) if started else None,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "avg_service_ms": round(self.total_service / started * 1000, 1) if started else None,
+            "max_service_ms": round(self.max_service * 1000, 1),
+        }
+
+
+class RequestDispatcher(object):
+    """Per-client FIFO queues served concurrently under global and per-command limits"""
+
+    def __init__(self, max_concurrency=None, command_limits=None) -> None:
+        self.max_concurrency = max_concurrency or Config.REQUEST_CONCURRENCY
+        if command_limits is None:
+            command_limits = parse_command_limits(Config.REQUEST_COMMAND_LIMITS)
+        self.command_limits = command_limits
+        self._slots = locks.Semaphore(self.max_concurrency)
+        self._command_slots = {cmd: locks.Semaphore(limit) for cmd, limit in command_limits.items()}
+        self._clients = {}  # client -> deque of waiting commands; present while the client has one running
+        self._idle = locks.Event()
+        self._idle.set()
+        self.metrics = defaultdict(CommandMetrics)
+        self.running = 0
+
+    def submit(self, client, cmd, handler, *args):
+        """Queue handler(*args) (a coroutine function) behind the client's earlier commands"""
+        cmd = cmd or "unknown"
+        self.metrics[cmd].queued += 1
+        entry = (cmd, handler, args, time.monotonic())
+        queue = self._clients.get(client)
+        if queue is not None:
+            queue.append(entry)
+            return
+        self._clients[client] = deque([entry])
+        self._idle.clear()
+        ioloop.IOLoop.current().spawn_callback(self._serve_client, client)
+
+    async def _serve_client(self, client):
+        queue = self._clients[client]
+        while queue:
+            await self._run(*queue[0])
+            queue.popleft()
+        del self._clients[client]
+        if not self._clients:
+            self._idle.set()
+
+    async def _run(self, cmd, handler, args, queued_at):
+        metrics = self.metrics[cmd]
+        # The command's own cap first, so commands waiting on it do not hold overall slots
+        command_slot = self._command_slots.get(cmd)
+        if command_slot is not None:
+            await command_slot.acquire()
+        await self._slots.acquire()
+
+        started = time.monotonic()
+        wait = started - queued_at
+        metrics.queued -= 1
+        metrics.running += 1
+        metrics.total_wait += wait
+        metrics.max_wait = max(metrics.max_wait, wait)
+        self.running += 1
+        try:
+            await handler(*args)
+            metrics.completed += 1
+        except Exception as e:
+            metrics.failed += 1
+            print(f"[REQUEST-DISPATCHER] {cmd} failed: {e}")
+        finally:
+            service = time.monotonic() - started
+            metrics.running -= 1
+            metrics.total_service += service
+            metrics.max_service = max(metrics.max_service, service)
+            self.running -= 1
+            self._slots.release()
+            if command_slot is not None:
+                command_slot.release()
+
+    async def join(self, timeout=None):
+        """Wait until every submitted command has finished (tornado.util.TimeoutError after timeout seconds)"""
+        await self._idle.wait(None if timeout is None else timedelta(seconds=timeout))
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "command_limits": self.command_limits,
+            "running": self.running,
+            "queued": sum(metrics.queued for metrics in self.metrics.values()),
+            "clients": len(self._clients),
+            "commands": {cmd: metrics.stats() for cmd, metrics in sorted(self.metrics.items())},
+        }
+
+
+# Global instance
+request_dispatcher = RequestDispatcher()
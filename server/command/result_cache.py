@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Result Cache - Replays stored runs of unmodified shared example scripts (opt-in)
+Scripts under the read-only root folders (Lecture Notes and the like) are the
+same for every student, so when a lab opens the same example only the first
+run executes: its output frames are recorded and later runs replay them with
+the original timing compressed.
+
+An entry is keyed by the script's content hash, its path and an interpreter/
+package fingerprint, and stores the hashes of the workspace files the run
+opened - a changed data file is a miss. A run is never stored when it could
+behave differently next time: the source mentions time, randomness, input() or
+similar (or carries a "# no-cache" comment), or while running it writes files,
+lists directories, reads devices, starts processes or opens sockets (seen
+through a process-wide audit hook that only looks at threads being recorded).
+Entries live in memory and as JSON under the storage root, shared by pool
+workers. A run that finds another process recording the same script just
+executes without recording - it never waits on the other run.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import site
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from command.exec_protocol import MessageType
+from command import sandbox
+
+# Outcomes of a lookup, also reported back by pool workers
+RESULT_HIT = "hit"
+RESULT_MISS = "miss"
+RESULT_BYPASS = "bypass"
+
+# Bump when the entry layout or replay semantics change
+CACHE_FORMAT = "1"
+# Replay at a tenth of the original pace, and never for longer than this
+REPLAY_TIME_SCALE = 0.1
+MAX_REPLAY_SECONDS = 1.0
+# Larger runs are not worth keeping
+MAX_OUTPUT_CHARS = 1024 * 1024
+# A recording claim older than this was left by a killed process
+CLAIM_STALE_SECONDS = 10.0
+
+# Source opt-out, for examples whose output must always be live
+NO_CACHE_MARKER = "# no-cache"
+
+# Names whose use makes output depend on more than the source and its input files
+NONDETERMINISTIC_NAMES = frozenset({
+    "random", "time", "datetime", "uuid", "secrets", "threading", "multiprocessing", "concurrent",
+    "asyncio", "subprocess", "socket", "requests", "urllib", "http", "getpass", "tempfile", "signal",
+    "sched", "environ", "getenv", "getpid", "urandom", "input", "id", "hash", "now", "today",
+    "perf_counter", "monotonic", "process_time",
+})
+
+# Audited operations that change files
+_WRITE_EVENTS = frozenset({
+    "os.remove", "os.rename", "os.mkdir", "os.rmdir", "os.truncate", "os.chmod", "os.chown",
+    "os.link", "os.symlink", "os.utime", "os.setxattr", "os.removexattr",
+    "shutil.copyfile", "shutil.copymode", "shutil.copystat", "shutil.copytree", "shutil.move",
+    "shutil.rmtree", "shutil.make_archive", "shutil.unpack_archive",
+})
+# Audited operations that reach outside the process
+_EXTERNAL_PREFIXES = (
+    "subprocess.", "socket.", "urllib.", "http.", "ftplib.", "smtplib.", "sqlite3.", "webbrowser.",
+    "ctypes.", "os.system", "os.exec", "os.spawn", "os.posix_spawn", "os.fork", "os.kill",
+    "os.urandom", "builtins.input",
+)
+_LISTING_EVENTS = frozenset({"os.listdir", "os.scandir", "glob.glob", "glob.glob/2"})
+_DEVICE_ROOTS = ("/proc/", "/sys/", "/dev/")
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+# Default object reprs carry memory addresses that differ between runs
+_ADDRESS_PATTERN = re.compile(r" at 0x[0-9a-fA-F]+")
+
+# Thread ident -> RunRecorder for threads running a script being recorded
+_recorders = {}
+_audit_installed = False
+_audit_lock = threading.Lock()
+
+
+def _audit_hook(event, args):
+    recorder = _recorders.get(threading.get_ident())
+    if recorder is not None:
+        recorder.on_event(event, args)
+
+
+def _install_audit_hook():
+    """Audit hooks cannot be removed - installed once per process, only when the cache is used"""
+    global _audit_installed
+    with _audit_lock:
+        if not _audit_installed:
+            sys.addaudithook(_audit_hook)
+            _audit_installed = True
+
+
+def _default_disk_dir():
+    from common.config import Config as StorageConfig
+
+    return os.path.join(StorageConfig.PROJECTS, ".result_cache")
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def nondeterminism_marker(source):
+    """The first reason the source may not produce the same output twice, or None"""
+    if NO_CACHE_MARKER in source:
+        return "no-cache marker"
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return "syntax error"
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name.split(".")[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [(node.module or "").split(".")[0]] + [alias.name for alias in node.names]
+        elif isinstance(node, ast.Name):
+            names = [node.id]
+        elif isinstance(node, ast.Attribute):
+            names = [node.attr]
+        else:
+            continue
+        for name in names:
+            if name in NONDETERMINISTIC_NAMES:
+                return f"uses {name}"
+    return None
+
+
+class RunRecorder:
+    """Output frames and file reads of one script run that may become a cache entry"""
+
+    def __init__(self, key, script_path):
+        self.key = key
+        self.script_path = script_path
+        self.frames = []  # [seconds since start, message type value, data]
+        self.reads = set()
+        self.bypass_reason = None
+        self._output_chars = 0
+        self._started = None
+        self._workspace = sandbox.workspace_root() + os.sep
+
+    def start(self):
+        """Call on the thread that runs the script"""
+        self._started = time.monotonic()
+        _recorders[threading.get_ident()] = self
+
+    def stop(self):
+        _recorders.pop(threading.get_ident(), None)
+
+    def bypass(self, reason):
+        if self.bypass_reason is None:
+            self.bypass_reason = reason
+
+    def add_frame(self, msg_type, data):
+        if self._started is None or self.bypass_reason:
+            return
+        if msg_type == MessageType.INPUT_REQUEST:
+            self.bypass("input")
+            return
+        if isinstance(data, str):
+            self._output_chars += len(data)
+            if self._output_chars > MAX_OUTPUT_CHARS:
+                self.bypass("output too large")
+                return
+            if _ADDRESS_PATTERN.search(data):
+                self.bypass("memory address in output")
+                return
+        self.frames.append([round(time.monotonic() - self._started, 4), msg_type.value, data])
+
+    def on_event(self, event, args):
+        """Audit hook callback on the recorded thread - keep it cheap"""
+        if self.bypass_reason:
+            return
+        if event == "open":
+            self._on_open(*args[:3])
+        elif event in _WRITE_EVENTS:
+            self.bypass(f"writes files ({event})")
+        elif event in _LISTING_EVENTS:
+            path = self._resolve(args[0] if args else ".")
+            if path is None or path.startswith(self._workspace):
+                self.bypass("lists a directory")
+        elif event.startswith(_EXTERNAL_PREFIXES):
+            self.bypass(f"external access ({event})")
+
+    def _on_open(self, path, mode, flags):
+        if isinstance(mode, str):
+            writing = any(m in mode for m in "wax+")
+        else:
+            writing = bool((flags or 0) & _WRITE_FLAGS)
+        if writing:
+            self.bypass("writes files")
+            return
+        path = self._resolve(path)
+        if path is None:
+            return
+        if path.startswith(_DEVICE_ROOTS):
+            self.bypass(f"reads {path}")
+        elif path.startswith(self._workspace):
+            # Files outside the workspace are the interpreter's and packages' (covered by the fingerprint)
+            self.reads.add(path)
+
+    @staticmethod
+    def _resolve(path):
+        if isinstance(path, int):
+            return None
+        try:
+            return os.path.realpath(os.fsdecode(path))
+        except (TypeError, ValueError):
+            return None
+
+
+class ResultCache:
+    """Stored output of deterministic shared-script runs, in memory and on disk"""
+
+    def __init__(self, enabled=None, max_entries=None, disk_dir=None, use_disk=True):
+        self.enabled = Config.RESULT_CACHE if enabled is None else enabled
+        self.max_entries = max_entries if max_entries is not None else Config.RESULT_CACHE_SIZE
+        self.use_disk = use_disk
+        self._disk_dir = disk_dir
+        self._fingerprint = None
+        self._entries = OrderedDict()  # key -> entry (hits, and "bypass" entries for uncacheable scripts)
+        self._markers = OrderedDict()  # source hash -> nondeterminism_marker() result
+        self._inflight = set()  # keys being recorded in this process
+        self._lock = threading.Lock()
+
+        # Counters for /health
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stored = 0
+        self.busy = 0  # Misses run uncached because another process was recording the script
+        self.disk_errors = 0
+
+    @property
+    def disk_dir(self):
+        if self._disk_dir is None:
+            self._disk_dir = _default_disk_dir()
+        return self._disk_dir
+
+    def fingerprint(self):
+        """Interpreter and installed-package versions, computed once per process"""
+        if self._fingerprint is None:
+            parts = [CACHE_FORMAT, sys.version, sys.executable]
+            site_dirs = list(getattr(site, "getsitepackages", lambda: [])())
+            if hasattr(site, "getusersitepackages"):
+                site_dirs.append(site.getusersitepackages())
+            for site_dir in site_dirs:
+                try:
+                    names = sorted(n for n in os.listdir(site_dir) if n.endswith((".dist-info", ".egg-info")))
+                except OSError:
+                    continue
+                parts.append(site_dir)
+                parts.extend(names)
+            self._fingerprint = hashlib.sha256("\0".join(parts).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+        return self._fingerprint
+
+    def eligible(self, script_path):
+        """Only scripts in the shared read-only root folders are cached, never anything under Local/"""
+        if not self.enabled or not script_path:
+            return False
+        root = sandbox.workspace_root()
+        path = os.path.realpath(script_path)
+        if not path.startswith(root + os.sep):
+            return False
+        rel_path = os.path.relpath(path, root).replace("\\", "/")
+        if rel_path.startswith("ide/"):
+            rel_path = rel_path[4:]
+        return "/" in rel_path and not rel_path.startswith("Local/")
+
+    def make_key(self, source, script_path):
+        source_hash = hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+        return hashlib.sha256(f"{source_hash}\0{script_path}\0{self.fingerprint()}".encode(
+            "utf-8", "surrogatepass")).hexdigest()
+
+    def prepare(self, source, script_path):
+        """
+        Decide how a run of this script goes. Returns (entry, recorder, RESULT_*):
+        an entry to replay on a hit, a recorder when the run should be executed
+        and recorded, neither to just execute it. The result is None when the
+        script is not eligible for caching at all.
+        """
+        if not self.eligible(script_path):
+            return None, None, None
+
+        key = self.make_key(source, script_path)
+        marker = self._marker(source)
+        if marker:
+            self.record(RESULT_BYPASS)
+            return None, None, RESULT_BYPASS
+
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry.get("bypass"):
+                self.record(RESULT_BYPASS)
+                return None, None, RESULT_BYPASS
+            self.record(RESULT_HIT)
+            return entry, None, RESULT_HIT
+        self.record(RESULT_MISS)
+        if not self._claim(key):
+            # Someone else is recording this script right now - run it uncached rather than wait for them
+            with self._lock:
+                self.busy += 1
+            return None, None, RESULT_MISS
+        _install_audit_hook()
+        return None, RunRecorder(key, script_path), RESULT_MISS
+
+    def finish(self, recorder, exit_code, stopped=False):
+        """Store the recorded run (or remember why it cannot be cached) and release the claim"""
+        try:
+            if stopped:
+                # Stopped by the student - says nothing about the script
+                return False
+            reason = recorder.bypass_reason
+            if reason is None and exit_code != 0:
+                reason = f"exit code {exit_code}"
+            if reason is not None:
+                print(f"[RESULT-CACHE] Not caching {recorder.script_path}: {reason}")
+                self._store(recorder.key, {"bypass": reason})
+                return False
+            try:
+                deps = {path: _file_hash(path) for path in sorted(recorder.reads)}
+            except OSError as e:
+                print(f"[RESULT-CACHE] Not caching {recorder.script_path}: {e}")
+                return False
+            entry = {"format": CACHE_FORMAT, "script_path": recorder.script_path,
+                     "deps": deps, "frames": recorder.frames}
+            if not self._store(recorder.key, entry):
+                return False
+            with self._lock:
+                self.stored += 1
+            return True
+        finally:
+            self._release(recorder.key)
+
+    @staticmethod
+    def replay_schedule(entry):
+        """(delay before frame, MessageType, data) for each stored frame, original timing compressed"""
+        frames = entry["frames"]
+        duration = frames[-1][0] if frames else 0
+        scale = min(REPLAY_TIME_SCALE, MAX_REPLAY_SECONDS / duration) if duration > 0 else 0
+        last = 0.0
+        for offset, msg_type, data in frames:
+            yield (offset - last) * scale, MessageType(msg_type), data
+            last = offset
+
+    def _marker(self, source):
+        digest = hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            if digest in self._markers:
+                self._markers.move_to_end(digest)
+                return self._markers[digest]
+        marker = nondeterminism_marker(source)
+        with self._lock:
+            self._markers[digest] = marker
+            while len(self._markers) > self.max_entries:
+                self._markers.popitem(last=False)
+        return marker
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.use_disk:
+            entry = self._load_from_disk(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None or entry.get("bypass"):
+            return entry
+        # A data file the script read has changed since it was recorded
+        try:
+            for path, digest in entry["deps"].items():
+                if _file_hash(path) != digest:
+                    return None
+        except OSError:
+            return None
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store(self, key, entry):
+        self._remember(key, entry)
+        if not self.use_disk:
+            return True
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            # TypeError/ValueError: a frame that is not JSON - keep it in memory only
+            print(f"[RESULT-CACHE] Could not write cache file {path}: {e}")
+            with self._lock:
+                self.disk_errors += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _load_from_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[RESULT-CACHE] Ignoring unreadable cache file {path}: {e}")
+            with self._lock:
+                self.disk_errors += 1
+            return None
+        if not entry.get("bypass") and entry.get("format") != CACHE_FORMAT:
+            return None
+        return entry
+
+    def _claim(self, key):
+        """Become the one process recording this script; False while someone else is"""
+        with self._lock:
+            if key in self._inflight:
+                return False
+            self._inflight.add(key)
+        if not self.use_disk:
+            return True
+        claim_path = self._disk_path(key) + ".lock"
+        for _ in range(2):
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                os.close(os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(claim_path) < CLAIM_STALE_SECONDS:
+                        break
+                    os.remove(claim_path)
+                except OSError:
+                    pass
+            except OSError as e:
+                # No shared directory - record without coordinating with other processes
+                print(f"[RESULT-CACHE] Could not claim {claim_path}: {e}")
+                return True
+        with self._lock:
+            self._inflight.discard(key)
+        return False
+
+    def _release(self, key):
+        with self._lock:
+            self._inflight.discard(key)
+        if self.use_disk:
+            try:
+                os.remove(self._disk_path(key) + ".lock")
+            except OSError:
+                pass
+
+    def record(self, result):
+        """Count a lookup outcome (also used for outcomes reported by pool workers)"""
+        with self._lock:
+            if result == RESULT_HIT:
+                self.hits += 1
+            elif result == RESULT_MISS:
+                self.misses += 1
+            elif result == RESULT_BYPASS:
+                self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._markers.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stored": self.stored,
+                "busy": self.busy,
+                "disk_errors": self.disk_errors,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Global instance
+result_cache = ResultCache()
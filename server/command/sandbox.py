@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Filesystem Sandbox - Context-dispatching file access checks for student code
+Installed once per process. Every wrapper looks up the calling thread's
+executor context (username, role, script_dir) via get_executor_context(),
+so starting a run only needs the context set - nothing is patched per run
+and nothing has to be restored afterwards.
+
+Student code sees the sandbox through its namespace: SANDBOX_BUILTINS provides
+a checked open() and an __import__ that hands out sandboxed os, os.path and
+pathlib modules. Libraries that write files from C (pandas, matplotlib, PIL)
+are wrapped once at install time and pass straight through for server threads.
+"""
+
+import builtins
+import functools
+import os
+import pathlib
+import sys
+import threading
+import types
+
+_real_open = builtins.open
+_real_import = builtins.__import__
+_RealPath = pathlib.Path
+
+# Replaced by install_sandbox() with simple_exec_v3.get_executor_context
+_get_context = None
+
+_install_lock = threading.Lock()
+_installed = False
+
+# Populated by install_sandbox()
+SANDBOX_BUILTINS = None
+sandbox_os = None
+sandbox_path = None
+sandbox_pathlib = None
+
+
+@functools.lru_cache(maxsize=8)
+def _realpath_cached(path):
+    return os.path.realpath(path)
+
+
+def workspace_root():
+    """Real path of the IDE data directory, resolved once per distinct setting"""
+    return _realpath_cached(os.environ.get('IDE_DATA_PATH', '/mnt/efs/pythonide-data'))
+
+
+def _context():
+    if _get_context is None:
+        return None, 'student', None
+    return _get_context()
+
+
+def _rebase(path, script_dir):
+    """Make a relative str path relative to the running script's directory"""
+    if isinstance(path, str) and script_dir and not os.path.isabs(path):
+        return os.path.join(script_dir, path)
+    return path
+
+
+def validate_path(path, mode='r'):
+    """
+    Validate that a student's file operation respects directory permissions.
+
+    Reads are allowed anywhere (libraries read their own config and data files).
+    Writes must stay inside Local/{username}/ of the IDE workspace. Professors and
+    threads that are not running student code are unrestricted.
+
+    Returns:
+        Absolute path to use for the operation
+
+    Raises:
+        PermissionError: If a student attempts unauthorized access
+    """
+    username, role, script_dir = _context()
+    path = _rebase(path, script_dir)
+
+    # Professors and server threads have unrestricted access
+    if role == 'professor' or script_dir is None:
+        return path
+
+    is_write_mode = isinstance(mode, str) and any(m in mode for m in ('w', 'a', '+', 'x'))
+
+    # Resolve any .. or . and symlinks to prevent directory traversal
+    path = os.path.realpath(os.path.abspath(path))
+    if not is_write_mode:
+        return path
+
+    base_data_path = workspace_root()
+    if path != base_data_path and not path.startswith(base_data_path + os.sep):
+        raise PermissionError(f"Access denied: Cannot write outside IDE workspace: {path}")
+
+    # Docker uses .../projects/ide/Local/..., AWS uses /mnt/efs/pythonide-data/ide/Local/...
+    rel_path = os.path.relpath(path, base_data_path).replace('\\', '/')
+    if rel_path.startswith('ide/'):
+        rel_path = rel_path[4:]
+
+    student_prefix = f"Local/{username}/"
+    if not username or not rel_path.startswith(student_prefix):
+        raise PermissionError(
+            f"Permission denied: Students can only write to their own directory (Local/{username}/). "
+            f"Attempted write to: {rel_path}"
+        )
+    return path
+
+
+# ===== builtins =====
+
+def sandbox_open(file, mode='r', *args, **kwargs):
+    if isinstance(file, str):
+        file = validate_path(file, mode)
+    return _real_open(file, mode, *args, **kwargs)
+
+
+def sandbox_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """__import__ for student code: os, os.path and pathlib resolve to the sandbox modules"""
+    if level == 0:
+        if name == 'os':
+            return sandbox_os
+        if name == 'os.path':
+            # "import os.path" binds the top-level package, "from os.path import x" the submodule
+            return sandbox_path if fromlist else sandbox_os
+        if name == 'pathlib':
+            return sandbox_pathlib
+    return _real_import(name, globals, locals, fromlist, level)
+
+
+# ===== os / os.path =====
+
+def _rebased(func):
+    """Wrap a read-only os/os.path function so relative paths resolve against script_dir"""
+    @functools.wraps(func)
+    def wrapper(path, *args, **kwargs):
+        return func(_rebase(path, _context()[2]), *args, **kwargs)
+    return wrapper
+
+
+def _checked_write(func):
+    """Wrap a destructive os function so its path argument is validated as a write"""
+    @functools.wraps(func)
+    def wrapper(path, *args, **kwargs):
+        if isinstance(path, str):
+            path = validate_path(path, 'w')
+        return func(path, *args, **kwargs)
+    return wrapper
+
+
+def _getcwd():
+    script_dir = _context()[2]
+    return script_dir if script_dir else os.getcwd()
+
+
+def _listdir(path='.'):
+    script_dir = _context()[2]
+    if path == '.' and script_dir:
+        path = script_dir
+    return os.listdir(_rebase(path, script_dir))
+
+
+def _rename(src, dst):
+    if isinstance(src, str):
+        src = validate_path(src, 'w')
+    if isinstance(dst, str):
+        dst = validate_path(dst, 'w')
+    return os.rename(src, dst)
+
+
+def _os_open(path, flags, mode=0o777, *args, **kwargs):
+    """os.open() is what C-backed writers like PIL use - validate anything that can write"""
+    if isinstance(path, str):
+        is_write = (flags & os.O_WRONLY) or (flags & os.O_RDWR) or (flags & os.O_CREAT)
+        path = validate_path(path, 'w' if is_write else 'r')
+    return os.open(path, flags, mode, *args, **kwargs)
+
+
+def _build_os_modules():
+    path_module = types.ModuleType('path')
+    for attr in dir(os.path):
+        if not attr.startswith('_'):
+            setattr(path_module, attr, getattr(os.path, attr))
+    for name in ('abspath', 'exists', 'isfile', 'isdir', 'getsize', 'getmtime'):
+        setattr(path_module, name, _rebased(getattr(os.path, name)))
+
+    os_module = types.ModuleType('os')
+    for attr in dir(os):
+        if not attr.startswith('_'):
+            setattr(os_module, attr, getattr(os, attr))
+    os_module.path = path_module
+    os_module.getcwd = _getcwd
+    os_module.listdir = _listdir
+    os_module.rename = _rename
+    os_module.open = _os_open
+    for name in ('remove', 'mkdir', 'makedirs', 'rmdir'):
+        setattr(os_module, name, _checked_write(getattr(os, name)))
+    return os_module, path_module
+
+
+# ===== pathlib =====
+
+def _rebase_args(args):
+    if args and isinstance(args[0], str):
+        return (_rebase(args[0], _context()[2]),) + tuple(args[1:])
+    return args
+
+
+class SecurePath(type(_RealPath())):
+    """pathlib.Path for student code: relative to script_dir, writes validated"""
+
+    def __new__(cls, *args, **kwargs):
+        return super().__new__(cls, *_rebase_args(args), **kwargs)
+
+    if sys.version_info >= (3, 12):
+        # 3.12+ stores the segments in __init__, so rebasing in __new__ alone is lost
+        def __init__(self, *args):
+            super().__init__(*_rebase_args(args))
+
+    def open(self, mode='r', *args, **kwargs):
+        return _RealPath(validate_path(str(self), mode)).open(mode, *args, **kwargs)
+
+    def write_text(self, data, *args, **kwargs):
+        return _RealPath(validate_path(str(self), 'w')).write_text(data, *args, **kwargs)
+
+    def write_bytes(self, data, *args, **kwargs):
+        return _RealPath(validate_path(str(self), 'wb')).write_bytes(data, *args, **kwargs)
+
+    def mkdir(self, *args, **kwargs):
+        return _RealPath(validate_path(str(self), 'w')).mkdir(*args, **kwargs)
+
+    def rmdir(self, *args, **kwargs):
+        return _RealPath(validate_path(str(self), 'w')).rmdir(*args, **kwargs)
+
+    def unlink(self, *args, **kwargs):
+        return _RealPath(validate_path(str(self), 'w')).unlink(*args, **kwargs)
+
+    def rename(self, target, *args, **kwargs):
+        validate_path(str(self), 'w')
+        return _RealPath(str(self)).rename(validate_path(str(target), 'w'))
+
+    def replace(self, target, *args, **kwargs):
+        validate_path(str(self), 'w')
+        return _RealPath(str(self)).replace(validate_path(str(target), 'w'))
+
+
+def _build_pathlib_module():
+    module = types.ModuleType('pathlib')
+    for attr in dir(pathlib):
+        if not attr.startswith('_'):
+            setattr(module, attr, getattr(pathlib, attr))
+    module.Path = SecurePath
+    return module
+
+
+# ===== Libraries with C-level file access =====
+
+def _wrap_pandas():
+    try:
+        import pandas as pd
+    except ImportError:
+        return
+
+    original_to_csv = pd.DataFrame.to_csv
+    original_read_csv = pd.read_csv
+
+    @functools.wraps(original_to_csv)
+    def secure_to_csv(df_self, path_or_buf=None, *args, **kwargs):
+        if isinstance(path_or_buf, str):
+            path_or_buf = validate_path(path_or_buf, 'w')
+        return original_to_csv(df_self, path_or_buf, *args, **kwargs)
+
+    @functools.wraps(original_read_csv)
+    def secure_read_csv(filepath_or_buffer, *args, **kwargs):
+        if isinstance(filepath_or_buffer, str):
+            filepath_or_buffer = validate_path(filepath_or_buffer, 'r')
+        return original_read_csv(filepath_or_buffer, *args, **kwargs)
+
+    pd.DataFrame.to_csv = secure_to_csv
+    pd.read_csv = secure_read_csv
+
+
+def _wrap_matplotlib():
+    try:
+        import matplotlib.figure
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return
+
+    original_figure_savefig = matplotlib.figure.Figure.savefig
+    original_pyplot_savefig = plt.savefig
+
+    # matplotlib also accepts file-like objects (io.BytesIO, etc.) which need no validation
+    @functools.wraps(original_figure_savefig)
+    def secure_figure_savefig(fig_self, fname, *args, **kwargs):
+        if isinstance(fname, str):
+            fname = validate_path(os.path.normpath(_rebase(fname, _context()[2])), 'w')
+        return original_figure_savefig(fig_self, fname, *args, **kwargs)
+
+    @functools.wraps(original_pyplot_savefig)
+    def secure_pyplot_savefig(fname, *args, **kwargs):
+        if isinstance(fname, str):
+            fname = validate_path(os.path.normpath(_rebase(fname, _context()[2])), 'w')
+        return original_pyplot_savefig(fname, *args, **kwargs)
+
+    matplotlib.figure.Figure.savefig = secure_figure_savefig
+    plt.savefig = secure_pyplot_savefig
+
+
+def _wrap_pil():
+    # PIL may hold its own reference to os for path handling
+    try:
+        import PIL.Image as pil_image
+    except ImportError:
+        return
+    if hasattr(pil_image, 'os'):
+        pil_image.os = sandbox_os
+
+
+def install_sandbox(get_context):
+    """Build the sandbox modules and wrap library writers (idempotent, once per process)"""
+    global _get_context, _installed, SANDBOX_BUILTINS, sandbox_os, sandbox_path, sandbox_pathlib
+    with _install_lock:
+        if _installed:
+            return
+        _get_context = get_context
+        sandbox_os, sandbox_path = _build_os_modules()
+        sandbox_pathlib = _build_pathlib_module()
+
+        sandbox_builtins = dict(vars(builtins))
+        sandbox_builtins['open'] = sandbox_open
+        sandbox_builtins['__import__'] = sandbox_import
+        SANDBOX_BUILTINS = sandbox_builtins
+
+        _wrap_pandas()
+        _wrap_matplotlib()
+        _wrap_pil()
+        _installed = True
+    print(f"[SANDBOX] Filesystem sandbox installed (workspace: {workspace_root()})")
+
+
+def namespace_defaults():
+    """Globals every student namespace starts with (shared objects, nothing per run)"""
+    return {
+        '__builtins__': SANDBOX_BUILTINS,
+        'os': sandbox_os,
+        'pathlib': sandbox_pathlib,
+    }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Subprogram Reaper - Waits for stopped subprograms off the IOLoop
+HandlerInfo only signals a subprogram to stop; this thread then waits for it
+to finish and releases whatever it still holds. All pending subprograms are
+polled together, so a lab disconnecting at once is reaped in one grace
+period instead of one join after another - and the IOLoop never waits at all.
+"""
+
+import threading
+import time
+
+# How long a stopped subprogram gets to finish before it is given up on
+GRACE_SECONDS = 2.0
+# Poll interval while subprograms are pending
+POLL_SECONDS = 0.05
+
+
+class SubprogramReaper(threading.Thread):
+    """Background thread that joins stopped subprograms and releases their locks"""
+
+    # Started from inside runs too - it serves every connection, not the run that started it
+    inherit_executor_context = False
+
+    def __init__(self, grace_seconds=GRACE_SECONDS, poll_seconds=POLL_SECONDS):
+        super().__init__(daemon=True, name="SubprogramReaper")
+        self.grace_seconds = grace_seconds
+        self.poll_seconds = poll_seconds
+
+        self._pending = []  # (program_id, subprogram, deadline)
+        self._cond = threading.Condition()
+        self._running = False
+
+        # Counters for /health
+        self.submitted = 0
+        self.reaped = 0
+        self.abandoned = 0  # Still alive after the grace period
+        self.max_pending = 0
+
+    def submit(self, program_id, subprogram):
+        """Hand over a subprogram whose stop() was already called - O(1), never blocks"""
+        with self._cond:
+            if not self._running:
+                self._running = True
+                self.start()
+            self._pending.append((program_id, subprogram, time.monotonic() + self.grace_seconds))
+            self.submitted += 1
+            self.max_pending = max(self.max_pending, len(self._pending))
+            self._cond.notify()
+
+    def wait_idle(self, timeout=5.0):
+        """Wait until everything submitted so far is reaped (tests, shutdown). Returns True when idle."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, self.poll_seconds))
+        return True
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                pending = list(self._pending)
+
+            now = time.monotonic()
+            done = []
+            for item in pending:
+                program_id, subprogram, deadline = item
+                alive = self._is_alive(subprogram)
+                if alive and now < deadline:
+                    continue
+                if alive:
+                    print(f"[REAPER] Subprogram {program_id} still running {self.grace_seconds}s after stop, "
+                          f"giving up on it")
+                self._finish(program_id, subprogram)
+                done.append((item, alive))
+
+            with self._cond:
+                for item, alive in done:
+                    self._pending.remove(item)
+                    if alive:
+                        self.abandoned += 1
+                    else:
+                        self.reaped += 1
+                if done:
+                    self._cond.notify_all()
+                if self._pending:
+                    self._cond.wait(self.poll_seconds)
+
+    @staticmethod
+    def _is_alive(subprogram):
+        try:
+            return subprogram.is_alive()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _finish(program_id, subprogram):
+        """Release the run's execution lock if stop() did not (idempotent on executors)"""
+        release = getattr(subprogram, "_release_execution_lock_once", None)
+        if release is None:
+            return
+        try:
+            release("subprogram reaper")
+        except Exception as e:
+            print(f"[REAPER] Error releasing lock for {program_id}: {e}")
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "reaped": self.reaped,
+                "abandoned": self.abandoned,
+            }
+
+
+# Global instance (started on first use)
+subprogram_reaper = SubprogramReaper()
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Worker Pool - Pre-started Python worker processes for script execution
+Each run is handed to an idle worker over a socket channel and its output is
+relayed back to the WebSocket, so student code never shares the server's GIL
+and a runaway script can be SIGKILLed without touching the server.
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import signal
+import socket
+import threading
+import subprocess
+import traceback
+from collections import deque
+from multiprocessing.connection import Connection
+from typing import Optional
+
+from config import Config
+from command.exec_protocol import MessageType, ExecutionState
+from command.outbound_queue import OutboundQueue
+from command.code_cache import code_cache
+from command.result_cache import result_cache
+from command.execution_telemetry import telemetry_writer
+from command.execution_supervisor import execution_supervisor
+from command.admission import admission_scheduler
+from command.exec_worker import send_packet, recv_packet
+from command.simple_exec_v3 import SimpleExecutorV3, REPL_HANDOFF, REPL_REFUSED_TEXT
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _process_start_time(pid):
+    """Start time of pid in clock ticks since boot (from /proc), or None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Worker:
+    """Handle on one worker process and its channel"""
+
+    def __init__(self, conn, pid, process=None, pidfd=None):
+        self.conn = conn
+        self.pid = pid
+        # Only set for workers we spawned ourselves - forked workers belong to the template
+        self.process = process
+        # Forked workers are not our children, so their PID can be reused once the kernel reaps
+        # them: they are signalled through a pidfd from the template, or after a start time check
+        self.pidfd = pidfd
+        self.start_time = _process_start_time(pid) if process is None and pidfd is None else None
+        self.created_at = time.time()
+        self.exited = False
+
+    def _running(self):
+        if self.process is not None:
+            return self.process.poll() is None
+        if self.pidfd is not None:
+            # A pidfd turns readable once its process has exited
+            return not select.select([self.pidfd], [], [], 0)[0]
+        return self.start_time is not None and _process_start_time(self.pid) == self.start_time
+
+    def is_usable(self):
+        if self.exited or self.conn.closed:
+            return False
+        return self._running()
+
+    def send(self, kind, payload=None):
+        send_packet(self.conn, kind, payload)
+
+    def kill(self):
+        """SIGKILL the worker - safe at any time, the server is unaffected"""
+        if self.exited:
+            return
+        try:
+            if self.process is not None:
+                self.process.kill()
+            elif self.pidfd is not None:
+                signal.pidfd_send_signal(self.pidfd, signal.SIGKILL)
+            elif self._running():
+                os.kill(self.pid, signal.SIGKILL)
+        except (OSError, ProcessLookupError) as e:
+            print(f"[WORKER-POOL] Could not kill worker {self.pid}: {e}")
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.kill()
+                self.process.wait()
+        self.exited = True
+        if self.pidfd is not None:
+            os.close(self.pidfd)
+            self.pidfd = None
+
+
+class TemplateProcess:
+    """
+    Forkserver-style template: a worker interpreter with numpy/pandas/matplotlib
+    already imported that forks a fresh worker per request.
+    """
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.process = None
+        self.sock = None
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        try:
+            # The module list goes through the environment: names like "matplotlib.pyplot" on the
+            # command line would make ProcessCleanupService treat the template as a user script
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "command.exec_worker", "--fd", str(child_sock.fileno()), "--template"],
+                cwd=SERVER_DIR,
+                env=dict(os.environ, WORKER_PRELOAD_MODULES=",".join(self.modules)),
+                pass_fds=(child_sock.fileno(),),
+                close_fds=True,
+            )
+        except Exception:
+            parent_sock.close()
+            raise
+        finally:
+            child_sock.close()
+        self.sock = parent_sock
+        print(f"[WORKER-POOL] Template process started (pid {self.process.pid})")
+
+    def fork_worker(self) -> Worker:
+        """Ask the template for a new worker, restarting the template if it died"""
+        with self._lock:
+            if self.process is None or self.process.poll() is not None:
+                if self.sock:
+                    self.sock.close()
+                self._spawn()
+
+            parent_sock, child_sock = socket.socketpair()
+            pidfds = []
+            try:
+                socket.send_fds(self.sock, [b"fork"], [child_sock.fileno()])
+                reply = b""
+                while not reply.endswith(b"\n"):
+                    chunk, fds, _flags, _addr = socket.recv_fds(self.sock, 64, 1)
+                    pidfds.extend(fds)
+                    if not chunk:
+                        raise OSError("template process closed its channel")
+                    reply += chunk
+            except OSError:
+                parent_sock.close()
+                for fd in pidfds:
+                    os.close(fd)
+                # Force a respawn on the next request
+                self.process.kill()
+                raise
+            finally:
+                child_sock.close()
+
+        pid = json.loads(reply.decode("utf-8"))["pid"]
+        # The template sends a pidfd with the reply where the kernel supports them
+        return Worker(Connection(parent_sock.detach()), pid, pidfd=pidfds[0] if pidfds else None)
+
+    def shutdown(self):
+        with self._lock:
+            if self.sock:
+                self.sock.close()
+                self.sock = None
+            if self.process is not None:
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                self.process = None
+
+
+class WorkerPool:
+    """Keeps a number of idle workers warm and refills the pool in the background"""
+
+    def __init__(self, size: Optional[int] = None, preload=None):
+        self.size = size if size is not None else Config.WORKER_POOL_SIZE
+        if preload is None:
+            preload = [m.strip() for m in Config.WORKER_PRELOAD_MODULES.split(",") if m.strip()]
+        self.template = TemplateProcess(preload) if preload else None
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._refill_thread = None
+        self._shutdown = False
+
+    def start(self):
+        """Start the background refill thread (idempotent)"""
+        with self._cond:
+            if self._refill_thread and self._refill_thread.is_alive():
+                return
+            self._shutdown = False
+            self._refill_thread = threading.Thread(target=self._refill_loop, daemon=True, name="WorkerPool-Refill")
+            self._refill_thread.start()
+        print(f"[WORKER-POOL] Started with {self.size} warm workers")
+
+    def spawn_worker(self) -> Worker:
+        """Fork a worker from the template, or launch a bare interpreter when preloading is off"""
+        if self.template is not None:
+            return self.template.fork_worker()
+
+        parent_sock, child_sock = socket.socketpair()
+        try:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "command.exec_worker", "--fd", str(child_sock.fileno())],
+                cwd=SERVER_DIR,
+                pass_fds=(child_sock.fileno(),),
+                close_fds=True,
+            )
+        except Exception:
+            parent_sock.close()
+            raise
+        finally:
+            child_sock.close()
+        return Worker(Connection(parent_sock.detach()), process.pid, process)
+
+    def acquire(self) -> Worker:
+        """Take an idle worker, or spawn one on the spot if the pool is drained"""
+        with self._cond:
+            while self._idle:
+                worker = self._idle.popleft()
+                if worker.is_usable():
+                    self._cond.notify()
+                    return worker
+                worker.close()
+            self._cond.notify()
+        return self.spawn_worker()
+
+    def idle_count(self):
+        with self._cond:
+            return len(self._idle)
+
+    def _refill_loop(self):
+        while True:
+            with self._cond:
+                while not self._shutdown and len(self._idle) >= self.size:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+            try:
+                worker = self.spawn_worker()
+            except Exception as e:
+                print(f"[WORKER-POOL] Failed to spawn worker: {e}")
+                time.sleep(1.0)
+                continue
+            with self._cond:
+                self._idle.append(worker)
+
+    def shutdown(self):
+        """Stop refilling and terminate all idle workers"""
+        with self._cond:
+            self._shutdown = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for worker in idle:
+            worker.close()
+        if self.template is not None:
+            self.template.shutdown()
+
+
+class PooledExecutor(threading.Thread):
+    """
+    Drop-in replacement for SimpleExecutorV3 that runs the session in a pooled worker.
+    This thread only relays frames; it blocks on the channel and costs no CPU.
+    """
+
+    def __init__(self, cmd_id: str, client, event_loop,
+                 script_path: Optional[str] = None, username: Optional[str] = None,
+                 role: Optional[str] = None, pool: Optional[WorkerPool] = None):
+        super().__init__()
+        self.cmd_id = cmd_id
+        self.client = client
+        self.event_loop = event_loop
+        self.script_path = script_path
+        self.username = username
+        self.role = role or "student"
+        self.pool = pool or worker_pool
+
+        self.worker = None
+        self.alive = True
+        self.state = ExecutionState.IDLE
+        self.waiting_for_input = False
+        self.timeout_occurred = False
+        self.start_time = None
+
+        self.daemon = True
+        self._stop_event = threading.Event()
+        self._lock_released = False
+        self._lock_release_mutex = threading.Lock()
+        self._worker_ready = threading.Event()
+        self._pending_input = []
+        self._telemetry_recorded = False
+        # Worker output is coalesced here, once per event loop tick
+        self.outbound = OutboundQueue(client, event_loop, cmd_id)
+
+    # Lock handling is identical to the in-process executor
+    _release_execution_lock_once = SimpleExecutorV3._release_execution_lock_once
+
+    def send_message(self, msg_type: MessageType, data):
+        self.outbound.put(msg_type, data)
+
+    def _hold_repl_slot(self):
+        """The worker's script is done and its REPL starts - without a REPL slot the worker is ended"""
+        if admission_scheduler.open_repl(self, self.username):
+            return True
+        self.send_message(MessageType.STDOUT, REPL_REFUSED_TEXT)
+        self.send_message(MessageType.COMPLETE, {"exit_code": 0, "duration": time.time() - self.start_time})
+        self.stop()
+        return False
+
+    def _heartbeat(self):
+        if self.username and self.script_path:
+            try:
+                from .execution_lock_manager import execution_lock_manager
+                execution_lock_manager.update_heartbeat(self.username, self.script_path)
+            except Exception as e:
+                print(f"[PooledExecutor-HEARTBEAT] Non-critical error updating heartbeat: {e}")
+
+    def handle_input(self, text: str):
+        """Queue input for the worker (buffered until the worker is attached)"""
+        with self._lock_release_mutex:
+            if not self._worker_ready.is_set():
+                self._pending_input.append(text)
+                return
+        self.waiting_for_input = False
+        try:
+            self.worker.send("input", text)
+        except (OSError, ValueError) as e:
+            print(f"[PooledExecutor] Could not deliver input to worker: {e}")
+
+    def send_input(self, text: str):
+        """Alias for handle_input to match expected interface"""
+        return self.handle_input(text)
+
+    def run(self):
+        self.start_time = time.time()
+        self.state = ExecutionState.SCRIPT_RUNNING if self.script_path else ExecutionState.REPL_ACTIVE
+        # Listed for monitoring; the time limits run inside the worker's own supervisor
+        execution_supervisor.register(self)
+        exit_info = None
+        try:
+            if self._stop_event.is_set():
+                return
+            self.worker = self.pool.acquire()
+            self.worker.send("run", {
+                "cmd_id": self.cmd_id,
+                "script_path": self.script_path,
+                "username": self.username,
+                "role": self.role,
+            })
+            with self._lock_release_mutex:
+                pending, self._pending_input = self._pending_input, []
+                self._worker_ready.set()
+            for text in pending:
+                self.worker.send("input", text)
+            # stop() may have raced with acquire()
+            if self._stop_event.is_set():
+                self.worker.kill()
+
+            while True:
+                kind, payload = recv_packet(self.worker.conn)
+                if kind is None:
+                    self.worker.exited = True
+                    break
+                if kind == "msg":
+                    self._heartbeat()
+                    msg_type, data = payload
+                    self.outbound.put(MessageType(msg_type), data)
+                elif kind == "waiting":
+                    self.waiting_for_input = payload
+                elif kind == "telemetry":
+                    self._telemetry_recorded = True
+                    telemetry_writer.submit(payload)
+                elif kind == "result_cache":
+                    result_cache.record(payload)
+                elif kind == "release_lock":
+                    self.state = ExecutionState.REPL_ACTIVE
+                    self._release_execution_lock_once(f"worker: {payload}")
+                    if payload == REPL_HANDOFF and self.alive:
+                        self._hold_repl_slot()
+                elif kind == "exit":
+                    exit_info = payload or {}
+                    self.timeout_occurred = exit_info.get("timeout", False)
+                    # Workers are single-use, so the server keeps the cache counters
+                    code_cache.record(exit_info.get("code_cache"))
+        except Exception as e:
+            print(f"[PooledExecutor-RUN] ERROR: {e}")
+            traceback.print_exc()
+            if self.alive:
+                self.send_message(MessageType.ERROR, {
+                    "error": f"Execution failed: {str(e)}",
+                    "traceback": traceback.format_exc()
+                })
+        finally:
+            self.cleanup(exit_info)
+
+    def cleanup(self, exit_info=None):
+        if self.worker and self.script_path and not self._telemetry_recorded:
+            # Killed (stop, crash, OOM) before the worker could report - record what we know
+            telemetry_writer.submit({
+                "username": self.username,
+                "file_path": self.script_path,
+                "started_at": self.start_time,
+                "duration_ms": int((time.time() - self.start_time) * 1000),
+                "exit_code": 1,
+                "termination_reason": "stop" if not self.alive else "crash",
+            })
+        if self.worker:
+            self.worker.close()
+            # Worker died without reporting (OOM kill, crash) while nobody asked it to stop
+            if exit_info is None and self.alive:
+                self.send_message(MessageType.ERROR, {
+                    "error": "Execution process terminated unexpectedly",
+                    "traceback": "\n⚠️ PROCESS TERMINATED unexpectedly\n"
+                })
+        self.alive = False
+        self.state = ExecutionState.TERMINATED
+        self._stop_event.set()
+        self._release_execution_lock_once("cleanup() method")
+        execution_supervisor.unregister(self)
+
+    def stop(self):
+        """Stop the execution by killing its worker process"""
+        print(f"[PooledExecutor-STOP] cmd_id: {self.cmd_id}, state: {self.state}")
+        self.alive = False
+        self.state = ExecutionState.TERMINATED
+        self._stop_event.set()
+        self._release_execution_lock_once("stop() method")
+        if self.worker:
+            self.worker.kill()
+
+
+def create_executor(cmd_id, client, event_loop, script_path=None, username=None, role=None):
+    """Build the executor for a run according to Config.EXECUTION_BACKEND"""
+    if Config.EXECUTION_BACKEND == "pool":
+        return PooledExecutor(cmd_id, client, event_loop, script_path=script_path, username=username, role=role)
+    return SimpleExecutorV3(cmd_id, client, event_loop, script_path=script_path, username=username, role=role)
+
+
+# Global instance (started by server.py)
+worker_pool = WorkerPool()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
-Working simple interactive Python execution using character-by-character reading.
-This approach actually works by reading one character at a time to detect prompts.
+Working simple interactive Python execution with chunked output reading.
+Output is read in large non-blocking chunks and decoded incrementally; a
+partial line followed by a short silence is treated as an input() prompt.
 """
 
 import subprocess
@@ -9,6 +10,7 @@ import threading
 import time
 import os
 import asyncio
+import codecs
 import select
 import fcntl
 from queue import Queue, Empty
@@ -16,21 +18,39 @@ from queue import Queue, Empty
 from common.config import Config
 from command.error_handler import EducationalErrorHandler
 from command.response import response
+from command.exec_protocol import MessageType
+from command.execution_telemetry import RunStats, telemetry_writer
+
+# Bytes per os.read() - a whole pipe buffer in one syscall
+READ_CHUNK = 64 * 1024
+# A partial line this long after start, or this long after the last output, is a prompt
+INITIAL_PROMPT_DELAY = 0.1
+PROMPT_IDLE = 0.2
+# A partial line still unsent after this much silence is flushed as output
+PARTIAL_FLUSH_IDLE = 1.0
+# Wakeup interval with nothing pending (client disconnect and stop checks)
+IDLE_POLL = 0.5
 
 
 class WorkingSimpleThread(threading.Thread):
-    """Working implementation with character-by-character reading"""
+    """Working implementation with chunked, incrementally decoded reading"""
 
-    def __init__(self, cmd, cmd_id, client, event_loop):
+    def __init__(self, cmd, cmd_id, client, event_loop, username=None):
         super().__init__()
         self.cmd = cmd
         self.cmd_id = cmd_id
         self.client = client
         self.event_loop = event_loop
+        self.username = username
         self.alive = True
         self.p = None
         self.error_handler = EducationalErrorHandler()
         self.input_queue = Queue()
+        self._wake_w = None  # Write end of the reader's wakeup pipe while the program runs
+        self._wake_lock = threading.Lock()  # The pipe must not be closed under a concurrent write
+        # CPU time and peak RSS come from the child's rusage when it is reaped
+        self.run_stats = RunStats(cpu_clock=None)
+        self.child_usage = None
 
     def kill(self):
         """Kill the running subprocess"""
@@ -45,6 +65,7 @@ class WorkingSimpleThread(threading.Thread):
     def stop(self):
         """Stop the subprocess gracefully"""
         self.alive = False
+        self._wake()
         if self.p:
             try:
                 self.p.terminate()
@@ -55,20 +76,72 @@ class WorkingSimpleThread(threading.Thread):
     def send_input(self, user_input):
         """Queue user input to be sent to the program"""
         self.input_queue.put(user_input)
+        self._wake()
         return True
 
     def response_to_client(self, code, data):
         """Send response to client via WebSocket"""
         if data:
+            if code == 0:
+                self.run_stats.add_message(MessageType.STDOUT, data.get("stdout"))
             asyncio.run_coroutine_threadsafe(response(self.client, self.cmd_id, code, data), self.event_loop)
 
+    def _reap(self, blocking):
+        """Popen.poll()/wait() through wait4, keeping the child's resource usage"""
+        if self.p.returncode is None:
+            try:
+                pid, status, usage = os.wait4(self.p.pid, 0 if blocking else os.WNOHANG)
+            except ChildProcessError:
+                return self.p.wait() if blocking else self.p.poll()
+            if pid:
+                self.p.returncode = os.waitstatus_to_exitcode(status)
+                self.child_usage = usage
+        return self.p.returncode
+
+    def _record_telemetry(self):
+        """Queue the run's execution_log row (the writer thread does the INSERT)"""
+        exit_code = self.p.returncode if self.p else None
+        if not self.alive and (exit_code is None or exit_code < 0):
+            reason = "stop"
+        else:
+            reason = "normal" if exit_code == 0 else "error"
+        record = self.run_stats.finish(self.username, self.cmd[-1], exit_code, reason)
+        if record is None:
+            return
+        if self.child_usage is not None:
+            record["cpu_time_ms"] = int((self.child_usage.ru_utime + self.child_usage.ru_stime) * 1000)
+            record["peak_rss_kb"] = self.child_usage.ru_maxrss
+        telemetry_writer.submit(record)
+
+    def _wake(self):
+        """Interrupt the reader's select() (new input or stop)"""
+        with self._wake_lock:
+            if self._wake_w is not None:
+                try:
+                    os.write(self._wake_w, b"\0")
+                except OSError:
+                    pass  # Pipe already full - a wakeup is pending anyway
+
+    def _read_chunk(self, fd):
+        """One non-blocking read: bytes, b"" at EOF, or None when nothing is available"""
+        try:
+            return os.read(fd, READ_CHUNK)
+        except BlockingIOError:
+            return None
+
+    def _send_prompt(self, partial):
+        """A partial line followed by silence - most likely input() waiting on its prompt"""
+        self.response_to_client(0, {"stdout": partial})
+        self.response_to_client(2000, {"type": "input_request", "prompt": partial.strip()})
+
     def run_python_program(self):
-        """Run Python program with character-by-character reading"""
+        """Run Python program, reading output in large chunks and detecting input prompts"""
         start_time = time.time()
         asyncio.set_event_loop(self.event_loop)
 
         print(f"[{self.client.id}-Program {self.cmd_id} starting with working I/O]")
 
+        wake_r = None
         try:
             script_path = self.cmd[-1]
 
@@ -82,18 +155,27 @@ class WorkingSimpleThread(threading.Thread):
                 cwd=os.path.dirname(script_path) if script_path else None,
                 env={**os.environ, "PYTHONUNBUFFERED": "1"},
             )
+            self.run_stats.start()
 
             # Make stdout non-blocking
             fd = self.p.stdout.fileno()
             fl = fcntl.fcntl(fd, fcntl.F_GETFL)
             fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
 
-            buffer = b""
+            # send_input() and stop() write to this pipe so select() wakes at once
+            wake_r, self._wake_w = os.pipe()
+            os.set_blocking(wake_r, False)
+            os.set_blocking(self._wake_w, False)
+
+            # Multi-byte characters may be split across reads - the decoder keeps the tail
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            pending = ""  # Decoded output after the last newline (a prompt, or a line still being written)
             last_activity = time.time()
             waiting_for_input = False
             initial_check = True  # Flag to check for immediate input
+            eof = False
 
-            while self.alive and self.p.poll() is None:
+            while self.alive and not eof:
                 # Check client connection
                 if not self.client.connected:
                     self.alive = False
@@ -101,93 +183,58 @@ class WorkingSimpleThread(threading.Thread):
                     self.client.handler_info.remove_subprogram(self.cmd_id)
                     return
 
-                # Check for available data
-                readable, _, _ = select.select([self.p.stdout], [], [], 0.01)
-
-                if readable:
+                # Sleep until output, input or the next prompt check is due
+                now = time.time()
+                if pending and initial_check:
+                    timeout = start_time + INITIAL_PROMPT_DELAY - now
+                elif pending and not waiting_for_input:
+                    timeout = last_activity + PROMPT_IDLE - now
+                elif pending:
+                    timeout = last_activity + PARTIAL_FLUSH_IDLE - now
+                else:
+                    timeout = IDLE_POLL
+                readable, _, _ = select.select([fd, wake_r], [], [], max(timeout, 0))
+
+                if wake_r in readable:
                     try:
-                        # Read one byte at a time
-                        char = os.read(fd, 1)
-                        if char:
-                            buffer += char
-                            last_activity = time.time()
-
-                            # If we have a newline, send the complete line
-                            if char == b"\n":
-                                try:
-                                    line = buffer.decode("utf-8", errors="replace")
-                                    self.response_to_client(0, {"stdout": line})
-                                    buffer = b""
-                                except (UnicodeDecodeError, AttributeError) as e:
-                                    print(f"[WorkingSimpleThread] Error decoding buffer: {e}")
-                                    pass
-                    except (OSError, IOError) as e:
-                        if e.errno != 11:  # Ignore EAGAIN
-                            raise
-
-                # Special case: Check immediately after start for input() on first line
-                if initial_check and time.time() - start_time > 0.1:
-                    initial_check = False
-                    # If we have any output that looks like a prompt right at start
-                    if buffer and not waiting_for_input:
-                        try:
-                            partial = buffer.decode("utf-8", errors="replace")
-                            # If it doesn't end with newline, it's likely a prompt
-                            if not partial.endswith("\n"):
-                                # Send the prompt
-                                self.response_to_client(0, {"stdout": partial})
-                                buffer = b""
-
-                                # Send input request
-                                self.response_to_client(2000, {"type": "input_request", "prompt": partial.strip()})
-
-                                waiting_for_input = True
-                                last_activity = time.time()
-                        except (UnicodeDecodeError, AttributeError) as e:
-                            print(f"[WorkingSimpleThread] Error handling initial prompt: {e}")
-                            pass
-
-                # Check if we're likely waiting for input
-                # If no activity for 0.2 seconds and we have a partial line
-                elif buffer and time.time() - last_activity > 0.2 and not waiting_for_input:
-                    try:
-                        partial = buffer.decode("utf-8", errors="replace")
-
-                        # Check if this looks like an input prompt
-                        prompt_indicators = [
-                            ":",
-                            "?",
-                            ">",
-                            "enter",
-                            "input",
-                            "name",
-                            "password",
-                            "age",
-                            "choice",
-                            "type",
-                            "provide",
-                        ]
-
-                        is_prompt = any(ind in partial.lower() for ind in prompt_indicators)
-
-                        if is_prompt or (partial and not partial.endswith("\n")):
-                            # Send the partial line as output
-                            self.response_to_client(0, {"stdout": partial})
-                            buffer = b""
-
-                            # Send input request
-                            self.response_to_client(2000, {"type": "input_request", "prompt": partial.strip()})
-
-                            waiting_for_input = True
-                            last_activity = time.time()
-                    except (UnicodeDecodeError, AttributeError) as e:
-                        print(f"[WorkingSimpleThread] Error handling waiting prompt: {e}")
+                        os.read(wake_r, 4096)
+                    except BlockingIOError:
                         pass
 
+                if fd in readable:
+                    chunk = self._read_chunk(fd)
+                    if chunk == b"":
+                        eof = True
+                    elif chunk:
+                        pending += decoder.decode(chunk)
+                        last_activity = time.time()
+                        # Send every complete line in one message, keep the unfinished one
+                        cut = pending.rfind("\n") + 1
+                        if cut:
+                            self.response_to_client(0, {"stdout": pending[:cut]})
+                            pending = pending[cut:]
+
+                now = time.time()
+                if initial_check and now - start_time > INITIAL_PROMPT_DELAY:
+                    # Special case: input() on the first line prompts right after start
+                    initial_check = False
+                    if pending and not waiting_for_input:
+                        self._send_prompt(pending)
+                        pending = ""
+                        waiting_for_input = True
+                        last_activity = now
+
+                # No activity for a moment with a partial line - the program is likely waiting for input
+                elif pending and now - last_activity > PROMPT_IDLE and not waiting_for_input:
+                    self._send_prompt(pending)
+                    pending = ""
+                    waiting_for_input = True
+                    last_activity = now
+
                 # Handle user input
                 if waiting_for_input:
                     try:
-                        user_input = self.input_queue.get(timeout=0.01)
+                        user_input = self.input_queue.get_nowait()
 
                         # Send input to program
                         self.p.stdin.write((user_input + "\n").encode())
@@ -204,38 +251,18 @@ class WorkingSimpleThread(threading.Thread):
                     except Empty:
                         pass
 
-                # Also check if we should send partial output after a timeout
-                if buffer and time.time() - last_activity > 1.0:
-                    try:
-                        partial = buffer.decode("utf-8", errors="replace")
-                        if partial:
-                            self.response_to_client(0, {"stdout": partial})
-                            buffer = b""
-                    except (UnicodeDecodeError, AttributeError) as e:
-                        print(f"[WorkingSimpleThread] Error sending partial output: {e}")
-                        pass
+                # Also send a partial line that has sat for a while (printed with end="")
+                if pending and time.time() - last_activity > PARTIAL_FLUSH_IDLE:
+                    self.response_to_client(0, {"stdout": pending})
+                    pending = ""
 
-            # Send any remaining output
-            if buffer:
-                try:
-                    remaining = buffer.decode("utf-8", errors="replace")
-                    if remaining:
-                        self.response_to_client(0, {"stdout": remaining})
-                except (UnicodeDecodeError, AttributeError) as e:
-                    print(f"[WorkingSimpleThread] Error sending remaining output: {e}")
-                    pass
-
-            # Read any final output
-            try:
-                final = self.p.stdout.read()
-                if final:
-                    self.response_to_client(0, {"stdout": final.decode("utf-8", errors="replace")})
-            except (IOError, OSError, UnicodeDecodeError, AttributeError) as e:
-                print(f"[WorkingSimpleThread] Error reading final output: {e}")
-                pass
+            # Send any remaining output (including a character cut off at EOF)
+            pending += decoder.decode(b"", final=True)
+            if pending:
+                self.response_to_client(0, {"stdout": pending})
 
             # Get exit code
-            exit_code = self.p.wait() if self.p else 1
+            exit_code = self._reap(True) if self.p else 1
 
             # Send completion
             elapsed = time.time() - start_time
@@ -258,6 +285,14 @@ class WorkingSimpleThread(threading.Thread):
                     print(f"[WorkingSimpleThread] Could not terminate process in finally: {e}")
                     pass
 
+            if wake_r is not None:
+                with self._wake_lock:
+                    os.close(self._wake_w)
+                    self._wake_w = None
+                os.close(wake_r)
+
+            self._record_telemetry()
+
             self.client.handler_info.remove_subprogram(self.cmd_id)
             print(f"[{self.client.id}-Program {self.cmd_id} finished]")
 
@@ -21,6 +21,11 @@ class ResponseItem(object):
     def __init__(self, client, msg) -> None:
         self.client = client
         self._data = json.dumps(msg) if isinstance(msg, dict) else msg
+        # Program output ({"stdout": ...} with code 0) may be dropped if the client falls behind
+        self.output_of = None
+        if isinstance(msg, dict) and msg.get("code") == 0 and isinstance(msg.get("data"), dict):
+            if "stdout" in msg["data"]:
+                self.output_of = msg.get("id")
 
     @property
     def data(self):
@@ -31,11 +31,65 @@ class Config:
     # Resource limits
     MAX_CONCURRENT_EXECUTIONS = int(os.getenv("MAX_CONCURRENT_EXECUTIONS", 60))
     MAX_PROCESSES_PER_USER = int(os.getenv("MAX_PROCESSES_PER_USER", 2))  # Max 2 processes per user
+    # Runs past those limits wait in a fair-share queue; beyond this many waiting, new runs are refused
+    MAX_QUEUED_EXECUTIONS = int(os.getenv("MAX_QUEUED_EXECUTIONS", 300))
+    # Open REPLs (empty ones and those left after a run) each keep an executor - and with the pool
+    # backend a worker process - alive; they have their own limit, MAX_PROCESSES_PER_USER applies per user
+    MAX_OPEN_REPLS = int(os.getenv("MAX_OPEN_REPLS", 120))
     EXECUTION_TIMEOUT = int(os.getenv("EXECUTION_TIMEOUT", 30))  # seconds
+    # Per-run rlimits applied in pool workers (0 = no limit). Memory is headroom on top of
+    # what the worker already maps for the preloaded libraries
     MEMORY_LIMIT_MB = int(os.getenv("MEMORY_LIMIT_MB", 128))
+    CPU_TIME_LIMIT = int(os.getenv("CPU_TIME_LIMIT", 10))  # seconds of CPU per run, REPL included
+    MAX_OPEN_FILES = int(os.getenv("MAX_OPEN_FILES", 64))
+    MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 10))
     MAX_PROCESS_AGE = int(os.getenv("MAX_PROCESS_AGE", 1800))  # 30 minutes
     MAX_REPL_AGE = int(os.getenv("MAX_REPL_AGE", 3600))  # 60 minutes
 
+    # Script execution backend: "pool" runs scripts in pre-started worker processes,
+    # "thread" runs them inside the server process (legacy behaviour)
+    EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND", "pool").lower()
+    WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", 4))  # Warm idle workers kept ready
+    # Imported once by the template process that workers are forked from (empty = no template)
+    WORKER_PRELOAD_MODULES = os.getenv("WORKER_PRELOAD_MODULES", "numpy,pandas,matplotlib.pyplot")
+
+    # Compiled student scripts, keyed by content hash (LRU entries per process)
+    CODE_CACHE_SIZE = int(os.getenv("CODE_CACHE_SIZE", 256))
+    # Also keep marshalled code under the storage root - shared by pool workers, survives restarts.
+    # Off by default: on EFS each edited script costs an NFS write that is rarely read back
+    CODE_CACHE_DISK = os.getenv("CODE_CACHE_DISK", "false").lower() == "true"
+    CODE_CACHE_DISK_MAX_FILES = int(os.getenv("CODE_CACHE_DISK_MAX_FILES", 2000))  # Oldest pruned beyond this
+    # Replay stored output of unmodified shared example scripts (Lecture Notes etc.) instead of re-running them
+    RESULT_CACHE = os.getenv("RESULT_CACHE", "false").lower() == "true"
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 64))
+
+    # Per-run resource usage written to execution_log by a background batch writer
+    EXECUTION_TELEMETRY = os.getenv("EXECUTION_TELEMETRY", "true").lower() == "true"
+    TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", 5))  # seconds
+
+    # Session last_activity is kept in memory and written to the database in one batch this often
+    SESSION_ACTIVITY_FLUSH_INTERVAL = float(os.getenv("SESSION_ACTIVITY_FLUSH_INTERVAL", 30))  # seconds
+
+    # Validated session tokens are remembered this long (0 = always query the database)
+    SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", 30))  # seconds
+
+    # Queued IDE commands run concurrently up to this limit (still in order per connection)
+    REQUEST_CONCURRENCY = int(os.getenv("REQUEST_CONCURRENCY", 64))
+    # Per-command caps within that limit, as "command:limit,..."
+    REQUEST_COMMAND_LIMITS = os.getenv(
+        "REQUEST_COMMAND_LIMITS", "autocomplete_python:4,ide_move_folder:4,ide_move_file:8,run_pip_command:2"
+    )
+
+    # Frames buffered per WebSocket connection before pending program output is dropped
+    OUTBOUND_BUFFER_KB = int(os.getenv("OUTBOUND_BUFFER_KB", 1024))
+
+    # Threads for blocking file and database work of WebSocket file commands. EFS round trips
+    # wait on the network, not the CPU, so this is well above the core count (and below DB_POOL_MAX)
+    FILE_IO_WORKERS = int(os.getenv("FILE_IO_WORKERS", 16))
+
+    # Matplotlib font/config cache built at startup and shared by every run (empty = ~/.cache/pythonide/matplotlib)
+    MPL_CACHE_DIR = os.getenv("MPL_CACHE_DIR", "")
+
     # Health monitoring
     HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", 30))  # seconds
     IDLE_TIMEOUT = int(os.getenv("IDLE_TIMEOUT", 3600))  # 1 hour
@@ -66,8 +120,27 @@ class Config:
         logger.info(f"  Port: {cls.PORT}")
         logger.info(f"  Max concurrent executions: {cls.MAX_CONCURRENT_EXECUTIONS}")
         logger.info(f"  Max processes per user: {cls.MAX_PROCESSES_PER_USER}")
+        logger.info(f"  Max queued executions: {cls.MAX_QUEUED_EXECUTIONS}")
+        logger.info(f"  Max open REPLs: {cls.MAX_OPEN_REPLS}")
         logger.info(f"  Execution timeout: {cls.EXECUTION_TIMEOUT}s")
-        logger.info(f"  Memory limit: {cls.MEMORY_LIMIT_MB}MB")
+        logger.info(f"  Memory limit: {cls.MEMORY_LIMIT_MB}MB, CPU limit: {cls.CPU_TIME_LIMIT}s")
+        logger.info(f"  Open files limit: {cls.MAX_OPEN_FILES}, file size limit: {cls.MAX_FILE_SIZE_MB}MB")
+        logger.info(f"  Execution backend: {cls.EXECUTION_BACKEND} (pool size: {cls.WORKER_POOL_SIZE})")
+        logger.info(
+            f"  Code cache: {cls.CODE_CACHE_SIZE} entries "
+            f"(disk: {cls.CODE_CACHE_DISK}, max {cls.CODE_CACHE_DISK_MAX_FILES} files)"
+        )
+        logger.info(f"  Result cache: {cls.RESULT_CACHE} ({cls.RESULT_CACHE_SIZE} entries)")
+        logger.info(f"  Execution telemetry: {cls.EXECUTION_TELEMETRY} (flush every {cls.TELEMETRY_FLUSH_INTERVAL}s)")
+        logger.info(
+            f"  Session activity flush: every {cls.SESSION_ACTIVITY_FLUSH_INTERVAL}s, "
+            f"session cache TTL: {cls.SESSION_CACHE_TTL}s"
+        )
+        logger.info(f"  Request concurrency: {cls.REQUEST_CONCURRENCY} (caps: {cls.REQUEST_COMMAND_LIMITS})")
+        logger.info(
+            f"  File I/O workers: {cls.FILE_IO_WORKERS}, outbound buffer: {cls.OUTBOUND_BUFFER_KB}KB per connection"
+        )
+        logger.info(f"  Matplotlib cache: {cls.MPL_CACHE_DIR or '~/.cache/pythonide/matplotlib'}")
         logger.info(f"  WebSocket ping interval: {cls.WS_PING_INTERVAL}s")
         logger.info(f"  Database pool: {cls.DB_POOL_MIN}-{cls.DB_POOL_MAX} connections")
 
@@ -11,7 +11,8 @@ from .analytics_handler import (
     AdminLoginTrendsHandler,
     AdminExecutionTrendsHandler,
     AdminTopUsersHandler,
-    AdminAnalyticsSummaryHandler
+    AdminAnalyticsSummaryHandler,
+    AdminLiveExecutionsHandler
 )
 from .audit_handler import (
     AdminAuditListHandler,
@@ -50,6 +51,7 @@ def get_admin_handlers():
         (r"/api/admin/analytics/execution-trends", AdminExecutionTrendsHandler),
         (r"/api/admin/analytics/top-users", AdminTopUsersHandler),
         (r"/api/admin/analytics/summary", AdminAnalyticsSummaryHandler),
+        (r"/api/admin/analytics/live-executions", AdminLiveExecutionsHandler),
 
         # Audit Log
         (r"/api/admin/audit", AdminAuditListHandler),
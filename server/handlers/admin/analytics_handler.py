@@ -11,8 +11,9 @@ import psutil
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from common.database import db_manager
-from handlers.admin.auth_handler import BaseAdminHandler
+from common.database import db_manager  # noqa: E402
+from command.execution_supervisor import execution_supervisor  # noqa: E402
+from handlers.admin.auth_handler import BaseAdminHandler  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
@@ -383,3 +384,30 @@ class AdminRecentActivityHandler(BaseAdminHandler):
             logger.error(f"Error fetching recent activity: {e}")
             self.set_status(500)
             self.write({"success": False, "error": "Failed to fetch recent activity"})
+
+
+class AdminLiveExecutionsHandler(BaseAdminHandler):
+    """Handler for the list of program runs live on this server"""
+
+    def get(self):
+        """
+        GET /api/admin/analytics/live-executions
+        Returns every live run (user, script, state, next deadline) and the supervisor counters.
+        """
+        user = self.require_admin()
+        if not user:
+            return
+
+        try:
+            self.write({
+                "success": True,
+                "data": {
+                    "executions": execution_supervisor.snapshot(),
+                    "stats": execution_supervisor.stats()
+                }
+            })
+
+        except Exception as e:
+            logger.error(f"Error fetching live executions: {e}")
+            self.set_status(500)
+            self.write({"success": False, "error": "Failed to fetch live executions"})
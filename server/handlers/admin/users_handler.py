@@ -19,6 +19,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from common.database import db_manager
 from common.file_storage import file_storage
 from auth.admin_session_manager import admin_session_manager
+from auth.session_cache import session_cache, admin_session_cache  # noqa: E402
 from utils.audit_logger import log_admin_action, AuditActionType
 from utils.password_generator import PasswordGenerator
 from handlers.admin.auth_handler import BaseAdminHandler
@@ -342,6 +343,10 @@ class AdminUserDetailHandler(BaseAdminHandler):
                 self.write_error_response(404, "User not found")
                 return
 
+            # Cached sessions carry the old role and name - an admin session must not outlive a demotion
+            session_cache.invalidate_user(user_id=int(user_id))
+            admin_session_cache.invalidate_user(user_id=int(user_id))
+
             # Log action
             log_admin_action(
                 admin_user_id=admin["user_id"],
@@ -384,6 +389,8 @@ class AdminUserDetailHandler(BaseAdminHandler):
             # Delete user
             delete_query = "DELETE FROM users WHERE id = %s"
             db_manager.execute_query(delete_query, (int(user_id),))
+            session_cache.invalidate_user(user_id=int(user_id))
+            admin_session_cache.invalidate_user(user_id=int(user_id))
 
             # Log action
             log_admin_action(
@@ -450,6 +457,8 @@ class AdminUserDetailHandler(BaseAdminHandler):
             # Invalidate all sessions for this user
             invalidate_query = "UPDATE sessions SET is_active = false WHERE user_id = %s"
             db_manager.execute_query(invalidate_query, (int(user_id),))
+            session_cache.invalidate_user(user_id=int(user_id))
+            admin_session_cache.invalidate_user(user_id=int(user_id))
 
             # Log action
             log_admin_action(
@@ -2,6 +2,7 @@
 
 import json
 import datetime
+import inspect
 import threading
 from tornado import websocket
 from tornado import ioloop
@@ -20,9 +21,10 @@ from .websocket_keepalive import WebSocketKeepaliveMixin
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from auth.user_manager_postgres import UserManager
-from command.secure_file_manager import SecureFileManager
-from command.file_sync import file_sync
+from auth.user_manager_postgres import UserManager  # noqa: E402
+from command.secure_file_manager import SecureFileManager  # noqa: E402
+from command.file_sync import file_sync  # noqa: E402
+from command.file_io_pool import file_io_pool  # noqa: E402
 
 # Check if running in exam mode (disables certain features like CSV search/sort)
 is_exam_mode = os.environ.get("IS_EXAM_MODE", "false").lower() == "true"
@@ -322,7 +324,7 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
             except Exception as e:
                 logger.error(f"Error releasing locks for {self.username}: {e}")
 
-        # Stop all running subprograms for this connection
+        # Stop all running subprograms for this connection (signals only - the reaper joins them)
         if hasattr(self, 'handler_info'):
             try:
                 self.handler_info.stop_subprogram(None)  # None stops all
@@ -366,7 +368,8 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
             elif not self.authenticated:
                 self.write_error("Not authenticated. Please login first.")
             else:
-                # AUTO-LOGOUT: Update last_activity on every authenticated message
+                # AUTO-LOGOUT: Update last_activity on every authenticated message (in memory,
+                # written to the database in batches)
                 if self.session_id:
                     self.user_manager.update_session_activity(self.session_id)
 
@@ -520,8 +523,7 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
                 self.write_error(f"File operation rate limit exceeded. Please wait {int(wait_time)} seconds.")
                 return
 
-            result = ide_commands[cmd](data)
-            self.write_message(json.dumps(result))
+            self._run_callback(self._reply_ide_command, ide_commands[cmd], data)
             return
 
         # File operations using SecureFileManager
@@ -536,8 +538,7 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
 
         if cmd in file_commands:
             # Execute file command with user context
-            result = file_commands[cmd](self.username, self.role, data)
-            self.write_message(json.dumps({"type": f"{cmd}_result", "cmd": cmd, **result}))
+            self._run_callback(self._reply_file_command, cmd, file_commands[cmd], data)
 
         # Legacy command handling for code execution
         elif cmd in [
@@ -570,7 +571,7 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
             message_with_auth = json.dumps(
                 {"cmd": cmd, "cmd_id": data.get("cmd_id", data.get("id", 0)), "data": actual_data}
             )
-            self._run_callback(req_put, self, message_with_auth)
+            self._run_callback(self._forward_legacy_command, message_with_auth)
 
         else:
             # Pass unrecognized commands to legacy handler (for ide_move_file, ide_move_folder, etc.)
@@ -581,10 +582,44 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
             message_with_auth = json.dumps(
                 {"cmd": cmd, "cmd_id": data.get("cmd_id", data.get("id", 0)), "data": actual_data}
             )
-            self._run_callback(req_put, self, message_with_auth)
+            self._run_callback(self._forward_legacy_command, message_with_auth)
 
-    def handle_list_projects(self, data):
+    # Commands reach the handlers below as coroutines started in message order. Each one
+    # queues its file work on file_io_pool before its first await, so a user's commands
+    # run in the order they were sent while the IOLoop keeps serving everyone else.
+
+    async def _reply_ide_command(self, handler, data):
+        try:
+            if inspect.iscoroutinefunction(handler):
+                result = await handler(data)
+            else:
+                result = await file_io_pool.run(self.username, handler, data)
+        except Exception as e:
+            logger.error(f"Error handling file command: {e}")
+            self.write_error(str(e))
+            return
+        self.write_message(json.dumps(result))
+
+    async def _reply_file_command(self, cmd, handler, data):
+        try:
+            result = await file_io_pool.run(self.username, handler, self.username, self.role, data)
+        except Exception as e:
+            logger.error(f"Error handling {cmd}: {e}")
+            self.write_error(str(e))
+            return
+        self.write_message(json.dumps({"type": f"{cmd}_result", "cmd": cmd, **result}))
+
+    async def _forward_legacy_command(self, message):
+        # Runs read the file from disk - wait for the user's queued saves to land first
+        file_io_pool.run_after(self.username, self._run_callback, req_put, self, message)
+
+    async def handle_list_projects(self, data):
         """Handle ide_list_projects command - returns available projects for user"""
+        projects = await file_io_pool.run(self.username, self._scan_projects)
+        return {"code": 0, "data": projects, "id": data.get("id", 1)}
+
+    def _scan_projects(self):
+        """Top-level projects visible to this user (runs on file_io_pool)"""
         import os
 
         print(f"\n========== HANDLE_LIST_PROJECTS DEBUG ==========")
@@ -654,9 +689,9 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
         print(f"Final projects list: {projects}")
         print(f"================================================\n")
 
-        return {"code": 0, "data": projects, "id": data.get("id", 1)}
+        return projects
 
-    def handle_get_project(self, data):
+    async def handle_get_project(self, data):
         """Handle ide_get_project command - returns directory tree for a project"""
         project_name = data.get("data", {}).get("projectName", "")
 
@@ -669,16 +704,12 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
             actual_project_path = project_name
 
         # Build file tree for the project
-        result = self.build_file_tree(actual_project_path)
+        result = await self.build_file_tree(actual_project_path)
 
         return {"code": 0 if result else -1, "data": result, "id": data.get("id", 1)}
 
-    def build_file_tree(self, project_path):
+    async def build_file_tree(self, project_path):
         """Build a file tree structure for the frontend"""
-        import os
-        from pathlib import Path
-        from common.file_storage import file_storage
-
         # Validate access
         if not project_path:
             return None
@@ -689,6 +720,12 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
                 if not project_path.startswith(f"Local/{self.username}"):
                     return None
 
+        return await file_io_pool.run(self.username, self._scan_file_tree, project_path)
+
+    def _scan_file_tree(self, project_path):
+        """Walk a project directory into tree nodes (runs on file_io_pool)"""
+        from pathlib import Path
+
         # Use the correct storage path (EFS in production, local in dev)
         base_path = Path(self.file_manager.base_path)
         full_path = base_path / project_path
@@ -723,7 +760,7 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
 
         return build_tree_node(full_path, project_path)
 
-    def handle_get_file(self, data):
+    async def handle_get_file(self, data):
         """Handle ide_get_file command"""
         request_data = data.get("data", {})
         project_name = request_data.get("projectName", "")
@@ -747,7 +784,9 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
         is_binary = request_data.get("binary", False)
 
         # Use secure file manager to get file
-        result = self.file_manager.get_file(self.username, self.role, {"path": full_path})
+        result = await file_io_pool.run(
+            self.username, self.file_manager.get_file, self.username, self.role, {"path": full_path}
+        )
 
         if result["success"]:
             # Log successful file retrieval
@@ -768,7 +807,7 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
             logger.warning(f"Failed to get file {full_path}: {result.get('error')}")
             return {"code": -1, "msg": result.get("error", "Failed to get file"), "id": data.get("id", 1)}
 
-    def handle_write_file(self, data):
+    async def handle_write_file(self, data):
         """Handle ide_write_file command"""
         file_data = data.get("data", {})
         project_name = file_data.get("projectName", "")
@@ -790,7 +829,10 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
         logger.info(f"Saving file: {full_path}, content_length: {len(content)}")
 
         # Use secure file manager to save file
-        result = self.file_manager.save_file(self.username, self.role, {"path": full_path, "content": content})
+        result = await file_io_pool.run(
+            self.username, self.file_manager.save_file,
+            self.username, self.role, {"path": full_path, "content": content}
+        )
 
         logger.info(f"Save result: {result}")
 
@@ -1049,7 +1091,8 @@ class AuthenticatedWebSocketHandler(websocket.WebSocketHandler, WebSocketKeepali
         """Override to ensure connection is still open"""
         if self.connected:
             try:
-                super().write_message(message, binary)
+                # The future resolves once the frame reaches the socket - ClientOutbox waits on it
+                return super().write_message(message, binary)
             except Exception as e:
                 logger.error(f"Error writing message: {e}")
 
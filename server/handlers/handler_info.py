@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+from command.subprogram_reaper import subprogram_reaper
+
 
 class HandlerInfo(object):
     def __init__(self, *args, **kwargs) -> None:
@@ -42,6 +44,7 @@ class HandlerInfo(object):
             print(f"[HANDLER-INFO-START] ERROR: program_id {program_id} not found in subprograms")
 
     def stop_subprogram(self, program_id):
+        """Signal the subprogram(s) to stop and return at once - the reaper waits for them"""
         print(f"[HANDLER-INFO-STOP] stop_subprogram called with program_id: {program_id}")
         print(f"[HANDLER-INFO-STOP] Current subprograms: {list(self.subprograms.keys())}")
 
@@ -50,42 +53,24 @@ class HandlerInfo(object):
             print(f"[HANDLER-INFO-STOP] Stopping all {len(self.subprograms)} subprograms")
             # Make a copy to avoid modifying dict during iteration
             subprograms_copy = list(self.subprograms.items())
-
-            # Stop all threads
-            for pid, t in subprograms_copy:
-                print(f"[HANDLER-INFO-STOP] Stopping {pid}: {t}")
-                try:
-                    t.stop()
-                except Exception as e:
-                    print(f"[HANDLER-INFO-STOP] Error stopping {pid}: {e}")
-
-            # Join all threads and clear the dictionary
-            for pid, t in subprograms_copy:
-                try:
-                    print(f"[HANDLER-INFO-STOP] Joining thread {pid}")
-                    t.join(timeout=2.0)  # Wait max 0.5 seconds per thread
-                except Exception as e:
-                    print(f"[HANDLER-INFO-STOP] Error joining {pid}: {e}")
-
-            # Clear all subprograms after stopping
             self.subprograms.clear()
+            for pid, t in subprograms_copy:
+                self._stop(pid, t)
             print(f"[HANDLER-INFO-STOP] Cleared all subprograms")
         elif program_id in self.subprograms:
-            try:
-                t = self.subprograms.pop(program_id)
-                print(f"[HANDLER-INFO-STOP] Found and popped subprogram {program_id}: {t}")
-                print(f"[HANDLER-INFO-STOP] Thread alive before stop: {t.is_alive() if hasattr(t, 'is_alive') else 'N/A'}")
-
-                t.stop()
-                print(f"[HANDLER-INFO-STOP] stop() called on {program_id}")
-
-                t.join(timeout=0.5)  # Wait max 0.5 seconds for thread to finish
-                print(f"[HANDLER-INFO-STOP] Thread alive after join: {t.is_alive() if hasattr(t, 'is_alive') else 'N/A'}")
-                print(f"[HANDLER-INFO-STOP] Subprogram {program_id} stopped and joined")
-            except Exception as e:
-                print(f"[HANDLER-INFO-STOP] Error stopping subprogram {program_id}: {e}")
-                import traceback
-                traceback.print_exc()
-                pass
+            self._stop(program_id, self.subprograms.pop(program_id))
         else:
             print(f"[HANDLER-INFO-STOP] Program ID {program_id} not found in subprograms")
+
+    @staticmethod
+    def _stop(program_id, t):
+        # stop() only sets flags and sends signals; joining (up to seconds per thread)
+        # would stall the IOLoop, so that is left to the reaper
+        print(f"[HANDLER-INFO-STOP] Stopping {program_id}: {t}")
+        try:
+            t.stop()
+        except Exception as e:
+            print(f"[HANDLER-INFO-STOP] Error stopping {program_id}: {e}")
+            import traceback
+            traceback.print_exc()
+        subprogram_reaper.submit(program_id, t)
@@ -100,6 +100,7 @@ class MigrationManager:
             ("009_login_history", self._migration_009_login_history),
             ("010_file_access_log", self._migration_010_file_access_log),
             ("011_execution_log", self._migration_011_execution_log),
+            ("012_execution_log_telemetry", self._migration_012_execution_log_telemetry),
         ]
 
         for name, migration_func in migration_definitions:
@@ -407,6 +408,18 @@ class MigrationManager:
         CREATE INDEX IF NOT EXISTS idx_execution_exit_code ON execution_log(exit_code);
         """
 
+    def _migration_012_execution_log_telemetry(self) -> str:
+        """Add per-run resource usage columns to execution_log"""
+        return """
+        ALTER TABLE execution_log ADD COLUMN IF NOT EXISTS cpu_time_ms INTEGER;
+        ALTER TABLE execution_log ADD COLUMN IF NOT EXISTS peak_rss_kb INTEGER;
+        ALTER TABLE execution_log ADD COLUMN IF NOT EXISTS output_bytes BIGINT;
+        ALTER TABLE execution_log ADD COLUMN IF NOT EXISTS output_lines INTEGER;
+        ALTER TABLE execution_log ADD COLUMN IF NOT EXISTS termination_reason VARCHAR(20);
+
+        CREATE INDEX IF NOT EXISTS idx_execution_termination ON execution_log(termination_reason);
+        """
+
 
 def run_auto_migrations(database_url: str) -> bool:
     """Entry point for automatic migrations"""
@@ -6,11 +6,13 @@ import argparse
 import logging
 import time
 import gc
+import signal
 import psutil
 from tornado import ioloop
 from tornado import web
 from tornado import httpserver
 from tornado.ioloop import PeriodicCallback
+from tornado.process import Subprocess
 from dotenv import load_dotenv
 from command.processor import RequestProcessor, ResponseProcessor
 from handlers.ws_handler import WebSocketHandler
@@ -34,6 +36,18 @@ from handlers.student_list_handler import StudentListHandler
 from setup_route import SetupHandler, ResetDatabaseHandler
 from common.database import db_manager
 from health_monitor import health_monitor
+from command.code_cache import code_cache
+from command.result_cache import result_cache
+from command.admission import admission_scheduler
+from command.execution_telemetry import telemetry_writer
+from command.mpl_cache import mpl_cache
+from command.subprogram_reaper import subprogram_reaper
+from command.execution_supervisor import execution_supervisor
+from command.file_io_pool import file_io_pool
+from command.request_dispatcher import request_dispatcher
+from command.client_outbox import client_outboxes
+from auth.session_activity import session_activity
+from auth.session_cache import session_cache, admin_session_cache
 from migrations.migration_manager import run_auto_migrations
 from auto_init_users import init_users_if_needed
 from tornado.web import StaticFileHandler
@@ -105,6 +119,20 @@ class HealthCheckHandler(web.RequestHandler):
             health_status["database"] = db_status
             health_status["db_pool"] = db_pool_stats
 
+            health_status["code_cache"] = code_cache.stats()
+            health_status["result_cache"] = result_cache.stats()
+            health_status["admission"] = admission_scheduler.stats()
+            health_status["telemetry"] = telemetry_writer.stats()
+            health_status["mpl_cache"] = mpl_cache.stats()
+            health_status["subprogram_reaper"] = subprogram_reaper.stats()
+            health_status["session_activity"] = session_activity.stats()
+            health_status["session_cache"] = {"ide": session_cache.stats(), "admin": admin_session_cache.stats()}
+            health_status["requests"] = request_dispatcher.stats()
+            health_status["outbound"] = client_outboxes.stats()
+            health_status["file_io"] = file_io_pool.stats()
+            # Counters only - the list of live runs (who runs what) is at /api/admin/analytics/live-executions
+            health_status["executions"] = execution_supervisor.stats()
+
             # Warn if resources are getting high
             if memory.percent > 80 or cpu > 80:
                 health_status["warning"] = "High resource usage detected"
@@ -248,6 +276,11 @@ def main():
     parser.add_argument("--num_processes", type=int, default=-1, help="fork process to support")
     args = parser.parse_args()
 
+    # Route print() output per executor thread instead of swapping sys.stdout for every run
+    from command.simple_exec_v3 import install_output_router
+
+    install_output_router()
+
     # Railway provides PORT environment variable
     port = args.port or int(os.getenv("PORT", 10086))
     address = args.address
@@ -367,6 +400,9 @@ def main():
     main_ioloop.add_timeout(1, req_processor.loop)
     main_ioloop.add_timeout(1, res_processor.loop)
 
+    # pip commands run as IOLoop-driven subprocesses - the SIGCHLD handler must be installed from the main thread
+    Subprocess.initialize()
+
     # Initialize process cleanup service
     cleanup_service = ProcessCleanupService()
 
@@ -384,6 +420,24 @@ def main():
     # Start health monitoring service
     health_monitor.start()
 
+    # Build matplotlib's font cache once; runs and the workers forked below all share it
+    mpl_cache.build()
+    mpl_cache.activate()
+
+    # Keep warm worker processes ready for script execution
+    from config import Config as ServerConfig
+
+    if ServerConfig.EXECUTION_BACKEND == "pool":
+        from command.worker_pool import worker_pool
+
+        worker_pool.start()
+        logger.info(f"Execution worker pool started ({worker_pool.size} warm workers)")
+    else:
+        # Scripts run in this process - install the filesystem sandbox once, not per run
+        from command.simple_exec_v3 import install_execution_sandbox
+
+        install_execution_sandbox()
+
     # Start idle session cleanup job (auto-logout after 1 hour inactivity)
     from auth.user_manager_postgres import UserManager, IdleSessionCleanupJob
 
@@ -461,7 +515,10 @@ def main():
     db_refresh_callback.start()
     logger.info(f"Database connection pool refresh started (interval: {db_refresh_interval/1000}s, testing ~{min(5, 5)}% of pool)")
 
+    # Container shutdown sends SIGTERM - stop the loop so buffered session activity is written
+    main_ioloop.asyncio_loop.add_signal_handler(signal.SIGTERM, main_ioloop.stop)
     main_ioloop.start()
+    session_activity.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Shared test fixtures
+Fake WebSocket clients and event loops, a capturing executor and the polling
+and temp-script helpers used across the execution tests
+"""
+
+import unittest
+import json
+import tempfile
+import time
+import sys
+import os
+from unittest.mock import Mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.exec_protocol import MessageType  # noqa: E402
+from command.simple_exec_v3 import SimpleExecutorV3  # noqa: E402
+
+
+class RecordingClient:
+    """Collects frames the executor would send over the WebSocket"""
+
+    def __init__(self):
+        self.frames = []
+
+    def write_message(self, message, binary=False):
+        self.frames.append(json.loads(message))
+
+    def types(self):
+        return [frame["type"] for frame in self.frames]
+
+    def stdout(self):
+        return "".join(f["data"].get("text", "") for f in self.frames if f["type"] == "stdout")
+
+    def errors(self):
+        return [f["data"].get("error", "") for f in self.frames if f["type"] == "error"]
+
+
+class InlineLoop:
+    """Runs call_soon_threadsafe callbacks right away, on the calling thread"""
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+
+class FakeOutbound:
+    """Stands in for OutboundQueue: keeps (msg_type, data) pairs"""
+
+    def __init__(self):
+        self.messages = []
+
+    def put(self, msg_type, data):
+        self.messages.append((msg_type, data))
+
+
+class CapturingExecutor(SimpleExecutorV3):
+    """SimpleExecutorV3 whose messages and telemetry record stay in memory"""
+
+    def _create_outbound(self):
+        return FakeOutbound()
+
+    def _report_telemetry(self, record):
+        self.telemetry = record
+
+    def types(self):
+        return [msg_type for msg_type, _ in self.outbound.messages]
+
+    def stdout(self):
+        return "".join(data for msg_type, data in self.outbound.messages if msg_type == MessageType.STDOUT)
+
+
+class FrameRecordingTestCase(unittest.TestCase):
+    """Executor tests with a mock client whose frames land in self.frames and an inline loop"""
+
+    def setUp(self):
+        self.frames = []
+        self.mock_client = Mock()
+        self.mock_client.write_message = Mock(side_effect=lambda msg: self.frames.append(json.loads(msg)))
+        self.mock_loop = Mock()
+        self.mock_loop.call_soon_threadsafe = Mock(side_effect=lambda callback, *args: callback(*args))
+
+
+def wait_for(predicate, timeout=10, interval=0.01):
+    """Poll predicate until it is true (True) or timeout seconds pass (False)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return False
+
+
+def write_script(testcase, source):
+    """Write source to a temporary .py file, removed when the test ends"""
+    fd, path = tempfile.mkstemp(suffix='.py')
+    with os.fdopen(fd, 'w') as f:
+        f.write(source)
+    testcase.addCleanup(os.remove, path)
+    return path
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Test Suite for AdmissionScheduler
+Checks the global and per-user limits, round-robin order across users and the
+queue position messages sent to waiting clients, and the REPL slots that
+bound open REPLs
+"""
+
+import unittest
+import threading
+import time
+import sys
+import os
+from unittest.mock import patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.admission import AdmissionScheduler
+from command.exec_protocol import MessageType
+from helpers import CapturingExecutor, FakeOutbound, RecordingClient, write_script
+
+
+class FakeExecutor:
+    """Records start() instead of running anything"""
+
+    def __init__(self, cmd_id):
+        self.cmd_id = cmd_id
+        self.outbound = FakeOutbound()
+        self.started = False
+        self.queued = False
+        self.stopped = False
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.stopped = True
+
+    def texts(self):
+        return [data for msg_type, data in self.outbound.messages if msg_type == MessageType.STDOUT]
+
+
+class TestAdmissionScheduler(unittest.TestCase):
+    """Test cases for AdmissionScheduler"""
+
+    def make(self, **kwargs):
+        kwargs.setdefault("max_queued", 100)
+        # Keep the position refresh timer out of the way unless a test drives it
+        kwargs.setdefault("update_interval", 3600)
+        return AdmissionScheduler(**kwargs)
+
+    def test_global_limit_queues_and_admits_on_release(self):
+        scheduler = self.make(max_running=2, max_per_user=2)
+        runs = [FakeExecutor(f"run-{i}") for i in range(3)]
+        for i, run in enumerate(runs):
+            self.assertTrue(scheduler.submit(run, f"user{i}"))
+
+        self.assertTrue(runs[0].started and runs[1].started)
+        self.assertFalse(runs[2].started)
+        self.assertTrue(runs[2].queued)
+        self.assertIn("position 1", runs[2].texts()[0])
+        # Runs that started straight away hear nothing from the scheduler
+        self.assertEqual(runs[0].texts(), [])
+
+        scheduler.release(runs[0])
+        self.assertTrue(runs[2].started)
+        self.assertFalse(runs[2].queued)
+        self.assertIn("Starting your program", runs[2].texts()[-1])
+        self.assertEqual(scheduler.stats()["running"], 2)
+
+        # Releasing twice (stop() and cleanup() both release) is harmless
+        scheduler.release(runs[0])
+        self.assertEqual(scheduler.stats()["running"], 2)
+
+    def test_per_user_limit(self):
+        scheduler = self.make(max_running=10, max_per_user=1)
+        first, second, other = FakeExecutor("a1"), FakeExecutor("a2"), FakeExecutor("b1")
+        scheduler.submit(first, "alice")
+        scheduler.submit(second, "alice")
+        scheduler.submit(other, "bob")
+
+        self.assertTrue(first.started)
+        self.assertFalse(second.started, "alice is at her own limit even though slots are free")
+        self.assertTrue(other.started, "other users are not held up by alice's queue")
+
+        scheduler.release(first)
+        self.assertTrue(second.started)
+
+    def test_round_robin_across_users(self):
+        scheduler = self.make(max_running=1, max_per_user=5)
+        order = []
+
+        class Tracked(FakeExecutor):
+            def start(self):
+                super().start()
+                order.append(self.cmd_id)
+
+        alice = [Tracked(f"a{i}") for i in range(4)]
+        for run in alice:
+            scheduler.submit(run, "alice")
+        bob, carol = Tracked("b0"), Tracked("c0")
+        scheduler.submit(bob, "bob")
+        scheduler.submit(carol, "carol")
+
+        # One turn per user per round: alice a1, then bob, then carol
+        self.assertIn("position 2", bob.texts()[0])
+        self.assertIn("position 3", carol.texts()[0])
+
+        running = alice[0]
+        runs = {run.cmd_id: run for run in alice + [bob, carol]}
+        while len(order) < 6:
+            scheduler.release(running)
+            running = runs[order[-1]]
+        self.assertEqual(order, ["a0", "a1", "b0", "c0", "a2", "a3"])
+
+    def test_stopped_while_queued(self):
+        scheduler = self.make(max_running=1)
+        running, waiting = FakeExecutor("r"), FakeExecutor("w")
+        scheduler.submit(running, "alice")
+        scheduler.submit(waiting, "bob")
+
+        scheduler.release(waiting)
+        self.assertFalse(waiting.queued)
+        self.assertEqual(scheduler.stats()["queued"], 0)
+
+        scheduler.release(running)
+        self.assertFalse(waiting.started, "a stopped run must never be started later")
+        self.assertEqual(scheduler.stats()["running"], 0)
+
+    def test_queue_full_rejects(self):
+        scheduler = self.make(max_running=1, max_queued=2)
+        runs = [FakeExecutor(f"run-{i}") for i in range(4)]
+        results = [scheduler.submit(run, f"user{i}") for i, run in enumerate(runs)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(scheduler.stats()["rejected"], 1)
+
+    def test_position_updates_only_when_changed(self):
+        scheduler = self.make(max_running=1, default_run_seconds=10)
+        runs = [FakeExecutor(f"run-{i}") for i in range(3)]
+        for i, run in enumerate(runs):
+            scheduler.submit(run, f"user{i}")
+        self.assertIn("estimated wait 20s", runs[2].texts()[0])
+
+        scheduler._send_updates()
+        self.assertEqual(len(runs[2].texts()), 1, "nothing moved, nothing sent")
+
+        scheduler.release(runs[0])
+        scheduler._send_updates()
+        self.assertIn("position 1", runs[2].texts()[-1])
+        scheduler._update_entry.cancelled = True
+
+    def test_concurrent_runs_never_exceed_limits(self):
+        """A whole class pressing Run at once: every run finishes, limits always hold"""
+        scheduler = AdmissionScheduler(max_running=4, max_per_user=2, max_queued=1000, update_interval=0.05)
+        lock = threading.Lock()
+        active = {"total": 0, "peak": 0}
+        per_user = {}
+        violations = []
+        finished = []
+
+        class Run(threading.Thread):
+            def __init__(self, cmd_id, username):
+                super().__init__(daemon=True)
+                self.cmd_id = cmd_id
+                self.username = username
+                self.outbound = FakeOutbound()
+
+            def run(self):
+                with lock:
+                    active["total"] += 1
+                    active["peak"] = max(active["peak"], active["total"])
+                    per_user[self.username] = per_user.get(self.username, 0) + 1
+                    if per_user[self.username] > 2:
+                        violations.append(self.cmd_id)
+                time.sleep(0.005)
+                with lock:
+                    active["total"] -= 1
+                    per_user[self.username] -= 1
+                    finished.append(self.cmd_id)
+                scheduler.release(self)
+
+        runs = [Run(f"run-{i}", f"user{i % 10}") for i in range(120)]
+        submitters = [threading.Thread(target=scheduler.submit, args=(run, run.username)) for run in runs]
+        for t in submitters:
+            t.start()
+        for t in submitters:
+            t.join()
+        deadline = time.time() + 10
+        while len(finished) < len(runs) and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(len(finished), len(runs))
+        self.assertLessEqual(active["peak"], 4)
+        self.assertEqual(violations, [])
+        stats = scheduler.stats()
+        self.assertEqual((stats["running"], stats["queued"]), (0, 0))
+        self.assertEqual(stats["admitted"], len(runs))
+
+    def test_repl_after_run_holds_repl_slot_not_run_slot(self):
+        scheduler = self.make(max_running=1, max_per_user=2, max_repls=1)
+        run, other, empty = FakeExecutor("run"), FakeExecutor("other"), FakeExecutor("empty")
+        scheduler.submit(run, "alice")
+        # Script done: the run slot goes back and the REPL takes a REPL slot
+        scheduler.release(run)
+        self.assertTrue(scheduler.open_repl(run, "alice"))
+
+        scheduler.submit(other, "bob")
+        self.assertTrue(other.started, "an open REPL does not hold a run slot")
+        self.assertFalse(scheduler.open_repl(empty, "carol"), "every REPL slot is taken")
+        self.assertEqual(scheduler.stats()["repls_refused"], 1)
+
+        # The REPL exits (cleanup releases again)
+        scheduler.release(run)
+        self.assertEqual(scheduler.stats()["repls"], 0)
+        self.assertEqual(scheduler.stats()["running"], 1)
+        self.assertTrue(scheduler.open_repl(empty, "carol"))
+
+    def test_per_user_repl_limit_closes_oldest(self):
+        scheduler = self.make(max_running=10, max_per_user=2, max_repls=10)
+        repls = [FakeExecutor(f"repl-{i}") for i in range(3)]
+        for repl in repls:
+            self.assertTrue(scheduler.open_repl(repl, "alice"))
+
+        self.assertTrue(repls[0].stopped)
+        self.assertIn("Console closed", repls[0].texts()[0])
+        self.assertFalse(repls[1].stopped or repls[2].stopped)
+        stats = scheduler.stats()
+        self.assertEqual((stats["repls"], stats["repls_evicted"]), (2, 1))
+
+        # The closed REPL's own cleanup must not free someone else's slot
+        scheduler.release(repls[0])
+        self.assertEqual(scheduler.stats()["repls"], 2)
+
+    def test_executor_skips_repl_without_slot(self):
+        scheduler = self.make(max_running=1, max_per_user=1, max_repls=1)
+        self.assertTrue(scheduler.open_repl(FakeExecutor("repl"), "bob"))
+        path = write_script(self, "print('done')\n")
+        executor = CapturingExecutor("run", RecordingClient(), None, script_path=path, username="alice")
+
+        with patch("command.simple_exec_v3.admission_scheduler", scheduler):
+            executor.start()
+            executor.join(timeout=10)
+
+        self.assertFalse(executor.is_alive())
+        self.assertIn("done", executor.stdout())
+        self.assertIn("no interactive console", executor.stdout())
+        self.assertNotIn(MessageType.REPL_READY, executor.types())
+        self.assertIn(MessageType.COMPLETE, executor.types())
+        self.assertEqual(scheduler.stats()["repls"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
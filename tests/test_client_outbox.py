@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the ClientOutbox
+Checks that a slow client gets one write at a time, that buffered bytes stay
+under the cap by collapsing old output into an "output truncated" notice, and
+that control frames are never dropped
+"""
+
+import unittest
+import asyncio
+import json
+import sys
+import os
+from unittest.mock import patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.client_outbox import ClientOutbox, ClientOutboxes, truncated_text
+from command.exec_protocol import MessageType
+from command.outbound_queue import OutboundQueue
+from common.msg import ResponseItem
+
+
+class SlowClient:
+    """A browser tab that only reads when the test says so"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.frames = []
+        self.pending = []
+
+    def write_message(self, message, binary=False):
+        self.frames.append(message)
+        future = self.loop.create_future()
+        self.pending.append(future)
+        return future
+
+    def read(self, error=None):
+        """Complete every pending write, as if the socket drained"""
+        while self.pending:
+            future = self.pending.pop(0)
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+
+def output(n):
+    return json.dumps({"type": "stdout", "text": "x" * 1000, "n": n})
+
+
+def notice(dropped):
+    return json.dumps({"type": "stdout", "text": truncated_text(dropped)})
+
+
+class TestClientOutbox(unittest.TestCase):
+    """Test cases for ClientOutbox"""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.client = SlowClient(self.loop)
+
+    def test_one_write_in_flight(self):
+        outbox = ClientOutbox(self.client, max_bytes=1_000_000)
+        for n in range(5):
+            outbox.put(output(n), "run-1", notice)
+        self.assertEqual(len(self.client.frames), 1)  # The rest wait for the first write
+        self.assertGreater(outbox.buffered_bytes(), 4000)
+
+        for _ in range(5):
+            self.client.read()
+        self.assertEqual([json.loads(f)["n"] for f in self.client.frames], [0, 1, 2, 3, 4])
+        self.assertEqual(outbox.buffered_bytes(), 0)
+
+    def test_overflow_collapses_output_but_keeps_control_frames(self):
+        outbox = ClientOutbox(self.client, max_bytes=20_000)
+        outbox.put(json.dumps({"type": "response", "id": 1}))  # Written straight away
+        for n in range(100):
+            outbox.put(output(n), "run-1", notice)
+            if n == 50:
+                outbox.put(json.dumps({"type": "input_request", "prompt": "Name: "}))
+            self.assertLessEqual(outbox.buffered_bytes(), 20_000)
+        outbox.put(json.dumps({"type": "complete"}))
+
+        while self.client.pending:
+            self.client.read()
+        frames = [json.loads(f) for f in self.client.frames]
+        types = [f["type"] for f in frames]
+        self.assertEqual(types[0], "response")
+        self.assertIn("input_request", types)
+        self.assertEqual(types[-1], "complete")
+        # The newest output survives; dropped output shows up as notices
+        self.assertEqual([f["n"] for f in frames if "n" in f][-1], 99)
+        notices = [f["text"] for f in frames if "truncated" in f.get("text", "")]
+        self.assertTrue(notices)
+        self.assertLess(len(notices), 10)
+        self.assertGreater(outbox.frames_dropped, 50)
+        self.assertEqual(outbox.buffered_bytes(), 0)
+
+    def test_repeated_overflow_keeps_one_notice_count(self):
+        """Drops from overflow after overflow add up in a single notice"""
+        outbox = ClientOutbox(self.client, max_bytes=10_000)
+        for n in range(100):
+            outbox.put(output(n), "run-1", notice)  # The first write never completes meanwhile
+            self.assertLessEqual(outbox.buffered_bytes(), 10_000)
+
+        while self.client.pending:
+            self.client.read()
+        frames = [json.loads(f) for f in self.client.frames]
+        notices = [f["text"] for f in frames if "truncated" in f.get("text", "")]
+        delivered = [f["n"] for f in frames if "n" in f]
+        self.assertEqual(len(notices), 1)
+        self.assertEqual(outbox.frames_dropped, 100 - len(delivered))
+        dropped_kb = outbox.bytes_dropped // 1024
+        self.assertGreater(dropped_kb, 85)  # ~90 of the 100 KB printed
+        self.assertEqual(notices[0], truncated_text(outbox.bytes_dropped))
+
+    def test_closed_connection_discards_buffer(self):
+        outbox = ClientOutbox(self.client, max_bytes=1_000_000)
+        for n in range(5):
+            outbox.put(output(n), "run-1", notice)
+        self.client.read(error=ConnectionResetError("gone"))
+        self.assertEqual(outbox.buffered_bytes(), 0)
+        self.assertEqual(len(self.client.frames), 1)
+
+    def test_flooding_run_memory_bounded(self):
+        """A flooding run against a tab that never reads keeps at most the cap buffered"""
+        outboxes = ClientOutboxes(max_bytes=64 * 1024)
+        queue_ = OutboundQueue(self.client, self.loop, 'flood')
+        with patch('command.outbound_queue.client_outboxes', outboxes):
+            for i in range(20_000):
+                queue_.put(MessageType.STDOUT, f"line {i}\n" * 10)
+                if i % 100 == 0:
+                    self.loop.run_until_complete(asyncio.sleep(0))
+            queue_.put(MessageType.COMPLETE, {"exit_code": 0})
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+            stats = outboxes.stats()
+            sys.__stdout__.write(f"\n[BENCHMARK] flooding run, client not reading: {stats['buffered_bytes']} bytes "
+                                 f"buffered, {stats['bytes_dropped']} dropped\n")
+            self.assertLessEqual(stats["buffered_bytes"], 64 * 1024)
+            self.assertGreater(stats["truncations"], 0)
+
+            while self.client.pending:
+                self.client.read()
+        frames = [json.loads(f) for f in self.client.frames]
+        self.assertEqual(frames[-1]["type"], "complete")
+        self.assertIn("output truncated", "".join(f["data"].get("text", "") for f in frames))
+
+    def test_response_items_classified(self):
+        def item(code, data):
+            return ResponseItem(None, {"type": "response", "id": 7, "code": code, "data": data})
+
+        self.assertEqual(item(0, {"stdout": "hi"}).output_of, 7)
+        self.assertIsNone(item(1111, {"stdout": "[exit]"}).output_of)
+        self.assertIsNone(item(0, None).output_of)
+
+
+if __name__ == '__main__':
+    unittest.main()
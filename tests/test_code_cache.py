@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the content-hash CodeCache
+Checks LRU reuse, eviction, the marshal disk cache and hit/miss counters
+"""
+
+import unittest
+import tempfile
+import shutil
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.code_cache import CodeCache, RESULT_MEMORY, RESULT_DISK, RESULT_MISS, PRUNE_EVERY_WRITES
+
+LECTURE_SOURCE = "\n".join(f"def f{i}(x):\n    return [x * k for k in range({i})]\n" for i in range(300))
+
+
+class TestCodeCache(unittest.TestCase):
+    """Test cases for CodeCache"""
+
+    def setUp(self):
+        self.disk_dir = tempfile.mkdtemp(prefix='code_cache_')
+        self.addCleanup(shutil.rmtree, self.disk_dir, True)
+
+    def test_same_source_compiled_once(self):
+        """A section running the same file shares one code object"""
+        cache = CodeCache(max_entries=8, use_disk=False)
+        first, result = cache.compile(LECTURE_SOURCE, '/lecture/example.py')
+        self.assertEqual(result, RESULT_MISS)
+        for _ in range(30):
+            code, result = cache.compile(LECTURE_SOURCE, '/lecture/example.py')
+            self.assertIs(code, first)
+            self.assertEqual(result, RESULT_MEMORY)
+
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 30))
+        self.assertAlmostEqual(stats["hit_rate"], 30 / 31, places=3)
+
+    def test_key_includes_filename_and_content(self):
+        """Tracebacks keep the right filename; edited files are recompiled"""
+        cache = CodeCache(max_entries=8, use_disk=False)
+        a, _ = cache.compile("x = 1\n", '/a.py')
+        b, result = cache.compile("x = 1\n", '/b.py')
+        self.assertEqual(result, RESULT_MISS)
+        self.assertEqual((a.co_filename, b.co_filename), ('/a.py', '/b.py'))
+        _, result = cache.compile("x = 2\n", '/a.py')
+        self.assertEqual(result, RESULT_MISS)
+
+    def test_lru_eviction(self):
+        """The least recently used entry is dropped at capacity"""
+        cache = CodeCache(max_entries=2, use_disk=False)
+        cache.compile("a = 1\n", '/a.py')
+        cache.compile("b = 1\n", '/b.py')
+        cache.compile("a = 1\n", '/a.py')
+        cache.compile("c = 1\n", '/c.py')
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.compile("a = 1\n", '/a.py')[1], RESULT_MEMORY)
+        self.assertEqual(cache.compile("b = 1\n", '/b.py')[1], RESULT_MISS)
+
+    def test_disk_cache_survives_restart(self):
+        """A fresh process (new cache instance) loads the marshalled code instead of compiling"""
+        cache = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True)
+        cache.compile(LECTURE_SOURCE, '/lecture/example.py')
+        self.assertTrue(cache.flush())
+        restarted = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True)
+        code, result = restarted.compile(LECTURE_SOURCE, '/lecture/example.py')
+        self.assertEqual(result, RESULT_DISK)
+        namespace = {}
+        exec(code, namespace)
+        self.assertEqual(namespace['f3'](2), [0, 2, 4])
+        self.assertEqual(restarted.compile(LECTURE_SOURCE, '/lecture/example.py')[1], RESULT_MEMORY)
+
+    def test_corrupt_disk_entry_recompiled(self):
+        """An unreadable cache file falls back to compile() and is rewritten"""
+        cache = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True)
+        cache.compile("x = 1\n", '/a.py')
+        self.assertTrue(cache.flush())
+        for name in os.listdir(self.disk_dir):
+            with open(os.path.join(self.disk_dir, name), 'wb') as f:
+                f.write(b'\x00garbage')
+        fresh = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True)
+        self.assertEqual(fresh.compile("x = 1\n", '/a.py')[1], RESULT_MISS)
+        self.assertEqual(fresh.stats()["disk_errors"], 1)
+
+    def test_syntax_error_not_cached(self):
+        """Syntax errors surface exactly like compile() and are not remembered"""
+        cache = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True)
+        with self.assertRaises(SyntaxError):
+            cache.compile("def broken(:\n", '/bad.py')
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(os.listdir(self.disk_dir), [])
+
+    def test_disk_cache_pruned_to_newest(self):
+        """Every edit makes a new file; beyond max_disk_files the oldest are removed"""
+        cache = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True, max_disk_files=10)
+        for i in range(PRUNE_EVERY_WRITES + 1):  # Pruned on the first write and every PRUNE_EVERY_WRITES after
+            cache.compile(f"x = {i}\n", '/edit.py')
+            self.assertTrue(cache.flush())
+        self.assertLessEqual(len(os.listdir(self.disk_dir)), 10)
+        self.assertGreater(cache.stats()["disk_pruned"], 0)
+        # The latest edit is still on disk
+        fresh = CodeCache(max_entries=8, disk_dir=self.disk_dir, use_disk=True)
+        self.assertEqual(fresh.compile(f"x = {PRUNE_EVERY_WRITES}\n", '/edit.py')[1], RESULT_DISK)
+
+    def test_compile_reuse_benchmark(self):
+        """Benchmark: 60 students running the same lecture file"""
+        started = time.perf_counter()
+        for _ in range(60):
+            compile(LECTURE_SOURCE, '/lecture/example.py', 'exec')
+        uncached = time.perf_counter() - started
+
+        cache = CodeCache(max_entries=8, use_disk=False)
+        started = time.perf_counter()
+        for _ in range(60):
+            cache.compile(LECTURE_SOURCE, '/lecture/example.py')
+        cached = time.perf_counter() - started
+
+        sys.__stdout__.write(f"\n[BENCHMARK] 60 runs of a {len(LECTURE_SOURCE)}-byte script: "
+                             f"compile {uncached * 1000:.1f}ms, cached {cached * 1000:.1f}ms\n")
+        self.assertLess(cached, uncached)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test Suite for ExecutionLockManager
+Checks exclusion, eviction on release and the shared timer-wheel health checks
+"""
+
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.execution_lock_manager import ExecutionLockManager
+from helpers import wait_for
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.alive = True
+        self.waiting_for_input = False
+
+    def is_alive(self):
+        return self.alive
+
+
+class TestExecutionLockManager(unittest.TestCase):
+    """Test cases for ExecutionLockManager"""
+
+    def test_one_run_per_user_file(self):
+        """A second run of the same file waits; other files and users are independent"""
+        manager = ExecutionLockManager()
+        self.assertTrue(manager.acquire_execution_lock('alice', '/a/x.py', 'c1'))
+        self.assertFalse(manager.acquire_execution_lock('alice', '/a/./x.py', 'c2', timeout=0.05))
+        self.assertTrue(manager.acquire_execution_lock('alice', '/a/y.py', 'c3'))
+        self.assertTrue(manager.acquire_execution_lock('bob', '/a/x.py', 'c4'))
+        self.assertEqual(manager.get_active_execution('alice', '/a/x.py')[0], 'c1')
+
+        # A waiter is woken by the release rather than timing out
+        threading.Timer(0.05, manager.release_execution_lock, ('alice', '/a/x.py', 'c1')).start()
+        started = time.time()
+        self.assertTrue(manager.acquire_execution_lock('alice', '/a/x.py', 'c5', timeout=2.0))
+        self.assertLess(time.time() - started, 1.0)
+
+        # Releasing with a stale cmd_id does not free someone else's run
+        manager.release_execution_lock('alice', '/a/x.py', 'c1')
+        self.assertTrue(manager.is_execution_active('alice', '/a/x.py'))
+
+        manager.release_all_user_locks('alice')
+        self.assertFalse(manager.is_execution_active('alice', '/a/y.py'))
+        self.assertTrue(manager.is_execution_active('bob', '/a/x.py'))
+
+    def test_table_and_threads_stay_flat(self):
+        """Thousands of runs leave no lock entries and start no threads"""
+        manager = ExecutionLockManager()
+        threads_before = threading.active_count()
+        for i in range(2000):
+            key = f'/course/file_{i}.py'
+            self.assertTrue(
+                manager.acquire_execution_lock(f'user{i % 60}', key, f'cmd-{i}', executor_ref=FakeExecutor())
+            )
+            manager.release_execution_lock(f'user{i % 60}', key, f'cmd-{i}')
+        stats = manager.stats()
+        self.assertEqual((stats["active"], stats["users"]), (0, 0))
+        self.assertEqual(sum(stats["wheel"]), 0)
+        # At most the shared deadline timer thread, started once per process
+        self.assertLessEqual(threading.active_count() - threads_before, 1)
+        self.assertTrue(wait_for(lambda: not manager.stats()["ticking"], timeout=3))
+
+    def test_wheel_releases_dead_and_stale_runs(self):
+        """Dead executors and missing heartbeats are released; waiting for input is not stale"""
+        manager = ExecutionLockManager(check_interval=0.2, wheel_slots=4, max_stale_time=0.3)
+        dead, waiting, silent, healthy = FakeExecutor(), FakeExecutor(), FakeExecutor(), FakeExecutor()
+        waiting.waiting_for_input = True
+        for name, executor in (('dead', dead), ('waiting', waiting), ('silent', silent), ('healthy', healthy)):
+            self.assertTrue(manager.acquire_execution_lock(name, '/f.py', f'cmd-{name}', executor_ref=executor))
+
+        dead.alive = False
+        self.assertTrue(wait_for(lambda: not manager.is_execution_active('dead', '/f.py'), timeout=3))
+
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(0.05):
+                manager.update_heartbeat('healthy', '/f.py')
+
+        beater = threading.Thread(target=heartbeat)
+        beater.start()
+        self.addCleanup(beater.join)
+        self.addCleanup(stop.set)
+
+        self.assertTrue(wait_for(lambda: not manager.is_execution_active('silent', '/f.py'), timeout=3))
+        time.sleep(0.5)
+        self.assertTrue(manager.is_execution_active('waiting', '/f.py'))
+        self.assertTrue(manager.is_execution_active('healthy', '/f.py'))
+
+
+if __name__ == '__main__':
+    unittest.main()
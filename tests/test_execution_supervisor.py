@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the ExecutionSupervisor
+Checks that runs get no helper threads, the 3-second script limit, repeated
+interrupts for scripts that swallow them, REPL idle expiry and the snapshot
+"""
+
+import unittest
+import threading
+import time
+import sys
+import os
+from unittest.mock import Mock, patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.deadline_timer import get_deadline_timer
+from command.exec_protocol import MessageType
+from command.execution_supervisor import ExecutionSupervisor
+from helpers import CapturingExecutor, wait_for, write_script
+
+
+class TestExecutionSupervisor(unittest.TestCase):
+    """Runs through SimpleExecutorV3 with a private supervisor"""
+
+    def setUp(self):
+        self.supervisor = ExecutionSupervisor()
+        patcher = patch('command.simple_exec_v3.execution_supervisor', self.supervisor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # In-process runs chdir to the script's directory
+        self.addCleanup(os.chdir, os.getcwd())
+
+        self.loop = Mock()
+        self.loop.call_soon_threadsafe = Mock(side_effect=lambda callback, *args: callback(*args))
+
+    def _start(self, source, repl_timeout=None):
+        path = write_script(self, source)
+        executor = CapturingExecutor(cmd_id='sup-run', client=Mock(), event_loop=self.loop,
+                                     script_path=path, username='test_user')
+        if repl_timeout is not None:
+            executor.repl_timeout = repl_timeout
+        executor.start()
+        self.addCleanup(executor.join, 5)
+        self.addCleanup(executor.stop)
+        return executor
+
+    def test_one_thread_per_run(self):
+        get_deadline_timer()  # The shared timer thread exists once per process
+        before = threading.active_count()
+        executor = self._start('import time\ntime.sleep(0.5)\nprint("done")\n')
+        time.sleep(0.2)
+        self.assertEqual(threading.active_count(), before + 1)
+        self.assertTrue(wait_for(lambda: MessageType.REPL_READY in executor.types()))
+        self.assertIn("done", executor.stdout())
+
+    def test_script_time_limit(self):
+        executor = self._start('while True:\n    pass\n')
+        time.sleep(0.5)
+        row, = self.supervisor.snapshot()
+        self.assertEqual((row["cmd_id"], row["state"], row["backend"]),
+                         ("sup-run", "script_running", "CapturingExecutor"))
+        self.assertLess(row["script_deadline_in"], 3)
+
+        started = time.time()
+        executor.join(10)
+        self.assertFalse(executor.is_alive())
+        self.assertLess(time.time() - started, 4)
+        errors = [data for msg_type, data in executor.outbound.messages if msg_type == MessageType.ERROR]
+        self.assertEqual(errors[0]["error"], "Script timeout (3 seconds)")
+        self.assertEqual(executor.telemetry["termination_reason"], "timeout")
+        self.assertEqual(self.supervisor.stats()["timeouts"], 1)
+        self.assertEqual(self.supervisor.snapshot(), [])
+
+    def test_clean_run_never_clears_async_exception(self):
+        # On 3.11 a NULL PyThreadState_SetAsyncExc makes a later sys.settrace spin forever
+        with patch('command.simple_exec_v3._raise_in_thread') as raise_in_thread:
+            executor = self._start('print("done")\n')
+            self.assertTrue(wait_for(lambda: MessageType.REPL_READY in executor.types()))
+        raise_in_thread.assert_not_called()
+
+    def test_swallowed_interrupts_are_retried(self):
+        executor = self._start(
+            'caught = 0\n'
+            'while caught < 3:\n'
+            '    try:\n'
+            '        while True:\n'
+            '            pass\n'
+            '    except BaseException:\n'
+            '        caught += 1\n'
+        )
+        executor.join(10)
+        self.assertFalse(executor.is_alive())
+        self.assertNotIn(MessageType.REPL_READY, executor.types())
+        self.assertEqual(executor.namespace.get("caught"), 3)
+
+    def test_input_wait_is_not_timed_out(self):
+        executor = self._start('name = input("Name: ")\nprint("hi", name)\n')
+        self.assertTrue(wait_for(lambda: executor.waiting_for_input))
+        time.sleep(3.3)
+        self.assertTrue(executor.alive)
+        executor.send_input("ada")
+        self.assertTrue(wait_for(lambda: "hi ada" in executor.stdout()))
+
+    def test_repl_idle_expiry(self):
+        executor = self._start('x = 1\n', repl_timeout=0.5)
+        self.assertTrue(wait_for(lambda: MessageType.REPL_READY in executor.types()))
+        row, = self.supervisor.snapshot()
+        self.assertEqual(row["state"], "repl_active")
+        self.assertIsNone(row["script_deadline_in"])
+        self.assertLessEqual(row["repl_idle_in"], 0.5)
+
+        executor.join(5)
+        self.assertFalse(executor.is_alive())
+        self.assertIn("REPL session timed out", executor.stdout())
+        self.assertEqual(self.supervisor.stats()["repl_expired"], 1)
+        self.assertEqual(self.supervisor.stats()["live"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test Suite for execution telemetry
+Checks the per-run counters, the batched background writer and the records
+SimpleExecutorV3 produces for each way a script can end
+"""
+
+import unittest
+import threading
+import time
+import sys
+import os
+from unittest.mock import Mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.execution_telemetry import RunStats, TelemetryWriter, COLUMNS
+from command.exec_protocol import MessageType
+from command.simple_exec_v3 import SimpleExecutorV3
+
+
+class TestRunStats(unittest.TestCase):
+    """Counters kept while a script runs"""
+
+    def test_output_counters_and_previews(self):
+        stats = RunStats()
+        stats.add_message(MessageType.STDOUT, "ignored before start\n")
+        stats.start()
+        stats.add_message(MessageType.STDOUT, "héllo\nwor")
+        stats.add_message(MessageType.STDOUT, "ld\n")
+        stats.add_message(MessageType.STDERR, "warning\nno newline")
+        stats.add_message(MessageType.ERROR, {"error": "boom", "traceback": "Traceback..."})
+        record = stats.finish("alice", "/p/a.py", 1, "error", peak_rss_kb=1234)
+
+        self.assertEqual(record["output_bytes"], len("héllo\nworld\nwarning\nno newline".encode("utf-8")))
+        self.assertEqual(record["output_lines"], 4)
+        self.assertEqual(record["stdout_preview"], "héllo\nworld\n")
+        self.assertEqual(record["stderr_preview"], "warning\nno newline")
+        self.assertEqual((record["exit_code"], record["termination_reason"], record["peak_rss_kb"]), (1, "error", 1234))
+        self.assertIsNotNone(record["cpu_time_ms"])
+        self.assertEqual(set(record), set(COLUMNS))
+
+        # finish() is one-shot, later output is not counted
+        self.assertIsNone(stats.finish("alice", "/p/a.py", 0, "normal"))
+
+    def test_error_preview_when_no_stderr(self):
+        stats = RunStats(cpu_clock=None)
+        stats.start()
+        stats.add_message(MessageType.ERROR, {"error": "boom", "traceback": "Traceback: boom"})
+        record = stats.finish("alice", "/p/a.py", 1, "error")
+        self.assertEqual(record["stderr_preview"], "Traceback: boom")
+        self.assertIsNone(record["cpu_time_ms"])
+
+
+class TestTelemetryWriter(unittest.TestCase):
+    """Rows are written in batches on the writer thread"""
+
+    def record(self, i):
+        return {"username": f"user{i}", "file_path": f"/p/{i}.py", "started_at": time.time(),
+                "duration_ms": i, "exit_code": 0, "termination_reason": "normal"}
+
+    def test_batches_and_flush(self):
+        batches = []
+        writer = TelemetryWriter(write_batch=batches.append, batch_size=200, flush_interval=60, enabled=True)
+        for i in range(450):
+            writer.submit(self.record(i))
+        self.assertTrue(writer.flush(5))
+        self.assertEqual([len(b) for b in batches], [200, 200, 50])
+        # Rows are tuples in column order
+        self.assertEqual(batches[0][0][COLUMNS.index("username")], "user0")
+        self.assertEqual(writer.stats()["written"], 450)
+
+    def test_slow_database_never_blocks_submit(self):
+        release = threading.Event()
+        writer = TelemetryWriter(write_batch=lambda rows: release.wait(5), batch_size=50,
+                                 flush_interval=0.01, enabled=True)
+        start = time.perf_counter()
+        for i in range(2000):
+            writer.submit(self.record(i))
+        elapsed = time.perf_counter() - start
+        release.set()
+        sys.__stdout__.write(f"\n[BENCHMARK] 2000 submits against a stalled database: {elapsed * 1000:.1f}ms\n")
+        self.assertLess(elapsed, 0.5)
+        self.assertTrue(writer.flush(5))
+
+    def test_failures_and_overflow_are_counted(self):
+        def fail(rows):
+            raise RuntimeError("database unavailable")
+
+        writer = TelemetryWriter(write_batch=fail, batch_size=10, flush_interval=60, max_pending=5, enabled=True)
+        with writer._cond:
+            # Hold the writer off so the queue overflows
+            for i in range(8):
+                writer.submit(self.record(i))
+        self.assertTrue(writer.flush(5))
+        stats = writer.stats()
+        self.assertEqual((stats["dropped"], stats["failed"], stats["written"]), (3, 5, 0))
+
+    def test_disabled(self):
+        writer = TelemetryWriter(write_batch=Mock(), enabled=False)
+        writer.submit(self.record(0))
+        self.assertEqual(writer.stats()["submitted"], 0)
+        self.assertFalse(writer.is_alive())
+
+
+class RecordingExecutor(SimpleExecutorV3):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.records = []
+
+    def _report_telemetry(self, record):
+        self.records.append(record)
+
+
+class TestExecutorTelemetry(unittest.TestCase):
+    """Each way a script ends produces one record with the right reason"""
+
+    def setUp(self):
+        self.mock_client = Mock()
+        self.mock_client.write_message = Mock()
+        self.mock_loop = Mock()
+        self.mock_loop.call_soon_threadsafe = Mock(side_effect=lambda callback, *args: callback(*args))
+
+    def run_script(self, source, stop_after=None):
+        path = '/tmp/test_execution_telemetry.py'
+        with open(path, 'w') as f:
+            f.write(source)
+        executor = RecordingExecutor(
+            cmd_id='test-telemetry', client=self.mock_client, event_loop=self.mock_loop,
+            script_path=path, username='test_user'
+        )
+        executor.start()
+        if stop_after is not None:
+            time.sleep(stop_after)
+            executor.stop()
+        else:
+            # The script ends in the REPL - give it time, then close the session
+            deadline = time.time() + 10
+            while not executor.records and time.time() < deadline:
+                time.sleep(0.01)
+            executor.stop()
+        executor.join(10)
+        self.assertEqual(len(executor.records), 1)
+        return executor.records[0]
+
+    def test_normal(self):
+        record = self.run_script('total = sum(i * i for i in range(200000))\nprint("done", total)\n')
+        self.assertEqual((record["termination_reason"], record["exit_code"]), ("normal", 0))
+        self.assertEqual(record["output_lines"], 1)
+        self.assertTrue(record["stdout_preview"].startswith("done"))
+        self.assertGreater(record["cpu_time_ms"] + 1, 0)
+        self.assertEqual(record["username"], 'test_user')
+
+    def test_error(self):
+        record = self.run_script('print("before")\n1 / 0\n')
+        self.assertEqual((record["termination_reason"], record["exit_code"]), ("error", 1))
+        self.assertIn("ZeroDivisionError", record["stderr_preview"])
+
+    def test_timeout(self):
+        record = self.run_script('while True:\n    pass\n')
+        self.assertEqual(record["termination_reason"], "timeout")
+        self.assertGreaterEqual(record["duration_ms"], 2900)
+        # A busy loop burns CPU for nearly all of its wall time
+        self.assertGreater(record["cpu_time_ms"], 1000)
+
+    def test_loop(self):
+        record = self.run_script('while True:\n    print("same line")\n')
+        self.assertEqual(record["termination_reason"], "loop")
+        self.assertGreater(record["output_lines"], 100)
+
+    def test_stop(self):
+        record = self.run_script('import time\nwhile True:\n    time.sleep(0.01)\n', stop_after=0.5)
+        self.assertEqual(record["termination_reason"], "stop")
+
+
+if __name__ == '__main__':
+    unittest.main()
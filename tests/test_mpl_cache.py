@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the shared matplotlib cache
+Checks that runs share one MPLCONFIGDIR instead of a temp directory each, the
+overlay used when the shared directory is not writable, and the startup build
+"""
+
+import unittest
+import importlib.util
+import tempfile
+import shutil
+import time
+import glob
+import sys
+import os
+from unittest.mock import Mock, patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.mpl_cache import MplCache
+from command.simple_exec_v3 import SimpleExecutorV3
+
+HAS_MATPLOTLIB = importlib.util.find_spec("matplotlib") is not None
+
+
+class TestMplCache(unittest.TestCase):
+    """Test cases for MplCache"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='test_mpl_cache_')
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.shared = os.path.join(self.root, 'matplotlib')
+
+    def test_shared_dir_used_when_writable(self):
+        cache = MplCache(self.shared)
+        self.assertEqual(cache.config_dir(), self.shared)
+        self.assertTrue(os.path.isdir(self.shared))
+        self.assertFalse(cache.overlay)
+
+        with patch.dict(os.environ):
+            cache.activate()
+            self.assertEqual(os.environ['MPLCONFIGDIR'], self.shared)
+            self.assertEqual(os.environ['MPLBACKEND'], 'Agg')
+
+    def test_overlay_when_not_writable(self):
+        os.makedirs(self.shared)
+        with open(os.path.join(self.shared, 'fontlist-v330.json'), 'w') as f:
+            f.write('{}')
+
+        cache = MplCache(self.shared)
+        with patch('command.mpl_cache.os.access', return_value=False):
+            overlay = cache.config_dir()
+        self.addCleanup(shutil.rmtree, overlay, True)
+
+        self.assertNotEqual(overlay, self.shared)
+        self.assertTrue(cache.overlay)
+        linked = os.path.join(overlay, 'fontlist-v330.json')
+        self.assertEqual(os.path.realpath(linked), os.path.realpath(os.path.join(self.shared, 'fontlist-v330.json')))
+        # One overlay per process, not per run
+        self.assertEqual(cache.config_dir(), overlay)
+
+    def test_runs_share_one_directory(self):
+        """Executors no longer create (and delete) a mpl_cache_* directory per run"""
+        cache = MplCache(self.shared)
+        pattern = os.path.join(tempfile.gettempdir(), 'mpl_cache_*')
+        before = set(glob.glob(pattern))
+
+        client = Mock()
+        loop = Mock()
+        loop.call_soon_threadsafe = Mock(side_effect=lambda callback, *args: callback(*args))
+        path = os.path.join(self.root, 'script.py')
+        with open(path, 'w') as f:
+            f.write('print("hi")\n')
+
+        with patch('command.simple_exec_v3.mpl_cache', cache), patch.dict(os.environ):
+            for i in range(2):
+                executor = SimpleExecutorV3(cmd_id=f'mpl-{i}', client=client, event_loop=loop,
+                                            script_path=path, username='test_user')
+                executor.start()
+                time.sleep(0.3)
+                executor.stop()
+                executor.join(5)
+                self.assertEqual(os.environ['MPLCONFIGDIR'], self.shared)
+
+        self.assertEqual(set(glob.glob(pattern)), before)
+
+    @unittest.skipIf(HAS_MATPLOTLIB, "matplotlib is installed")
+    def test_build_without_matplotlib(self):
+        cache = MplCache(self.shared)
+        self.assertFalse(cache.build())
+        self.assertFalse(cache.stats()['ready'])
+
+    @unittest.skipUnless(HAS_MATPLOTLIB, "matplotlib is not installed")
+    def test_build_once_then_reuse(self):
+        cache = MplCache(self.shared)
+        self.assertTrue(cache.build())
+        self.assertTrue(glob.glob(os.path.join(self.shared, 'fontlist-*.json')))
+        cold = cache.build_seconds
+
+        # A later build (server restart) only loads the existing font list
+        self.assertTrue(cache.build())
+        sys.__stdout__.write(f"\n[BENCHMARK] matplotlib font cache: cold build {cold:.2f}s, "
+                             f"warm start {cache.build_seconds:.2f}s\n")
+        self.assertLessEqual(cache.build_seconds, cold + 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
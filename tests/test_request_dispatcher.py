@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the RequestDispatcher
+Checks that a slow command does not hold up other clients, that each client's
+commands keep their order, the overall and per-command limits, and the metrics
+"""
+
+import unittest
+import asyncio
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.request_dispatcher import RequestDispatcher, parse_command_limits
+
+
+class Recorder:
+    """Coroutine commands that log when they finish and track concurrency"""
+
+    def __init__(self):
+        self.finished = []
+        self.running = {}
+        self.peak = {}
+
+    async def command(self, cmd, name, seconds):
+        self.running[cmd] = self.running.get(cmd, 0) + 1
+        self.peak[cmd] = max(self.peak.get(cmd, 0), self.running[cmd])
+        await asyncio.sleep(seconds)
+        self.running[cmd] -= 1
+        self.finished.append(name)
+
+
+class TestRequestDispatcher(unittest.TestCase):
+    """Test cases for RequestDispatcher"""
+
+    def _run(self, dispatcher, submissions):
+        recorder = Recorder()
+
+        async def main():
+            for client, cmd, name, seconds in submissions:
+                dispatcher.submit(client, cmd, recorder.command, cmd, name, seconds)
+            await dispatcher.join(10)
+
+        asyncio.run(main())
+        return recorder
+
+    def test_slow_command_does_not_block_other_clients(self):
+        dispatcher = RequestDispatcher(max_concurrency=8, command_limits={})
+        recorder = self._run(dispatcher, [
+            ("alice", "ide_move_folder", "alice-move", 0.3),
+            ("bob", "ide_get_file", "bob-get", 0.01),
+            ("carol", "run_python_program", "carol-run", 0.01),
+        ])
+        self.assertEqual(recorder.finished[-1], "alice-move")
+        stats = dispatcher.stats()["commands"]
+        self.assertLess(stats["ide_get_file"]["max_wait_ms"], 100)
+        self.assertGreaterEqual(stats["ide_move_folder"]["max_service_ms"], 300)
+
+    def test_fifo_per_client(self):
+        dispatcher = RequestDispatcher(max_concurrency=8, command_limits={})
+        recorder = self._run(dispatcher, [
+            ("alice", "ide_write_file", "save", 0.1),
+            ("alice", "run_python_program", "run", 0.0),
+            ("alice", "send_program_input", "input", 0.05),
+            ("alice", "stop_python_program", "stop", 0.0),
+        ])
+        self.assertEqual(recorder.finished, ["save", "run", "input", "stop"])
+        self.assertEqual(recorder.peak, {"ide_write_file": 1, "run_python_program": 1,
+                                         "send_program_input": 1, "stop_python_program": 1})
+
+    def test_overall_limit(self):
+        dispatcher = RequestDispatcher(max_concurrency=3, command_limits={})
+        recorder = self._run(dispatcher, [(f"client{i}", "ide_get_file", i, 0.02) for i in range(12)])
+        self.assertEqual(recorder.peak["ide_get_file"], 3)
+        self.assertEqual(len(recorder.finished), 12)
+
+    def test_per_command_cap(self):
+        dispatcher = RequestDispatcher(max_concurrency=16, command_limits={"autocomplete_python": 2})
+        submissions = [(f"client{i}", "autocomplete_python", f"complete{i}", 0.02) for i in range(8)]
+        submissions += [(f"client{i}", "ide_get_file", f"get{i}", 0.02) for i in range(8, 12)]
+        recorder = self._run(dispatcher, submissions)
+        self.assertEqual(recorder.peak["autocomplete_python"], 2)
+        # Requests waiting for an autocomplete slot do not hold up other commands
+        self.assertEqual(recorder.peak["ide_get_file"], 4)
+
+        stats = dispatcher.stats()
+        self.assertEqual((stats["running"], stats["queued"], stats["clients"]), (0, 0, 0))
+        autocomplete = stats["commands"]["autocomplete_python"]
+        self.assertEqual((autocomplete["completed"], autocomplete["queued"]), (8, 0))
+        self.assertGreater(autocomplete["max_wait_ms"], 50)
+
+    def test_failures_are_counted_and_queue_continues(self):
+        dispatcher = RequestDispatcher(max_concurrency=4, command_limits={})
+        done = []
+
+        async def fail():
+            raise KeyError("projectName")
+
+        async def ok():
+            done.append(True)
+
+        async def main():
+            dispatcher.submit("alice", "ide_move_file", fail)
+            dispatcher.submit("alice", None, ok)
+            await dispatcher.join(5)
+
+        asyncio.run(main())
+        self.assertEqual(done, [True])
+        commands = dispatcher.stats()["commands"]
+        self.assertEqual(commands["ide_move_file"]["failed"], 1)
+        self.assertEqual(commands["unknown"]["completed"], 1)
+
+    def test_parse_command_limits(self):
+        self.assertEqual(parse_command_limits("autocomplete_python:4, ide_move_folder:2,bad,x:y"),
+                         {"autocomplete_python": 4, "ide_move_folder": 2})
+        self.assertEqual(parse_command_limits(""), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
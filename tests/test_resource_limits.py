@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test Suite for per-run resource limits in pool workers
+Runs scripts that exceed the memory, CPU, open file and file size limits and
+checks that each is stopped with a clear error instead of taking the worker
+(or the server) down with it
+"""
+
+import unittest
+import time
+import tempfile
+import shutil
+import sys
+import os
+from unittest.mock import patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.worker_pool import WorkerPool, PooledExecutor
+from helpers import RecordingClient, InlineLoop
+
+# Read by the template process when the pool starts
+LIMITS = {'MEMORY_LIMIT_MB': '64', 'CPU_TIME_LIMIT': '1', 'MAX_OPEN_FILES': '32', 'MAX_FILE_SIZE_MB': '1'}
+
+
+class TestResourceLimits(unittest.TestCase):
+    """Scripts exceeding a limit get an error frame and a REPL, the worker survives"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The template may be (re)spawned after start(), so keep the limits in place throughout
+        cls.workspace = tempfile.mkdtemp(prefix='test_rlimits_')
+        cls.env = patch.dict(os.environ, dict(LIMITS, IDE_DATA_PATH=cls.workspace))
+        cls.env.start()
+        cls.pool = WorkerPool(size=1, preload=['decimal'])
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        cls.env.stop()
+        shutil.rmtree(cls.workspace, True)
+
+    def setUp(self):
+        # Scripts may only write under the student's own folder
+        self.workdir = os.path.join(self.workspace, 'ide', 'Local', 'test_user')
+        os.makedirs(self.workdir, exist_ok=True)
+
+    def _run(self, source, cmd_id):
+        path = os.path.join(self.workdir, 'script.py')
+        with open(path, 'w') as f:
+            f.write(source)
+        client = RecordingClient()
+        executor = PooledExecutor(cmd_id, client, InlineLoop(), script_path=path, username='test_user', pool=self.pool)
+        executor.start()
+        deadline = time.time() + 15
+        while time.time() < deadline and 'repl_ready' not in client.types() and executor.is_alive():
+            time.sleep(0.02)
+        executor.stop()
+        executor.join(5)
+        return client
+
+    def test_memory_limit(self):
+        client = self._run('data = bytearray(200 * 1024 * 1024)\nprint("allocated")\n', 'rl-mem')
+        self.assertNotIn('allocated', client.stdout())
+        self.assertTrue(any('Memory limit exceeded (64 MB' in error for error in client.errors()), client.errors())
+
+    def test_cpu_limit(self):
+        started = time.time()
+        client = self._run('print("spinning")\nwhile True:\n    pass\n', 'rl-cpu')
+        self.assertIn('spinning', client.stdout())
+        self.assertTrue(any('CPU time limit exceeded (1s' in error for error in client.errors()), client.errors())
+        self.assertLess(time.time() - started, 10)
+
+    def test_open_files_limit(self):
+        client = self._run('files = [open(__file__) for _ in range(100)]\nprint("opened")\n', 'rl-files')
+        self.assertNotIn('opened', client.stdout())
+        self.assertTrue(any('Too many open files (limit 32)' in error for error in client.errors()), client.errors())
+
+    def test_file_size_limit(self):
+        client = self._run('with open("big.txt", "w") as f:\n    f.write("x" * (4 * 1024 * 1024))\nprint("written")\n',
+                           'rl-fsize')
+        self.assertNotIn('written', client.stdout())
+        self.assertTrue(any('File size limit exceeded (1 MB)' in error for error in client.errors()), client.errors())
+
+    def test_normal_script_unaffected(self):
+        client = self._run('data = [i * i for i in range(100000)]\nprint(sum(data))\n', 'rl-ok')
+        self.assertIn(str(sum(i * i for i in range(100000))), client.stdout())
+        self.assertEqual(client.errors(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
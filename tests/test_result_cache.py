@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the shared-script ResultCache
+Checks which scripts are cached, replay of stored output, invalidation when
+source or data files change, the bypass rules and that a lab running the same
+example concurrently executes it once
+"""
+
+import unittest
+import tempfile
+import shutil
+import time
+import sys
+import os
+from unittest.mock import Mock, patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.result_cache import ResultCache, nondeterminism_marker, RESULT_HIT, RESULT_MISS, RESULT_BYPASS
+from command.exec_protocol import MessageType
+from command.execution_supervisor import execution_supervisor
+from helpers import CapturingExecutor
+
+DEMO_SOURCE = (
+    'with open("data.csv") as f:\n'
+    '    rows = [line.strip().split(",") for line in f]\n'
+    'total = sum(int(value) for _, value in rows)\n'
+    'for name, value in rows:\n'
+    '    print(f"{name}: {value}")\n'
+    'print("total", total)\n'
+)
+
+
+class TestNondeterminismMarker(unittest.TestCase):
+    """Source-level reasons a script cannot be cached"""
+
+    def test_markers(self):
+        self.assertIsNone(nondeterminism_marker(DEMO_SOURCE))
+        self.assertEqual(nondeterminism_marker("import random\nprint(random.random())\n"), "uses random")
+        self.assertEqual(nondeterminism_marker("from datetime import date\n"), "uses datetime")
+        self.assertEqual(nondeterminism_marker("import numpy as np\nnp.random.rand(3)\n"), "uses random")
+        self.assertEqual(nondeterminism_marker("name = input()\n"), "uses input")
+        self.assertEqual(nondeterminism_marker("print(id([]))\n"), "uses id")
+        self.assertEqual(nondeterminism_marker("print(1)  # no-cache\n"), "no-cache marker")
+
+
+class TestResultCache(unittest.TestCase):
+    """Runs through SimpleExecutorV3 with a cache over a temporary workspace"""
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix='result_cache_ws_')
+        self.addCleanup(shutil.rmtree, self.workspace, True)
+        # Concurrent in-process runs chdir the whole process - do not leave it inside the workspace
+        self.addCleanup(os.chdir, os.getcwd())
+        env = patch.dict(os.environ, {'IDE_DATA_PATH': self.workspace})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.cache = ResultCache(enabled=True, max_entries=16, disk_dir=os.path.join(self.workspace, '.result_cache'))
+        cache_patch = patch('command.simple_exec_v3.result_cache', self.cache)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+        self.lecture_dir = os.path.join(self.workspace, 'ide', 'Lecture Notes', 'Week1')
+        os.makedirs(self.lecture_dir)
+        self.data_path = os.path.join(self.lecture_dir, 'data.csv')
+        with open(self.data_path, 'w') as f:
+            f.write("apples,3\npears,4\n")
+
+        self.loop = Mock()
+        self.loop.call_soon_threadsafe = Mock(side_effect=lambda callback, *args: callback(*args))
+
+    def script(self, source, name='demo.py', folder=None):
+        path = os.path.join(folder or self.lecture_dir, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def start(self, path, cmd_id='run', username='student1'):
+        executor = CapturingExecutor(cmd_id=cmd_id, client=Mock(), event_loop=self.loop,
+                                     script_path=path, username=username)
+        executor.start()
+        return executor
+
+    def wait_repl(self, executor, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if any(t == MessageType.REPL_READY for t, _ in executor.outbound.messages) or not executor.is_alive():
+                return
+            time.sleep(0.01)
+        self.fail("script did not finish")
+
+    def run_script(self, path):
+        executor = self.start(path)
+        self.wait_repl(executor)
+        executor.stop()
+        executor.join(5)
+        return executor
+
+    def test_eligibility(self):
+        self.assertTrue(self.cache.eligible(os.path.join(self.lecture_dir, 'demo.py')))
+        local_dir = os.path.join(self.workspace, 'ide', 'Local', 'student1')
+        self.assertFalse(self.cache.eligible(os.path.join(local_dir, 'demo.py')))
+        self.assertFalse(self.cache.eligible('/elsewhere/demo.py'))
+        self.assertFalse(ResultCache(enabled=False).eligible(os.path.join(self.lecture_dir, 'demo.py')))
+
+    def test_replay_and_invalidation(self):
+        path = self.script(DEMO_SOURCE)
+        first = self.run_script(path)
+        self.assertEqual(first.result_cache_result, RESULT_MISS)
+        self.assertEqual(first.stdout(), "apples: 3\npears: 4\ntotal 7\n")
+
+        second = self.run_script(path)
+        self.assertEqual(second.result_cache_result, RESULT_HIT)
+        self.assertEqual(second.stdout(), first.stdout())
+        self.assertEqual(second.telemetry["termination_reason"], "cached")
+
+        # A changed data file the script read is a miss
+        with open(self.data_path, 'w') as f:
+            f.write("apples,3\npears,5\n")
+        third = self.run_script(path)
+        self.assertEqual(third.result_cache_result, RESULT_MISS)
+        self.assertIn("total 8", third.stdout())
+
+        # So is an edited script
+        fourth = self.run_script(self.script(DEMO_SOURCE + 'print("extra")\n'))
+        self.assertEqual(fourth.result_cache_result, RESULT_MISS)
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["stored"]), (1, 3, 3))
+
+    def test_disk_entries_shared_between_processes(self):
+        path = self.script(DEMO_SOURCE)
+        self.run_script(path)
+        # A fresh cache over the same directory stands in for another pool worker
+        other = ResultCache(enabled=True, disk_dir=self.cache.disk_dir)
+        entry, recorder, result = other.prepare(DEMO_SOURCE, path)
+        self.assertEqual((recorder, result), (None, RESULT_HIT))
+        self.assertEqual(other.stats()["hits"], 1)
+        frames = [(msg_type, data) for _, msg_type, data in other.replay_schedule(entry)]
+        self.assertIn((MessageType.STDOUT, "apples: 3\npears: 4\ntotal 7\n"), frames)
+
+    def test_bypass_rules(self):
+        # Source markers: never recorded at all
+        marked = self.script('name = input("Name: ")\nprint(name)\n', name='marked.py')
+        self.assertEqual(self.cache.prepare(open(marked).read(), marked), (None, None, RESULT_BYPASS))
+
+        # Runtime: writing a file - recorded once, remembered as uncacheable
+        os.makedirs(os.path.join(self.workspace, 'ide', 'Local', 'student1'))
+        writer = self.script('with open("../../Local/student1/out.txt", "w") as f:\n    f.write("x")\nprint("done")\n',
+                             name='writer.py')
+        for expected in (RESULT_MISS, RESULT_BYPASS):
+            executor = self.run_script(writer)
+            self.assertEqual(executor.result_cache_result, expected)
+            self.assertIn("done", executor.stdout())
+
+        # Runtime: memory addresses in the output
+        reprs = self.script('class A:\n    pass\nprint(A())\n', name='reprs.py')
+        self.run_script(reprs)
+        self.assertEqual(self.run_script(reprs).result_cache_result, RESULT_BYPASS)
+
+        # Errors are not cached either
+        failing = self.script('print("before")\n1 / 0\n', name='failing.py')
+        self.run_script(failing)
+        executor = self.run_script(failing)
+        self.assertEqual(executor.result_cache_result, RESULT_BYPASS)
+        self.assertTrue(any(t == MessageType.ERROR for t, _ in executor.outbound.messages))
+
+    def test_repl_sees_variables_after_replay(self):
+        path = self.script(DEMO_SOURCE)
+        self.run_script(path)
+
+        executor = self.start(path)
+        self.wait_repl(executor)
+        self.assertEqual(executor.result_cache_result, RESULT_HIT)
+        executor.send_input("print(total * 2)")
+        deadline = time.time() + 5
+        while "14" not in executor.stdout() and time.time() < deadline:
+            time.sleep(0.01)
+        executor.stop()
+        executor.join(5)
+        self.assertIn("14\n", executor.stdout())
+        # The silent re-run printed nothing a second time
+        self.assertEqual(executor.stdout().count("total 7"), 1)
+
+    def test_busy_claim_runs_uncached(self):
+        """A run that finds the script being recorded elsewhere executes right away instead of waiting"""
+        path = self.script(DEMO_SOURCE)
+        entry, recorder, result = self.cache.prepare(DEMO_SOURCE, path)
+        self.assertIsNotNone(recorder)
+        # A fresh cache over the same directory stands in for another pool worker
+        other = ResultCache(enabled=True, disk_dir=self.cache.disk_dir)
+        started = time.monotonic()
+        self.assertEqual(other.prepare(DEMO_SOURCE, path), (None, None, RESULT_MISS))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(other.stats()["busy"], 1)
+        self.cache.finish(recorder, 1)
+
+    def test_repl_rerun_under_time_limit(self):
+        """The silent re-run behind the REPL is killed at the script limit like any run"""
+        path = self.script('total = sum(i * i for i in range(5000000))\nprint("total", total)\n')
+        self.run_script(path)
+
+        with patch.object(execution_supervisor, 'script_time_limit', 0.1):
+            executor = self.start(path)
+            self.wait_repl(executor)
+            self.assertEqual(executor.result_cache_result, RESULT_HIT)
+            executor.send_input("print(total)")
+            executor.join(5)
+        self.assertFalse(executor.is_alive())
+        self.assertTrue(executor.timeout_occurred)
+        self.assertTrue(any(t == MessageType.ERROR for t, _ in executor.outbound.messages))
+
+    def test_lab_runs_example_once(self):
+        """A lab opens an example the lecturer already ran: it is replayed for everyone"""
+        path = self.script('total = sum(i * i for i in range(1500000))\nprint("total", total)\n')
+        first = self.run_script(path)
+        # One REPL per student - each user only keeps MAX_PROCESSES_PER_USER of them open
+        executors = [self.start(path, cmd_id=f'run-{i}', username=f'student{i}') for i in range(60)]
+        for executor in executors:
+            self.wait_repl(executor, timeout=30)
+        for executor in executors:
+            executor.stop()
+            executor.join(5)
+
+        expected = f"total {sum(i * i for i in range(1500000))}\n"
+        self.assertEqual(first.stdout(), expected)
+        self.assertTrue(all(executor.stdout() == expected for executor in executors))
+        results = [executor.result_cache_result for executor in executors]
+        cpu_ms = sum(executor.telemetry["cpu_time_ms"] or 0 for executor in executors)
+        sys.__stdout__.write(f"\n[BENCHMARK] 60 runs of an example already run once: {results.count(RESULT_HIT)} "
+                             f"replayed, {cpu_ms}ms script CPU in total\n")
+        self.assertEqual(results.count(RESULT_HIT), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
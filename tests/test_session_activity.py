@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the SessionActivityTracker
+Checks that activity is coalesced per session and written in one batch,
+that failed writes are retried, and that ended sessions are never written
+"""
+
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from auth.session_activity import SessionActivityTracker
+
+
+class RecordingWriter:
+    """Stands in for the batched UPDATE"""
+
+    def __init__(self, fail=0):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, rows):
+        with self.lock:
+            if self.fail:
+                self.fail -= 1
+                raise ConnectionError("database unavailable")
+            self.batches.append(rows)
+
+
+class TestSessionActivityTracker(unittest.TestCase):
+    """Test cases for SessionActivityTracker"""
+
+    def test_touches_coalesced_into_one_batch(self):
+        writer = RecordingWriter()
+        tracker = SessionActivityTracker(write_batch=writer, flush_interval=60)
+        base = int(time.time()) - 1000
+        for i in range(1000):
+            tracker.touch(f"token-{i % 50}", now=base + i)
+
+        self.assertEqual(writer.batches, [])  # Nothing written on the message path
+        self.assertTrue(tracker.flush(5))
+        self.assertEqual(len(writer.batches), 1)
+        rows = dict(writer.batches[0])
+        self.assertEqual(len(rows), 50)
+        # The latest activity per session wins
+        self.assertEqual(rows["token-49"].timestamp(), base + 999)
+        self.assertEqual(tracker.last_activity("token-0"), base + 950)
+
+        stats = tracker.stats()
+        self.assertEqual((stats["touches"], stats["written"], stats["batches"], stats["dirty"]), (1000, 50, 1, 0))
+
+    def test_periodic_flush(self):
+        writer = RecordingWriter()
+        tracker = SessionActivityTracker(write_batch=writer, flush_interval=0.1)
+        tracker.touch("token-a")
+        deadline = time.time() + 5
+        while not writer.batches and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual([token for token, _ in writer.batches[0]], ["token-a"])
+
+    def test_failed_write_retried(self):
+        writer = RecordingWriter(fail=1)
+        tracker = SessionActivityTracker(write_batch=writer, flush_interval=0.05)
+        tracker.touch("token-a")
+        self.assertTrue(tracker.flush(5))
+        self.assertEqual(len(writer.batches), 1)
+        self.assertEqual(tracker.stats()["failed"], 1)
+
+    def test_old_activity_forgotten(self):
+        tracker = SessionActivityTracker(write_batch=RecordingWriter(), flush_interval=60)
+        tracker.touch("token-old", now=time.time() - 2 * 24 * 3600)
+        tracker.touch("token-new")
+        self.assertTrue(tracker.flush(5))
+        self.assertIsNone(tracker.last_activity("token-old"))
+        self.assertEqual(tracker.stats()["tracked"], 1)
+
+    def test_forgotten_session_not_written(self):
+        writer = RecordingWriter()
+        tracker = SessionActivityTracker(write_batch=writer, flush_interval=60)
+        tracker.touch("token-a")
+        tracker.touch("token-b")
+        tracker.forget("token-a")
+        self.assertTrue(tracker.flush(5))
+        self.assertEqual([token for token, _ in writer.batches[0]], ["token-b"])
+        self.assertIsNone(tracker.last_activity("token-a"))
+
+    def test_flush_without_activity(self):
+        tracker = SessionActivityTracker(write_batch=RecordingWriter(), flush_interval=60)
+        self.assertTrue(tracker.flush(1))
+        self.assertFalse(tracker.is_alive())
+
+    def test_touch_cost_benchmark(self):
+        """Benchmark: recording activity for 100k messages"""
+        tracker = SessionActivityTracker(write_batch=RecordingWriter(), flush_interval=60)
+        started = time.perf_counter()
+        for i in range(100_000):
+            tracker.touch(f"token-{i % 60}")
+        per_touch = (time.perf_counter() - started) / 100_000
+        tracker.flush(5)
+        sys.__stdout__.write(f"\n[BENCHMARK] session activity touch: {per_touch * 1e6:.2f}us per message, "
+                             f"{tracker.stats()['batches']} UPDATE for 100000 messages\n")
+        self.assertLess(per_touch, 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
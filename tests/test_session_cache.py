@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the SessionCache
+Checks TTL and expires_at bounds, explicit invalidation by token and by user,
+eviction and the hit-rate counters, and that admin edits end cached admin sessions
+"""
+
+import unittest
+import importlib.util
+import asyncio
+import json
+import time
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from tornado.httputil import HTTPHeaders, HTTPServerRequest
+from tornado.web import Application
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from auth.session_cache import SessionCache
+
+ALICE = {"user_id": 1, "username": "alice", "role": "student", "full_name": "Alice"}
+BOB = {"user_id": 2, "username": "bob", "role": "professor", "full_name": "Bob"}
+
+# The admin handlers need the database driver and bcrypt to import
+HAS_ADMIN_DEPS = all(importlib.util.find_spec(name) is not None for name in ("bcrypt", "psycopg2", "dotenv"))
+
+
+class TestSessionCache(unittest.TestCase):
+    """Test cases for SessionCache"""
+
+    def test_hit_until_ttl(self):
+        cache = SessionCache(ttl=0.2)
+        self.assertIsNone(cache.get("tok-a"))
+        cache.put("tok-a", ALICE)
+        self.assertEqual(cache.get("tok-a"), ALICE)
+        time.sleep(0.25)
+        self.assertIsNone(cache.get("tok-a"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 2, 0))
+        self.assertEqual(stats["hit_rate"], 0.333)
+
+    def test_never_past_session_expiry(self):
+        cache = SessionCache(ttl=60)
+        cache.put("tok-expired", ALICE, datetime.now() - timedelta(seconds=1))
+        self.assertIsNone(cache.get("tok-expired"))
+        cache.put("tok-soon", ALICE, datetime.now() + timedelta(seconds=0.2))
+        self.assertIsNotNone(cache.get("tok-soon"))
+        time.sleep(0.25)
+        self.assertIsNone(cache.get("tok-soon"))
+
+    def test_returns_copies(self):
+        cache = SessionCache(ttl=60)
+        cache.put("tok-a", ALICE)
+        cache.get("tok-a")["username"] = "mallory"
+        self.assertEqual(cache.get("tok-a")["username"], "alice")
+
+    def test_invalidation(self):
+        cache = SessionCache(ttl=60)
+        cache.put("tok-a1", ALICE)
+        cache.put("tok-a2", ALICE)
+        cache.put("tok-b", BOB)
+
+        cache.invalidate("tok-a1")  # logout
+        self.assertIsNone(cache.get("tok-a1"))
+        cache.invalidate_user(username="alice")  # change_password
+        self.assertIsNone(cache.get("tok-a2"))
+        cache.invalidate_user(user_id=2)  # single-session enforcement on login
+        self.assertIsNone(cache.get("tok-b"))
+        self.assertEqual(cache.stats()["invalidations"], 3)
+
+    def test_eviction_keeps_newest(self):
+        cache = SessionCache(ttl=60, max_entries=3)
+        for i in range(5):
+            cache.put(f"tok-{i}", dict(ALICE, user_id=i))
+        self.assertEqual(cache.stats()["size"], 3)
+        self.assertIsNone(cache.get("tok-0"))
+        self.assertEqual(cache.get("tok-4")["user_id"], 4)
+
+    def test_disabled(self):
+        cache = SessionCache(ttl=0)
+        cache.put("tok-a", ALICE)
+        self.assertIsNone(cache.get("tok-a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_dashboard_poll_hit_rate(self):
+        """An admin dashboard polling every 2s for a minute queries the database once per TTL"""
+        cache = SessionCache(ttl=30)
+        queries = 0
+        for _ in range(30):
+            if cache.get("admin-token") is None:
+                queries += 1
+                cache.put("admin-token", BOB)
+        self.assertEqual(queries, 1)
+        self.assertGreater(cache.stats()["hit_rate"], 0.95)
+
+
+class FakeDatabase:
+    """Just enough of db_manager for admin session checks and the user edit/delete queries"""
+
+    is_postgres = True
+
+    def __init__(self):
+        self.users = {1: {"username": "prof", "role": "professor"}, 2: {"username": "carol", "role": "professor"}}
+        self.admin_tokens = {"prof-token": 1, "carol-token": 2}
+        self.session_queries = 0
+
+    def execute_query(self, query, params=None):
+        query = " ".join(query.split())
+        if "FROM admin_sessions s JOIN users u" in query:
+            self.session_queries += 1
+            user_id = self.admin_tokens.get(params[0])
+            user = self.users.get(user_id)
+            if user is None:
+                return []
+            return [dict(user, user_id=user_id, full_name=user["username"], email=None,
+                         expires_at=datetime.now() + timedelta(hours=1))]
+        if query.startswith("UPDATE users SET role = %s"):
+            user = self.users.get(params[-1])
+            if user is None:
+                return []
+            user["role"] = params[0]
+            return [{"username": user["username"]}]
+        if query.startswith("SELECT username FROM users WHERE id"):
+            user = self.users.get(params[0])
+            return [{"username": user["username"]}] if user else []
+        if query.startswith("DELETE FROM users"):
+            self.users.pop(params[0], None)
+        return []
+
+
+@unittest.skipUnless(HAS_ADMIN_DEPS, "bcrypt/psycopg2 are not installed")
+class TestAdminSessionInvalidation(unittest.TestCase):
+    """A demoted or deleted professor loses admin access on the next request, not after the TTL"""
+
+    def setUp(self):
+        from auth.admin_session_manager import admin_session_manager
+        from handlers.admin.users_handler import AdminUserDetailHandler
+
+        self.manager = admin_session_manager
+        self.handler = AdminUserDetailHandler
+        self.db = FakeDatabase()
+        cache = SessionCache(ttl=30)
+        for target, value in [('auth.admin_session_manager.admin_session_cache', cache),
+                              ('handlers.admin.users_handler.admin_session_cache', cache),
+                              ('handlers.admin.users_handler.session_cache', SessionCache(ttl=30)),
+                              ('handlers.admin.users_handler.db_manager', self.db),
+                              ('handlers.admin.users_handler.log_admin_action', lambda **kwargs: None)]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(admin_session_manager, 'db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _as_prof(self, method, body=b""):
+        """Run one admin REST request for user 2 and return the response status"""
+        request = HTTPServerRequest(method=method, uri="/api/admin/users/2", body=body, connection=Mock(),
+                                    headers=HTTPHeaders({"Authorization": "Bearer prof-token"}))
+        handler = self.handler(Application(), request)
+        asyncio.run(getattr(handler, method.lower())("2"))
+        return handler.get_status()
+
+    def _carol_cached(self):
+        self.assertEqual(self.manager.validate_admin_session("carol-token")["role"], "professor")
+        queries = self.db.session_queries
+        self.assertIsNotNone(self.manager.validate_admin_session("carol-token"))
+        self.assertEqual(self.db.session_queries, queries)  # Served from the cache
+
+    def test_demoted_professor_loses_admin_access(self):
+        self._carol_cached()
+        self.assertEqual(self._as_prof("PUT", json.dumps({"role": "student"}).encode()), 200)
+        self.assertIsNone(self.manager.validate_admin_session("carol-token"))
+
+    def test_deleted_professor_loses_admin_access(self):
+        self._carol_cached()
+        self.assertEqual(self._as_prof("DELETE"), 200)
+        self.assertIsNone(self.manager.validate_admin_session("carol-token"))
+
+
+if __name__ == '__main__':
+    unittest.main()
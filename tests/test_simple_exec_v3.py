@@ -8,6 +8,12 @@ import unittest
 import time
 import threading
 import queue
+import json
+import io
+import asyncio
+import builtins
+import tempfile
+import random
 from unittest.mock import Mock, MagicMock, patch
 import sys
 import os
@@ -16,7 +22,14 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
 
 # Import the module to test
-from command.simple_exec_v3 import SimpleExecutorV3, MessageType
+from command.simple_exec_v3 import (
+    SimpleExecutorV3, MessageType, _ThreadRoutedStream,
+    install_output_router, set_executor_output, clear_executor_output
+)
+from command.outbound_queue import OutboundQueue
+from command.deadline_timer import DeadlineTimer
+from command.loop_detector import LoopDetector
+from helpers import FrameRecordingTestCase, wait_for
 
 class TestSimpleExecutorV3(unittest.TestCase):
     """Test cases for SimpleExecutorV3"""
@@ -199,5 +212,533 @@ class TestInfiniteLoopDetection(unittest.TestCase):
         self.assertEqual(executor.CPU_TIME_LIMIT, 10)
 
 
+class TestOutputStreaming(FrameRecordingTestCase):
+    """Test that script output is streamed while the script runs"""
+
+    def _run(self, source):
+        with open('/tmp/test_streaming.py', 'w') as f:
+            f.write(source)
+        executor = SimpleExecutorV3(
+            cmd_id='test-stream',
+            client=self.mock_client,
+            event_loop=self.mock_loop,
+            script_path='/tmp/test_streaming.py',
+            username='test_user'
+        )
+        executor.start()
+        return executor
+
+    def _output(self, msg_type='stdout'):
+        return "".join(f["data"]["text"] for f in self.frames if f["type"] == msg_type)
+
+    def test_output_arrives_before_script_ends(self):
+        """Output printed before a sleep is delivered during the sleep"""
+        executor = self._run('import time\nprint("first")\ntime.sleep(1)\nprint("second")\n')
+        time.sleep(0.5)
+        self.assertEqual(self._output(), "first\n")
+        executor.stop()
+        executor.join(5)
+
+    def test_chunks_are_bounded_and_ordered(self):
+        """Large output is split into bounded chunks; stdout/stderr order is preserved"""
+        executor = self._run('import sys\nprint("a" * 10000)\nprint("err", file=sys.stderr)\nprint("b")\n')
+        deadline = time.time() + 5
+        while time.time() < deadline and not any(f["type"] == "repl_ready" for f in self.frames):
+            time.sleep(0.02)
+        executor.stop()
+        executor.join(5)
+
+        self.assertEqual(self._output(), "a" * 10000 + "\nb\n")
+        self.assertEqual(self._output('stderr'), "err\n")
+        output_frames = [f for f in self.frames if f["type"] in ("stdout", "stderr")]
+        self.assertTrue(all(len(f["data"]["text"]) <= 4096 for f in output_frames))
+        self.assertEqual(output_frames[-2]["type"], "stderr")
+
+    def test_flood_detected_while_streaming(self):
+        """An endless print loop is killed by the incremental detectors"""
+        executor = self._run('while True:\n    print("spam")\n')
+        executor.join(5)
+        self.assertFalse(executor.alive)
+        self.assertIn("error", [f["type"] for f in self.frames])
+        self.assertLessEqual(executor.total_output_lines, executor.MAX_TOTAL_LINES)
+
+
+class TestSandbox(FrameRecordingTestCase):
+    """The filesystem sandbox is installed once and follows the executor context"""
+
+    def setUp(self):
+        super().setUp()
+        self.data_dir = os.path.realpath(tempfile.mkdtemp(prefix='ide_data_'))
+        self.student_dir = os.path.join(self.data_dir, 'Local', 'alice')
+        os.makedirs(self.student_dir)
+        os.makedirs(os.path.join(self.data_dir, 'Local', 'bob'))
+        patcher = patch.dict(os.environ, {'IDE_DATA_PATH': self.data_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, source):
+        path = os.path.join(self.student_dir, 'main.py')
+        with open(path, 'w') as f:
+            f.write(source)
+        executor = SimpleExecutorV3(
+            cmd_id='test-sandbox',
+            client=self.mock_client,
+            event_loop=self.mock_loop,
+            script_path=path,
+            username='alice'
+        )
+        executor.start()
+        deadline = time.time() + 5
+        while time.time() < deadline and not any(f["type"] in ("repl_ready", "error") for f in self.frames):
+            time.sleep(0.02)
+        executor.stop()
+        executor.join(5)
+        return "".join(f["data"]["text"] for f in self.frames if f["type"] == "stdout")
+
+    def test_student_writes_confined_to_own_directory(self):
+        """Relative paths resolve to the script directory; writes elsewhere are denied"""
+        output = self._run(
+            'import os, threading\n'
+            'from pathlib import Path\n'
+            'open("out.txt", "w").write("ok")\n'
+            'Path("path.txt").write_text("ok")\n'
+            'print(os.getcwd() == os.path.dirname(__file__), os.path.exists("out.txt"))\n'
+            'def attempt(label, func):\n'
+            '    try:\n'
+            '        func()\n'
+            '        print(label, "allowed")\n'
+            '    except PermissionError:\n'
+            '        print(label, "denied")\n'
+            'attempt("open", lambda: open("../bob/x.txt", "w"))\n'
+            'attempt("makedirs", lambda: os.makedirs("../bob/new"))\n'
+            'attempt("pathlib", lambda: Path("../bob/y.txt").write_text("x"))\n'
+            't = threading.Thread(target=attempt, args=("thread", lambda: open("../bob/z.txt", "w")))\n'
+            't.start()\n'
+            't.join()\n'
+        )
+        self.assertIn("True True\n", output)
+        for label in ("open", "makedirs", "pathlib", "thread"):
+            self.assertIn(f"{label} denied\n", output)
+        self.assertTrue(os.path.exists(os.path.join(self.student_dir, 'out.txt')))
+        self.assertTrue(os.path.exists(os.path.join(self.student_dir, 'path.txt')))
+        self.assertEqual(os.listdir(os.path.join(self.data_dir, 'Local', 'bob')), [])
+
+    def test_no_global_state_swapped_per_run(self):
+        """Runs leave builtins and sys.modules untouched and need no restore"""
+        real_open, real_os, real_pathlib = builtins.open, sys.modules['os'], sys.modules['pathlib']
+        self._run('import os, pathlib\nprint(type(os).__name__)\n')
+        self.assertIs(builtins.open, real_open)
+        self.assertIs(sys.modules['os'], real_os)
+        self.assertIs(sys.modules['pathlib'], real_pathlib)
+        # Server threads are not sandboxed
+        open(os.path.join(self.data_dir, 'Local', 'bob', 'server.txt'), 'w').close()
+
+
+class TestOutputRouting(unittest.TestCase):
+    """Concurrent executors share one routed sys.stdout without cross-talk"""
+
+    def _collecting_client(self, frames):
+        client = Mock()
+        client.write_message = Mock(side_effect=lambda msg: frames.append(json.loads(msg)))
+        return client
+
+    def test_concurrent_scripts_no_cross_talk(self):
+        """Many simultaneous printing scripts each receive only their own output"""
+        loop = Mock()
+        loop.call_soon_threadsafe = Mock(side_effect=lambda callback, *args: callback(*args))
+        runs = []
+        for n in range(12):
+            path = f'/tmp/test_routing_{n}.py'
+            with open(path, 'w') as f:
+                f.write(f'import time\nfor i in range(40):\n    print("run-{n}", i)\n    time.sleep(0.001)\n')
+            frames = []
+            executor = SimpleExecutorV3(
+                cmd_id=f'test-route-{n}',
+                client=self._collecting_client(frames),
+                event_loop=loop,
+                script_path=path,
+                username=f'test_user{n}'
+            )
+            runs.append((n, executor, frames))
+
+        for _, executor, _ in runs:
+            executor.start()
+        deadline = time.time() + 10
+        for _, executor, frames in runs:
+            while time.time() < deadline and not any(f["type"] == "repl_ready" for f in frames):
+                time.sleep(0.01)
+            executor.stop()
+            executor.join(5)
+
+        for n, _, frames in runs:
+            text = "".join(f["data"]["text"] for f in frames if f["type"] == "stdout")
+            expected = "".join(f"run-{n} {i}\n" for i in range(40))
+            self.assertEqual(text, expected)
+        # Routing is per thread; the process-wide streams are never swapped per run
+        self.assertIsInstance(sys.stdout, _ThreadRoutedStream)
+
+    def test_routing_throughput_benchmark(self):
+        """Routed print() throughput does not drop when many threads print at once"""
+        install_output_router()
+        lines_per_thread = 20000
+
+        class Sink(io.StringIO):
+            pass
+
+        def worker(sink, tag):
+            set_executor_output(sink, sink)
+            try:
+                for i in range(lines_per_thread):
+                    print(tag, i)
+            finally:
+                clear_executor_output()
+
+        def measure(thread_count):
+            sinks = [Sink() for _ in range(thread_count)]
+            threads = [threading.Thread(target=worker, args=(sinks[i], f"t{i}")) for i in range(thread_count)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            for i, sink in enumerate(sinks):
+                lines = sink.getvalue().splitlines()
+                self.assertEqual(len(lines), lines_per_thread)
+                self.assertTrue(all(line.startswith(f"t{i} ") for line in lines))
+            return thread_count * lines_per_thread / elapsed
+
+        single = measure(1)
+        concurrent = measure(16)
+        sys.__stdout__.write(f"\n[BENCHMARK] routed print(): 1 thread {single:,.0f} lines/s, "
+                             f"16 threads {concurrent:,.0f} lines/s aggregate\n")
+        # All threads share the GIL, so aggregate throughput should stay in the same range
+        self.assertGreater(concurrent, single * 0.5)
+
+
+class TestTimeoutEnforcement(FrameRecordingTestCase):
+    """Timeouts interrupt the script thread without per-line tracing"""
+
+    def _run_until_done(self, source):
+        with open('/tmp/test_timeout_async.py', 'w') as f:
+            f.write(source)
+        executor = SimpleExecutorV3(
+            cmd_id='test-timeout-async',
+            client=self.mock_client,
+            event_loop=self.mock_loop,
+            script_path='/tmp/test_timeout_async.py',
+            username='test_user'
+        )
+        start = time.time()
+        executor.start()
+        executor.join(10)
+        return executor, time.time() - start
+
+    def test_busy_loop_terminated(self):
+        """A CPU-bound loop is stopped at the 3 second limit with the usual message"""
+        executor, elapsed = self._run_until_done('while True:\n    pass\n')
+        self.assertFalse(executor.is_alive())
+        self.assertTrue(executor.timeout_occurred)
+        self.assertLess(elapsed, 4.5)
+        errors = [f["data"] for f in self.frames if f["type"] == "error"]
+        self.assertTrue(any("SCRIPT TERMINATED" in e["traceback"] for e in errors))
+
+    def test_loop_throughput_benchmark(self):
+        """Benchmark: loop throughput under the old settrace check vs the new mechanism"""
+        executor = SimpleExecutorV3(
+            cmd_id='test-bench', client=self.mock_client, event_loop=self.mock_loop, username='test_user'
+        )
+        executor.timeout_occurred = False
+
+        # The per-line check execute_script used to install
+        def trace_function(frame, event, arg):
+            if executor.timeout_occurred or not executor.alive:
+                raise KeyboardInterrupt("Script terminated by timeout")
+            return trace_function
+
+        def student_loop():
+            total = 0
+            for i in range(1_000_000):
+                total += i % 7
+            return total
+
+        def measure(trace):
+            sys.settrace(trace)
+            try:
+                start = time.perf_counter()
+                student_loop()
+                return time.perf_counter() - start
+            finally:
+                sys.settrace(None)
+
+        traced = min(measure(trace_function) for _ in range(3))
+        untraced = min(measure(None) for _ in range(3))
+        sys.__stdout__.write(f"\n[BENCHMARK] 1M-iteration loop: settrace {traced:.3f}s, "
+                             f"async interrupt {untraced:.3f}s ({traced / untraced:.1f}x faster)\n")
+        self.assertLess(untraced, traced)
+
+
+class TestEventDrivenRepl(FrameRecordingTestCase):
+    """The REPL blocks on input instead of polling"""
+
+    def _start_repl(self, repl_timeout=300):
+        executor = SimpleExecutorV3(
+            cmd_id='test-repl',
+            client=self.mock_client,
+            event_loop=self.mock_loop,
+            username='test_user'
+        )
+        executor.repl_timeout = repl_timeout
+        executor.start()
+        self.assertTrue(wait_for(lambda: any(f["type"] == "repl_ready" for f in self.frames),
+                                 timeout=5, interval=0.001))
+        self.addCleanup(executor.join, 5)
+        self.addCleanup(executor.stop)
+        return executor
+
+    def _stdout(self):
+        return "".join(f["data"]["text"] for f in self.frames if f["type"] == "stdout")
+
+    def _context_switches(self, executor):
+        with open(f'/proc/self/task/{executor.native_id}/status') as f:
+            for line in f:
+                if line.startswith('voluntary_ctxt_switches'):
+                    return int(line.split()[1])
+
+    def test_idle_repl_does_not_wake(self):
+        """A waiting REPL thread sleeps until input arrives"""
+        executor = self._start_repl()
+        time.sleep(0.1)
+        before = self._context_switches(executor)
+        time.sleep(1.0)
+        self.assertLessEqual(self._context_switches(executor) - before, 1)
+
+    def test_line_latency(self):
+        """Keystroke-to-prompt latency is not padded by a polling interval"""
+        executor = self._start_repl()
+        latencies = []
+        for i in range(20):
+            prompts = self._stdout().count(">>> ")
+            started = time.perf_counter()
+            executor.handle_input(f"x = {i}")
+            self.assertTrue(wait_for(lambda: self._stdout().count(">>> ") > prompts, timeout=5, interval=0.001))
+            latencies.append(time.perf_counter() - started)
+        average = sum(latencies) / len(latencies)
+        sys.__stdout__.write(f"\n[BENCHMARK] REPL line latency: avg {average * 1000:.2f}ms, "
+                             f"max {max(latencies) * 1000:.2f}ms\n")
+        self.assertLess(average, 0.02)
+
+    def test_idle_timeout_and_stop(self):
+        """The shared timer ends an idle REPL; activity postpones it"""
+        executor = self._start_repl(repl_timeout=0.4)
+        time.sleep(0.25)
+        executor.handle_input("1 + 1")
+        time.sleep(0.25)
+        self.assertTrue(executor.is_alive())
+        executor.join(2)
+        self.assertFalse(executor.is_alive())
+        self.assertIn("timed out", self._stdout())
+
+        self.frames.clear()
+        executor = self._start_repl()
+        started = time.perf_counter()
+        executor.stop()
+        executor.join(2)
+        self.assertFalse(executor.is_alive())
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_deadline_timer_order_and_cancel(self):
+        """Callbacks fire in deadline order; cancelled entries never fire"""
+        timer = DeadlineTimer()
+        timer.start()
+        fired = []
+        timer.schedule(0.06, fired.append, 'c')
+        timer.schedule(0.02, fired.append, 'a')
+        cancelled = timer.schedule(0.03, fired.append, 'x')
+        timer.schedule(0.04, fired.append, 'b')
+        timer.cancel(cancelled)
+        self.assertTrue(wait_for(lambda: len(fired) == 3, timeout=2, interval=0.001))
+        self.assertEqual(fired, ['a', 'b', 'c'])
+        self.assertEqual(timer.pending(), 0)
+
+
+class TestLoopDetector(unittest.TestCase):
+    """The streaming detector enforces all four layers incrementally"""
+
+    @staticmethod
+    def _detector(**limits):
+        settings = dict(max_lines_per_second=10 ** 9, max_total_lines=10 ** 9, max_identical_lines=10 ** 9,
+                        flood_chars=10 ** 12, flood_lines=10 ** 9)
+        settings.update(limits)
+        return LoopDetector(clock=lambda: 0.0, **settings)
+
+    @staticmethod
+    def _reference_kill_chunk(chunks, limit):
+        """Index of the chunk after which a whole-line, blank-skipping check sees `limit` repeats"""
+        pending, last, count = "", None, 0
+        for index, chunk in enumerate(chunks):
+            *lines, pending = (pending + chunk).split("\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                count = count + 1 if line == last else 1
+                last = line
+                if count >= limit:
+                    return index
+        return None
+
+    def test_identical_lines_match_line_by_line_check(self):
+        """Randomised chunking and blank lines give the same verdict as splitting every line"""
+        rng = random.Random(1234)
+        for _ in range(400):
+            text = "".join(rng.choice(["a\n", "a\n", "a\n", "ba\n", "bb\n", "\n", "  \n", "a", "c\n"])
+                           for _ in range(rng.randint(1, 80)))
+            cuts = []
+            if len(text) > 1:
+                cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 10))))
+            chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+            limit = rng.randint(2, 12)
+
+            detector = self._detector(max_identical_lines=limit)
+            killed = None
+            for index, chunk in enumerate(chunks):
+                if detector.feed(chunk):
+                    killed = index
+                    break
+            self.assertEqual(killed, self._reference_kill_chunk(chunks, limit), (chunks, limit))
+
+    def test_line_split_across_chunks_counts_once(self):
+        """A long line streamed in pieces is one line for the total and identical layers"""
+        detector = self._detector(max_identical_lines=3)
+        for _ in range(2):
+            for piece in ("x" * 5000, "x" * 5000, "\n"):
+                self.assertIsNone(detector.feed(piece))
+        self.assertEqual(detector.total_lines, 2)
+        self.assertIn("repeated 3 times", detector.feed("x" * 10000 + "\n"))
+
+    def test_rate_total_and_flood_layers(self):
+        """Rate uses a sliding window; total and flood limits trip at their thresholds"""
+        now = [0.0]
+        rate = LoopDetector(max_lines_per_second=100, flood_chars=10 ** 9, clock=lambda: now[0])
+        # 80 lines/sec for 5 seconds stays under the limit ...
+        for tick in range(50):
+            now[0] = tick * 0.1
+            self.assertIsNone(rate.feed("".join(f"{tick} {i}\n" for i in range(8))))
+        # ... a burst that pushes the last second over 100 lines/sec does not
+        now[0] = 5.0
+        self.assertIn("Output rate limit exceeded", rate.feed("".join(f"burst {i}\n" for i in range(60))))
+
+        total = self._detector(max_total_lines=1000)
+        self.assertIsNone(total.feed("".join(f"{i}\n" for i in range(1000))))
+        self.assertIn("Total output limit exceeded", total.feed("one more\n"))
+
+        flood = LoopDetector(max_lines_per_second=10 ** 9, clock=lambda: 0.0)
+        self.assertIsNone(flood.feed("".join(f"{i:03d} {'.' * 70}\n" for i in range(40))))
+        self.assertIn("Flood detected", flood.feed("".join(f"{i:03d} {'.' * 70}\n" for i in range(40))))
+
+    def test_detector_cost_per_megabyte(self):
+        """Benchmark: detector cost per MB of streamed output (4KB chunks)"""
+        results = {}
+        for label, line_maker in (("distinct lines", lambda i: f"value {i}: {i * i}\n"),
+                                  ("repeated line", lambda i: "still waiting...\n")):
+            text = "".join(line_maker(i) for i in range(60000))
+            chunks = [text[i:i + 4096] for i in range(0, len(text), 4096)]
+            detector = self._detector()
+            started = time.perf_counter()
+            for chunk in chunks:
+                detector.feed(chunk)
+            elapsed = time.perf_counter() - started
+            results[label] = elapsed / (len(text) / 1e6)
+
+        costs = ", ".join(f"{label} {cost * 1000:.2f}ms" for label, cost in results.items())
+        sys.__stdout__.write(f"\n[BENCHMARK] Loop detector cost per MB: {costs}\n")
+        self.assertLess(max(results.values()), 0.1)
+
+
+class TestOutboundQueue(unittest.TestCase):
+    """Executor output is coalesced into few frames without reordering"""
+
+    class DeferredLoop:
+        """Collects callbacks like an event loop that is busy until run_pending()"""
+
+        def __init__(self):
+            self.callbacks = []
+
+        def call_soon_threadsafe(self, callback, *args):
+            self.callbacks.append((callback, args))
+
+        def run_pending(self):
+            callbacks, self.callbacks = self.callbacks, []
+            for callback, args in callbacks:
+                callback(*args)
+
+    def setUp(self):
+        self.frames = []
+        self.client = Mock()
+        self.client.write_message = Mock(side_effect=lambda msg: self.frames.append(json.loads(msg)))
+        self.loop = self.DeferredLoop()
+
+    def test_consecutive_output_merged_and_control_ordered(self):
+        """Adjacent stdout merges; stderr and control messages split frames in order"""
+        queue_ = OutboundQueue(self.client, self.loop, 'test-outbound')
+        for i in range(100):
+            queue_.put(MessageType.STDOUT, f"line {i}\n")
+        queue_.put(MessageType.STDERR, "warning\n")
+        queue_.put(MessageType.INPUT_REQUEST, "name? ")
+        queue_.put(MessageType.STDOUT, "after\n")
+        queue_.put(MessageType.COMPLETE, {"exit_code": 0, "duration": 1.0})
+
+        # One event loop wakeup for the whole burst
+        self.assertEqual(len(self.loop.callbacks), 1)
+        self.loop.run_pending()
+
+        self.assertEqual([f["type"] for f in self.frames],
+                         ["stdout", "stderr", "input_request", "stdout", "complete"])
+        self.assertEqual(self.frames[0]["data"]["text"], "".join(f"line {i}\n" for i in range(100)))
+        self.assertTrue(all(f["cmd"] == "repl_output" for f in self.frames))
+
+    def test_frame_size_cap(self):
+        """Merged frames never exceed the size cap"""
+        queue_ = OutboundQueue(self.client, self.loop, 'test-outbound', max_frame_chars=1000)
+        for _ in range(50):
+            queue_.put(MessageType.STDOUT, "x" * 99 + "\n")
+        self.loop.run_pending()
+
+        self.assertEqual(len(self.frames), 5)
+        self.assertTrue(all(len(f["data"]["text"]) <= 1000 for f in self.frames))
+        self.assertEqual("".join(f["data"]["text"] for f in self.frames), ("x" * 99 + "\n") * 50)
+
+    def test_frame_reduction_benchmark(self):
+        """Benchmark: frames and wakeups for 60 concurrent printing executors"""
+        loop = asyncio.new_event_loop()
+        frames = [0]
+        client = Mock()
+        client.write_message = Mock(side_effect=lambda msg: frames.__setitem__(0, frames[0] + 1))
+        queues = [OutboundQueue(client, loop, f'student-{n}') for n in range(60)]
+
+        def student(queue_):
+            for i in range(500):
+                queue_.put(MessageType.STDOUT, f"{i}\n")
+                if i % 50 == 0:
+                    time.sleep(0.001)
+
+        threads = [threading.Thread(target=student, args=(q,)) for q in queues]
+
+        async def run():
+            for t in threads:
+                t.start()
+            while any(t.is_alive() for t in threads) or any(q.pending_count() for q in queues):
+                await asyncio.sleep(0.002)
+
+        loop.run_until_complete(run())
+        loop.close()
+        messages = sum(q.messages_in for q in queues)
+        wakeups = sum(q.wakeups for q in queues)
+        sys.__stdout__.write(f"\n[BENCHMARK] 60 executors: {messages} messages -> {frames[0]} frames, "
+                             f"{wakeups} event loop wakeups\n")
+        self.assertEqual(sum(q.frames_out for q in queues), frames[0])
+        self.assertLess(frames[0] * 10, messages)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
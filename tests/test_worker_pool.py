@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the execution WorkerPool
+Runs scripts through PooledExecutor and checks the repl_output relay
+"""
+
+import unittest
+import json
+import time
+import sys
+import os
+from multiprocessing import Pipe
+from unittest.mock import patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command.worker_pool import Worker, WorkerPool, PooledExecutor
+from helpers import RecordingClient, InlineLoop, wait_for, write_script
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Test cases for WorkerPool / PooledExecutor"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Preload a stdlib module so the template path is exercised without the scientific stack
+        cls.pool = WorkerPool(size=1, preload=['decimal'])
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_script_output_and_input(self):
+        """Output, input() and REPL exit are relayed unchanged"""
+        path = write_script(self, 'name = input("name? ")\nprint("hello", name)\n')
+        client = RecordingClient()
+        executor = PooledExecutor('pool-1', client, InlineLoop(), script_path=path,
+                                  username='test_user', pool=self.pool)
+        executor.start()
+
+        self.assertTrue(wait_for(lambda: executor.waiting_for_input))
+        executor.handle_input('bob')
+        self.assertTrue(wait_for(lambda: 'repl_ready' in client.types()))
+        executor.handle_input('exit()')
+        executor.join(10)
+
+        self.assertFalse(executor.is_alive())
+        self.assertIn('input_request', client.types())
+        self.assertIn('hello bob', client.stdout())
+        self.assertEqual(client.types()[-1], 'complete')
+        self.assertTrue(all(frame["cmd"] == "repl_output" for frame in client.frames))
+
+    def test_stop_kills_worker(self):
+        """stop() terminates a busy worker without waiting for the script"""
+        path = write_script(self, 'while True:\n    input_value = 1\n')
+        client = RecordingClient()
+        executor = PooledExecutor('pool-2', client, InlineLoop(), script_path=path,
+                                  username='test_user', pool=self.pool)
+        executor.start()
+        self.assertTrue(wait_for(lambda: executor.worker is not None))
+
+        executor.stop()
+        executor.join(5)
+
+        self.assertFalse(executor.is_alive())
+        self.assertFalse(executor.alive)
+        self.assertTrue(executor.worker.exited)
+
+    def test_telemetry_from_worker(self):
+        """The worker reports its run's usage; runs killed before reporting still get a row"""
+        with patch('command.worker_pool.telemetry_writer') as writer:
+            path = write_script(self, 'data = list(range(300000))\nprint(len(data))\n')
+            client = RecordingClient()
+            executor = PooledExecutor('pool-5', client, InlineLoop(), script_path=path,
+                                      username='test_user', pool=self.pool)
+            executor.start()
+            self.assertTrue(wait_for(lambda: 'repl_ready' in client.types()))
+            executor.handle_input('exit()')
+            executor.join(10)
+
+            self.assertEqual(writer.submit.call_count, 1)
+            record = writer.submit.call_args[0][0]
+            self.assertEqual((record["termination_reason"], record["exit_code"]), ("normal", 0))
+            self.assertEqual((record["output_lines"], record["stdout_preview"]), (1, "300000\n"))
+            self.assertGreater(record["peak_rss_kb"], 0)
+
+            writer.reset_mock()
+            executor = PooledExecutor('pool-6', RecordingClient(), InlineLoop(),
+                                      script_path=write_script(self, 'while True:\n    pass\n'),
+                                      username='test_user', pool=self.pool)
+            executor.start()
+            self.assertTrue(wait_for(lambda: executor.worker is not None))
+            executor.stop()
+            executor.join(5)
+            self.assertEqual(writer.submit.call_args[0][0]["termination_reason"], "stop")
+
+    def test_timeout_in_worker(self):
+        """Timeouts end a worker run even when the script swallows the interrupt"""
+        for source in ('import time\ntime.sleep(30)\n',
+                       'while True:\n    try:\n        while True:\n            pass\n    except:\n        pass\n'):
+            client = RecordingClient()
+            executor = PooledExecutor('pool-4', client, InlineLoop(), script_path=write_script(self, source),
+                                      username='test_user', pool=self.pool)
+            start = time.time()
+            executor.start()
+            executor.join(10)
+
+            self.assertFalse(executor.is_alive())
+            self.assertLess(time.time() - start, 5)
+            self.assertTrue(executor.timeout_occurred)
+            errors = [f["data"] for f in client.frames if f["type"] == "error"]
+            self.assertTrue(any("SCRIPT TERMINATED" in e["traceback"] for e in errors))
+            self.assertNotIn("unexpectedly", json.dumps(errors))
+
+    def test_workers_fork_from_template(self):
+        """Workers are children of the preloaded template, not fresh interpreters"""
+        worker = self.pool.acquire()
+        try:
+            self.assertIsNone(worker.process)
+            with open(f'/proc/{worker.pid}/stat') as f:
+                parent_pid = int(f.read().rsplit(')', 1)[1].split()[1])
+            self.assertEqual(parent_pid, self.pool.template.process.pid)
+        finally:
+            worker.kill()
+            worker.close()
+
+    def test_forked_worker_signalled_through_pidfd(self):
+        """The template hands over a pidfd, so a reaped worker's reused PID is never signalled"""
+        worker = self.pool.template.fork_worker()
+        try:
+            self.assertIsNotNone(worker.pidfd)
+            self.assertTrue(worker.is_usable())
+            worker.kill()
+            self.assertTrue(wait_for(lambda: not worker.is_usable()))
+            with patch('command.worker_pool.os.kill') as kill:
+                worker.kill()  # Already gone - must not fall back to the bare PID
+            kill.assert_not_called()
+        finally:
+            worker.close()
+        self.assertIsNone(worker.pidfd)
+
+    def test_reused_pid_not_signalled(self):
+        """Without a pidfd, a PID whose start time changed belongs to someone else"""
+        a, b = Pipe()
+        self.addCleanup(b.close)
+        worker = Worker(a, os.getpid())
+        self.assertTrue(worker.is_usable())
+        worker.start_time -= 1  # As if our PID had been reused by a newer process
+        self.assertFalse(worker.is_usable())
+        with patch('command.worker_pool.os.kill') as kill:
+            worker.kill()
+        kill.assert_not_called()
+        worker.close()
+
+    def test_bare_worker_without_template(self):
+        """An empty preload list falls back to spawning plain worker interpreters"""
+        pool = WorkerPool(size=0, preload=[])
+        self.assertIsNone(pool.template)
+        path = write_script(self, 'print(6 * 7)\n')
+        client = RecordingClient()
+        executor = PooledExecutor('pool-3', client, InlineLoop(), script_path=path, username='test_user', pool=pool)
+        executor.start()
+        self.assertTrue(wait_for(lambda: 'repl_ready' in client.types()))
+        executor.stop()
+        executor.join(5)
+        self.assertIn('42', client.stdout())
+        self.assertIsNotNone(executor.worker.process)
+
+
+if __name__ == '__main__':
+    unittest.main()
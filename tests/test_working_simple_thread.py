@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test Suite for WorkingSimpleThread
+Checks chunked output reading, UTF-8 decoding across reads, input() prompt
+detection, and output throughput against the old byte-at-a-time reader
+"""
+
+import unittest
+import asyncio
+import threading
+import select
+import subprocess
+import time
+import sys
+import os
+from unittest.mock import Mock, patch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from command import working_simple_thread
+from command.working_simple_thread import WorkingSimpleThread
+from helpers import wait_for, write_script
+
+
+class TestWorkingSimpleThread(unittest.TestCase):
+    """Test cases for WorkingSimpleThread"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+        cls.loop_thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.loop_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+
+    def setUp(self):
+        self.responses = []
+
+        async def record(client, cmd_id, code=0, data=None):
+            self.responses.append((code, data))
+
+        patcher = patch.object(working_simple_thread, 'response', record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        telemetry = patch.object(working_simple_thread, 'telemetry_writer')
+        telemetry.start()
+        self.addCleanup(telemetry.stop)
+
+    def _start(self, source):
+        client = Mock()
+        client.connected = True
+        client.id = 'test-client'
+        thread = WorkingSimpleThread([sys.executable, '-u', write_script(self, source)], 'wst-1', client, self.loop)
+        thread.start()
+        return thread
+
+    def _finished(self):
+        return any(code == 1111 for code, _ in self.responses)
+
+    def stdout(self):
+        return "".join(data["stdout"] for code, data in self.responses if code == 0)
+
+    def test_lines_and_exit(self):
+        thread = self._start('for i in range(3):\n    print("line", i)\n')
+        self.assertTrue(wait_for(self._finished))
+        thread.join(5)
+        self.assertEqual(self.stdout(), "line 0\nline 1\nline 2\n")
+        self.assertIn("exit code 0", self.responses[-1][1]["stdout"])
+
+    def test_utf8_split_across_reads(self):
+        """A multi-byte character cut between two reads is decoded intact"""
+        thread = self._start(
+            'import sys, time\n'
+            'sys.stdout.buffer.write("caf".encode() + b"\\xc3"); sys.stdout.buffer.flush()\n'
+            'time.sleep(0.05)\n'
+            'sys.stdout.buffer.write(b"\\xa9 \\xe2\\x82"); sys.stdout.buffer.flush()\n'
+            'time.sleep(0.05)\n'
+            'sys.stdout.buffer.write(b"\\xac\\n"); sys.stdout.buffer.flush()\n'
+        )
+        self.assertTrue(wait_for(self._finished))
+        thread.join(5)
+        self.assertEqual(self.stdout(), "café €\n")
+
+    def test_input_prompt_detection(self):
+        thread = self._start('name = input("Name: ")\nprint("hello", name)\n')
+        self.assertTrue(wait_for(lambda: any(code == 2000 for code, _ in self.responses)))
+        prompt = [data for code, data in self.responses if code == 2000][0]
+        self.assertEqual(prompt["prompt"], "Name:")
+
+        sent = time.time()
+        thread.send_input("bob")
+        self.assertTrue(wait_for(lambda: "hello bob" in self.stdout()))
+        # Input wakes the reader immediately instead of waiting for a poll
+        self.assertLess(time.time() - sent, 0.5)
+        self.assertTrue(wait_for(self._finished))
+        thread.join(5)
+
+    def test_stop(self):
+        thread = self._start('import time\nwhile True:\n    time.sleep(0.01)\n')
+        time.sleep(0.3)
+        thread.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_throughput_benchmark(self):
+        """Benchmark: a script printing 10 MB, chunked reader vs the old one-byte-per-select loop"""
+        source = 'import sys\nline = "x" * 99 + "\\n"\nfor _ in range({}):\n    sys.stdout.write(line)\n'
+
+        # The old reader, on 1 MB (10 MB would take far too long)
+        path = write_script(self, source.format(10_000))
+        start = time.perf_counter()
+        p = subprocess.Popen([sys.executable, '-u', path], stdout=subprocess.PIPE, bufsize=0)
+        fd = p.stdout.fileno()
+        received = 0
+        while True:
+            readable, _, _ = select.select([p.stdout], [], [], 0.01)
+            if readable:
+                char = os.read(fd, 1)
+                if not char:
+                    break
+                received += 1
+        p.wait()
+        old_rate = received / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        thread = self._start(source.format(100_000))
+        self.assertTrue(wait_for(self._finished, timeout=60))
+        thread.join(5)
+        elapsed = time.perf_counter() - start
+        output = self.stdout()
+        new_rate = len(output) / elapsed
+        frames = sum(1 for code, _ in self.responses if code == 0)
+
+        sys.__stdout__.write(
+            f"\n[BENCHMARK] 10 MB print: chunked reader {elapsed:.2f}s ({new_rate / 1e6:.1f} MB/s, {frames} messages); "
+            f"byte-at-a-time reader {old_rate / 1e6:.2f} MB/s ({new_rate / old_rate:.0f}x)\n"
+        )
+        self.assertEqual(len(output), 10_000_000)
+        self.assertLess(frames, 10_000)
+        self.assertGreater(new_rate, old_rate * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()